@@ -0,0 +1,266 @@
+"""
+Synthetic-map benchmark for the exploration core.
+ROS 없이 합성 지도(방, 복도, 창고) 위에서 ExplorationPlanner를 돌려
+결정당 지연 시간, 총 이동 거리, 커버리지 도달 시간을 측정합니다.
+
+사용 예:
+    python bench_exploration.py --scenarios rooms warehouse --sizes 100 1000 4000 --json bench.json
+"""
+import argparse
+import json
+import logging
+import math
+import time
+
+import numpy as np
+
+from exploration_core import ExplorationPlanner
+
+FREE = 0
+OCCUPIED = 100
+UNKNOWN = -1
+
+
+# --- 합성 지도 생성기 ---
+# 모든 지도는 가장자리가 벽으로 막혀 있고, 빈 공간은 서로 연결되도록 만듭니다.
+
+def make_rooms(size, rng, room_cells=80, wall=2, door=20):
+    """격자 형태로 배치된 방들. 각 벽에는 무작위 위치에 문이 하나씩 있습니다."""
+    grid = np.full((size, size), FREE, dtype=np.int8)
+    grid[:wall, :] = grid[-wall:, :] = OCCUPIED
+    grid[:, :wall] = grid[:, -wall:] = OCCUPIED
+    room_cells = min(room_cells, max(size // 2, door + 2 * wall + 1))
+    lines = list(range(room_cells, size - wall, room_cells))
+    for pos in lines:
+        grid[pos:pos + wall, :] = OCCUPIED
+        grid[:, pos:pos + wall] = OCCUPIED
+    bounds = [wall] + [p + wall for p in lines] + [size - wall]
+    for pos in lines:
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            span = end - start - door
+            if span <= 0:
+                continue
+            # 가로 벽과 세로 벽의 각 구간마다 문을 하나씩 뚫습니다.
+            d = start + int(rng.integers(0, span))
+            grid[pos:pos + wall, d:d + door] = FREE
+            d = start + int(rng.integers(0, span))
+            grid[d:d + door, pos:pos + wall] = FREE
+    return grid
+
+
+def make_corridors(size, rng, spacing=160, width=30):
+    """가로 복도 여러 개와 이를 잇는 세로 복도들로 구성된 지도."""
+    grid = np.full((size, size), OCCUPIED, dtype=np.int8)
+    width = min(width, max(size // 4, 3))
+    spacing = min(spacing, max(size // 2, width + 1))
+    rows = list(range(width, size - width, spacing)) or [size // 2 - width // 2]
+    for r in rows:
+        grid[r:r + width, width:size - width] = FREE
+    # 인접한 가로 복도 사이를 세로 복도로 연결합니다 (최소 한 개는 가장자리에 두어 연결을 보장).
+    for upper, lower in zip(rows[:-1], rows[1:]):
+        cols = [width] + list(rng.integers(width, size - 2 * width, size=max(1, size // (2 * spacing))))
+        for c in cols:
+            grid[upper:lower + width, c:c + width] = FREE
+    return grid
+
+
+def make_warehouse(size, rng, rack_width=20, aisle=30, clutter_ratio=0.002):
+    """선반(랙) 줄과 통로, 작은 장애물이 흩어진 창고형 지도."""
+    grid = np.full((size, size), FREE, dtype=np.int8)
+    grid[:2, :] = grid[-2:, :] = OCCUPIED
+    grid[:, :2] = grid[:, -2:] = OCCUPIED
+    margin = max(aisle, size // 10)
+    rack_len = max((size - 2 * margin) // 3, 1)
+    for r in range(margin, size - margin - rack_width, rack_width + aisle):
+        # 한 줄의 랙을 세 구간으로 나누어 가로 통로를 남깁니다.
+        for k in range(3):
+            c0 = margin + k * rack_len
+            grid[r:r + rack_width, c0:c0 + max(rack_len - aisle, 1)] = OCCUPIED
+    # 작은 장애물 (1~4 셀 크기 상자)
+    n_clutter = int(size * size * clutter_ratio / 8)
+    for r, c in rng.integers(2, size - 6, size=(n_clutter, 2)):
+        if grid[r, c] == FREE:
+            grid[r:r + int(rng.integers(1, 5)), c:c + int(rng.integers(1, 5))] = OCCUPIED
+    return grid
+
+
+SCENARIOS = {
+    'rooms': make_rooms,
+    'corridors': make_corridors,
+    'warehouse': make_warehouse,
+}
+
+
+# --- 센서 시뮬레이션 ---
+
+def reveal(known, truth, cell, radius):
+    """
+    로봇 위치에서 radius 셀 이내, 벽에 가려지지 않는 빈 공간과 그에 맞닿은 벽을 known 지도에 드러냅니다.
+    (빈 공간을 따라 radius 번 팽창시키는 방식으로 가림 효과를 근사합니다.)
+    갱신했을 수 있는 영역 (r0, r1, c0, c1)을 반환합니다.
+    """
+    rows, cols = truth.shape
+    r, c = cell
+    r0, r1 = max(r - radius, 0), min(r + radius + 1, rows)
+    c0, c1 = max(c - radius, 0), min(c + radius + 1, cols)
+    window = truth[r0:r1, c0:c1]
+    yy, xx = np.ogrid[r0 - r:r1 - r, c0 - c:c1 - c]
+    disk = yy * yy + xx * xx <= radius * radius
+    passable = (window == FREE) & disk
+
+    seen = np.zeros_like(passable)
+    seen[r - r0, c - c0] = True
+    for _ in range(radius):
+        grown = _dilate(seen) & passable
+        grown[r - r0, c - c0] = True
+        if np.array_equal(grown, seen):
+            break
+        seen = grown
+
+    walls = _dilate(seen) & disk & (window != FREE)
+    known_window = known[r0:r1, c0:c1]
+    known_window[seen & passable] = FREE
+    known_window[walls] = window[walls]
+    return r0, r1, c0, c1
+
+
+def _dilate(mask):
+    grown = mask.copy()
+    grown[1:] |= mask[:-1]
+    grown[:-1] |= mask[1:]
+    grown[:, 1:] |= mask[:, :-1]
+    grown[:, :-1] |= mask[:, 1:]
+    return grown
+
+
+def _start_cell(truth):
+    """지도 중앙에서 가장 가까운 빈 공간 셀을 시작 위치로 고릅니다."""
+    free = np.argwhere(truth == FREE)
+    center = np.array(truth.shape) / 2.0
+    return tuple(int(v) for v in free[np.argmin(((free - center) ** 2).sum(axis=1))])
+
+
+# --- 시뮬레이션 ---
+
+def run_scenario(name, size, seed=0, resolution=0.05, sensor_range=3.5, speed=0.22,
+                 max_decisions=300, max_failures=40, coverage_targets=(0.9, 0.95, 0.99)):
+    """
+    하나의 합성 지도에서 탐사를 끝까지(또는 max_decisions까지) 시뮬레이션하고 통계를 반환합니다.
+    시뮬레이션 시간은 이동 거리 / speed에 계획 계산 시간을 더한 값입니다.
+    """
+    rng = np.random.default_rng(seed)
+    truth = SCENARIOS[name](size, rng)
+    known = np.full(truth.shape, UNKNOWN, dtype=np.int8)
+    origin = (0.0, 0.0)
+    radius = max(int(sensor_range / resolution), 1)
+    total_free = int((truth == FREE).sum())
+
+    planner = ExplorationPlanner(logger=logging.getLogger('bench'))
+    cell = _start_cell(truth)
+    x, y, yaw = (cell[1] * resolution, cell[0] * resolution, 0.0)
+    reveal(known, truth, cell, radius)
+    changed = None # 지난 계획 이후 드러난 영역 목록 (첫 계획은 피라미드를 새로 만듭니다)
+
+    latencies = []
+    path_length = 0.0
+    sim_time = 0.0
+    failures = 0
+    coverage_times = {}
+    finished = False
+
+    for _ in range(max_decisions):
+        start = time.perf_counter()
+        status, goal = planner.plan(known, resolution, origin, (x, y, yaw), now=sim_time, changed=changed)
+        elapsed = time.perf_counter() - start
+        latencies.append(elapsed)
+        sim_time += elapsed
+        changed = []
+
+        if status == ExplorationPlanner.NO_FRONTIERS:
+            finished = True
+            break
+        if goal is None:
+            # 전방에 후보가 없으면 제자리에서 90도 회전한 것으로 간주합니다.
+            failures += 1
+            yaw = (yaw + math.pi / 2) % (2 * math.pi) - math.pi
+            if failures >= max_failures:
+                break
+            continue
+        failures = 0
+
+        # 목표까지 직선으로 이동하며 일정 간격마다 센서로 주변을 드러냅니다.
+        # 벽에 막히면 그 직전 위치를 경유점으로 삼고, 나머지 구간은 planner가 추정한 경로 비용으로 계산합니다.
+        goal_x, goal_y = goal
+        euclid = math.hypot(goal_x - x, goal_y - y)
+        cost = planner.last_decision.get('cost')
+        travel = cost if cost is not None and math.isfinite(cost) and cost >= euclid else euclid
+        steps = max(int(euclid / (sensor_range / 2)), 1)
+        for k in range(1, steps + 1):
+            wx = x + (goal_x - x) * k / steps
+            wy = y + (goal_y - y) * k / steps
+            waypoint = (min(max(int(wy / resolution), 0), size - 1), min(max(int(wx / resolution), 0), size - 1))
+            if truth[waypoint] != FREE:
+                break
+            changed.append(reveal(known, truth, waypoint, radius))
+        goal_cell = (min(max(int(goal_y / resolution), 0), size - 1), min(max(int(goal_x / resolution), 0), size - 1))
+        changed.append(reveal(known, truth, goal_cell, radius))
+
+        yaw = math.atan2(goal_y - y, goal_x - x)
+        x, y = goal_x, goal_y
+        path_length += travel
+        sim_time += travel / speed
+
+        coverage = float((known == FREE).sum()) / total_free
+        for target in coverage_targets:
+            if coverage >= target and target not in coverage_times:
+                coverage_times[target] = sim_time
+
+    latencies_ms = np.array(latencies) * 1000.0
+    return {
+        'scenario': name,
+        'size': size,
+        'seed': seed,
+        'decisions': len(latencies),
+        'finished': finished,
+        'latency_ms_mean': float(latencies_ms.mean()) if latencies else None,
+        'latency_ms_p50': float(np.percentile(latencies_ms, 50)) if latencies else None,
+        'latency_ms_p95': float(np.percentile(latencies_ms, 95)) if latencies else None,
+        'latency_ms_max': float(latencies_ms.max()) if latencies else None,
+        'path_length_m': round(path_length, 2),
+        'sim_time_s': round(sim_time, 2),
+        'coverage': round(float((known == FREE).sum()) / total_free, 4),
+        'time_to_coverage_s': {str(k): round(v, 2) for k, v in sorted(coverage_times.items())},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ROS-free exploration planner on synthetic maps.")
+    parser.add_argument('--scenarios', nargs='+', default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument('--sizes', nargs='+', type=int, default=[100, 400, 1000])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-decisions', type=int, default=300)
+    parser.add_argument('--json', help="결과를 저장할 JSON 파일 경로")
+    parser.add_argument('--verbose', action='store_true', help="planner 로그를 출력합니다")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.ERROR)
+
+    results = []
+    print(f"{'scenario':<10} {'size':>5} {'dec':>4} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} "
+          f"{'path m':>8} {'cover':>6} {'t90 s':>8}")
+    for name in args.scenarios:
+        for size in args.sizes:
+            result = run_scenario(name, size, seed=args.seed, max_decisions=args.max_decisions)
+            results.append(result)
+            t90 = result['time_to_coverage_s'].get('0.9', '-')
+            print(f"{name:<10} {size:>5} {result['decisions']:>4} {result['latency_ms_p50'] or 0:>8.1f} "
+                  f"{result['latency_ms_p95'] or 0:>8.1f} {result['latency_ms_max'] or 0:>8.1f} "
+                  f"{result['path_length_m']:>8.1f} {result['coverage']:>6.3f} {t90:>8}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
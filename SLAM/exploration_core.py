@@ -0,0 +1,416 @@
+"""
+ROS-free exploration core.
+프론티어 탐색, 목표 선택, 지도 피라미드, 목표 블랙리스트 등 탐사 계획 로직을
+rclpy/tf2/nav2 없이 numpy만으로 구현합니다. explorer.py(ExplorerNode)는 이 모듈을 감싸는 얇은 ROS 어댑터이고,
+bench_exploration.py는 합성 지도로 이 모듈의 성능을 측정합니다.
+"""
+import logging
+import math
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+class SpatialBlacklist:
+    """
+    Grid-hashed blacklist of goal regions that failed or were rejected.
+    실패한 목표 주변 반경의 셀들을 월드 좌표 기준 격자 해시에 기록하고,
+    시간이 지나면 가중치가 지수적으로 감소(decay)하도록 관리합니다.
+    조회는 딕셔너리 한 번으로 끝나므로 O(1)이며, 셀 수는 max_cells로 제한됩니다.
+    """
+    def __init__(self, cell_size=0.25, radius=0.75, decay_sec=300.0,
+                 exclude_weight=0.5, penalty_per_weight=2.0, max_cells=4096):
+        self.cell_size = cell_size                    # 해시 격자 한 칸의 크기 (m)
+        self.radius = radius                          # 실패 1회가 영향을 주는 반경 (m)
+        self.decay_sec = decay_sec                    # 가중치가 1/e로 줄어드는 시간 (초)
+        self.exclude_weight = exclude_weight          # 이 값 이상이면 후보에서 제외
+        self.penalty_per_weight = penalty_per_weight  # 가중치 1당 거리 점수에 더할 페널티 (m)
+        self.max_cells = max_cells                    # 메모리 상한 (오래된 셀부터 제거)
+        # (ix, iy) -> (weight, last_update_time). 삽입 순서를 LRU처럼 사용합니다.
+        self._cells = OrderedDict()
+
+    def _key(self, x, y):
+        return (math.floor(x / self.cell_size), math.floor(y / self.cell_size))
+
+    def _decayed(self, weight, stamp, now):
+        return weight * math.exp(-(now - stamp) / self.decay_sec)
+
+    def record_failure(self, x, y, weight=1.0, radius=None, now=None):
+        """(x, y) 주변 radius 안의 모든 셀에 실패 가중치를 누적합니다."""
+        now = time.monotonic() if now is None else now
+        radius = self.radius if radius is None else radius
+        cx, cy = self._key(x, y)
+        span = int(math.ceil(radius / self.cell_size))
+        for ix in range(cx - span, cx + span + 1):
+            for iy in range(cy - span, cy + span + 1):
+                # 셀 중심이 반경 안에 있는 셀만 기록합니다.
+                center_x = (ix + 0.5) * self.cell_size
+                center_y = (iy + 0.5) * self.cell_size
+                if math.hypot(center_x - x, center_y - y) > radius + 0.5 * self.cell_size:
+                    continue
+                key = (ix, iy)
+                prev = self._cells.pop(key, None)
+                current = self._decayed(prev[0], prev[1], now) if prev else 0.0
+                self._cells[key] = (current + weight, now)
+        # 상한을 넘으면 가장 오래 갱신되지 않은 셀부터 버립니다.
+        while len(self._cells) > self.max_cells:
+            self._cells.popitem(last=False)
+
+    def weight_at(self, x, y, now=None):
+        """(x, y)가 속한 셀의 현재(감쇠 적용) 가중치를 반환합니다."""
+        key = self._key(x, y)
+        entry = self._cells.get(key)
+        if entry is None:
+            return 0.0
+        now = time.monotonic() if now is None else now
+        weight = self._decayed(entry[0], entry[1], now)
+        # 거의 사라진 항목은 조회 시점에 정리합니다.
+        if weight < 0.05:
+            del self._cells[key]
+            return 0.0
+        return weight
+
+    def is_blocked(self, x, y, now=None):
+        return self.weight_at(x, y, now) >= self.exclude_weight
+
+    def penalty(self, x, y, now=None):
+        """프론티어 거리 점수에 더할 페널티 (m)."""
+        return self.weight_at(x, y, now) * self.penalty_per_weight
+
+    def __len__(self):
+        return len(self._cells)
+
+
+def downsample_occupancy(grid):
+    """
+    점유 격자를 2배 축소합니다. 2x2 블록 안에서 점유(>0) > 미탐색(-1) > 빈 공간(0)
+    순서의 우선순위를 적용하여, 하나라도 점유되면 점유, 아니면 하나라도 미탐색이면 미탐색입니다.
+    홀수 크기는 빈 공간(0)으로 패딩하므로 결과에 영향을 주지 않습니다.
+    """
+    h, w = grid.shape
+    if h % 2 or w % 2:
+        grid = np.pad(grid, ((0, h % 2), (0, w % 2)), constant_values=0)
+    blocks = grid.reshape(grid.shape[0] // 2, 2, grid.shape[1] // 2, 2)
+    coarse = np.zeros((blocks.shape[0], blocks.shape[2]), dtype=np.int8)
+    coarse[(blocks < 0).any(axis=(1, 3))] = -1
+    coarse[(blocks > 0).any(axis=(1, 3))] = 100
+    return coarse
+
+
+def changed_region(prev, grid):
+    """
+    같은 크기의 두 격자에서 값이 달라진 영역을 [(r0, r1, c0, c1)] 형태로 반환합니다 (같으면 빈 목록).
+    크기가 다르면 영역으로 나타낼 수 없으므로 None을 반환합니다.
+    """
+    if prev is None or prev.shape != grid.shape:
+        return None
+    changed = grid != prev
+    rows = np.flatnonzero(changed.any(axis=1))
+    if rows.size == 0:
+        return []
+    cols = np.flatnonzero(changed.any(axis=0))
+    return [(int(rows[0]), int(rows[-1]) + 1, int(cols[0]), int(cols[-1]) + 1)]
+
+
+class MapPyramid:
+    """
+    Coarse-to-fine occupancy pyramid (1x, 2x, 4x, 8x ...).
+    각 단계는 바로 아래 단계를 2배 축소하여 만들고, 새 지도가 들어오면 달라진 영역에 해당하는 블록만 다시 계산합니다.
+    호출자가 변경 영역(changed)을 알려주면 그 영역만 복사/비교하므로 갱신 비용이 지도 크기와 무관하며,
+    알려주지 않으면 이전 지도와 전체를 비교해 변경 영역(bounding box)을 찾습니다 (지도 크기에 비례, O(N)).
+    /map처럼 매번 전체 격자가 오는 경우, 그 비교는 수신 쪽에서 changed_region()으로 해두고 결과만 넘기면 됩니다.
+    revision은 격자가 실제로 바뀔 때마다 증가하므로, 지도에서 파생된 결과를 캐시하는 키로 쓸 수 있습니다.
+    """
+    def __init__(self, factors=(2, 4, 8)):
+        self.factors = tuple(sorted(factors))
+        self.levels = {} # factor -> int8 격자 (1은 원본 해상도)
+        self.revision = 0
+        self._source = None # 마지막으로 받은 읽기 전용 지도 (같은 객체가 다시 오면 비교를 생략)
+
+    def update(self, map_array, changed=None):
+        """
+        changed는 이전 호출 이후 바뀐 원본 해상도 영역 (r0, r1, c0, c1)의 목록입니다.
+        None이면 변경 영역을 모르는 것으로 보고 전체를 비교합니다.
+        """
+        prev = self.levels.get(1)
+        # 첫 지도이거나 SLAM이 지도 크기를 바꾼 경우 전체를 다시 만듭니다.
+        if prev is None or prev.shape != map_array.shape:
+            self._rebuild(map_array)
+            return
+        if changed is None:
+            # 읽기 전용 배열은 제자리에서 바뀌지 않으므로, 같은 객체면 지난 호출과 같은 지도입니다.
+            if map_array is self._source and not map_array.flags.writeable:
+                return
+            self._source = map_array
+            changed = changed_region(prev, map_array)
+        rows, cols = prev.shape
+        for r0, r1, c0, c1 in changed:
+            r0, r1 = max(int(r0), 0), min(int(r1), rows)
+            c0, c1 = max(int(c0), 0), min(int(c1), cols)
+            if r0 >= r1 or c0 >= c1:
+                continue
+            prev[r0:r1, c0:c1] = map_array[r0:r1, c0:c1]
+            self._propagate(r0, r1, c0, c1)
+
+    def _propagate(self, r0, r1, c0, c1):
+        # 변경 영역 [r0, r1) x [c0, c1)을 단계별로 축소하며 해당 블록만 갱신합니다.
+        self.revision += 1
+        finer = self.levels[1]
+        factor = 1
+        while factor * 2 <= self.factors[-1]:
+            r0, c0 = r0 // 2, c0 // 2
+            r1, c1 = (r1 + 1) // 2, (c1 + 1) // 2
+            coarse = self.levels[factor * 2]
+            coarse[r0:r1, c0:c1] = downsample_occupancy(finer[r0 * 2:r1 * 2, c0 * 2:c1 * 2])
+            finer = coarse
+            factor *= 2
+
+    def _rebuild(self, map_array):
+        # 호출자가 배열을 제자리에서 수정해도 변경 영역만 반영할 수 있도록 복사본을 보관합니다.
+        self.levels = {1: np.array(map_array, dtype=np.int8, copy=True)}
+        self._source = map_array
+        self.revision += 1
+        factor = 1
+        while factor * 2 <= self.factors[-1]:
+            self.levels[factor * 2] = downsample_occupancy(self.levels[factor])
+            factor *= 2
+
+    def level(self, factor):
+        return self.levels[factor]
+
+    def planning_factor(self, max_cells):
+        """셀 수가 max_cells 이하가 되는 가장 세밀한 단계를 고릅니다."""
+        for factor in (1,) + self.factors:
+            if self.levels[factor].size <= max_cells:
+                return factor
+        return self.factors[-1]
+
+
+def find_frontiers(map_array):
+    """
+    Detect frontiers in the occupancy grid map.
+    A frontier is a free cell that has an unknown neighbor.
+    """
+    rows, cols = map_array.shape
+    if rows < 3 or cols < 3:
+        return []
+
+    # '0'은 비어있는 공간(free space)을 의미합니다.
+    free = map_array[1:-1, 1:-1] == 0
+    unknown = map_array == -1
+    # 8방향의 이웃 셀들을 확인합니다.
+    # (셀마다 반복하는 대신, 9개의 이동된 슬라이스를 OR 하여 한 번에 계산합니다.)
+    has_unknown = np.zeros_like(free)
+    for dr in range(3):
+        for dc in range(3):
+            has_unknown |= unknown[dr:rows - 2 + dr, dc:cols - 2 + dc]
+    # 이웃 중에 '-1'(unknown)이 하나라도 있다면 프론티어로 간주합니다.
+    return [(int(r) + 1, int(c) + 1) for r, c in np.argwhere(free & has_unknown)]
+
+
+def cell_to_world(cell, resolution, origin, factor=1):
+    """factor배 축소된 격자의 (row, col)을 월드 좌표로 변환합니다. factor=1이면 기존 계산과 동일합니다."""
+    offset = (factor - 1) / 2.0 # 축소 셀의 중심을 가리키도록 보정
+    x = (cell[1] * factor + offset) * resolution + origin[0]
+    y = (cell[0] * factor + offset) * resolution + origin[1]
+    return x, y
+
+
+def world_to_cell(x, y, resolution, origin, factor=1):
+    cell_size = resolution * factor
+    return int((y - origin[1]) // cell_size), int((x - origin[0]) // cell_size)
+
+
+def compute_wavefront(grid, start_cell, cell_size):
+    """
+    start_cell에서 시작하는 웨이브프론트(BFS) 거리를 계산합니다 (단위: m).
+    빈 공간(0)만 통과하며, 도달하지 못한 셀은 inf 입니다.
+    셀마다 반복하는 대신 현재 파면(wavefront)의 셀 인덱스 배열을 한 번에 4방향으로 넓혀 갑니다.
+    """
+    rows, cols = grid.shape
+    cost = np.full(grid.shape, np.inf, dtype=np.float32)
+    start_r, start_c = start_cell
+    if not (0 <= start_r < rows and 0 <= start_c < cols):
+        return cost
+
+    # 가장자리를 막힌 셀로 둘러싸면 평탄화된 인덱스에서 경계 검사 없이 이웃을 구할 수 있습니다.
+    width = cols + 2
+    open_cells = np.zeros((rows + 2, width), dtype=bool)
+    open_cells[1:-1, 1:-1] = grid == 0
+    open_cells = open_cells.ravel()
+    steps = np.full(open_cells.shape, np.inf, dtype=np.float32)
+    front = np.array([(start_r + 1) * width + start_c + 1])
+    open_cells[front] = False
+    steps[front] = 0
+    step = 0
+    while front.size:
+        step += 1
+        neighbors = np.concatenate((front - width, front + width, front - 1, front + 1))
+        front = np.unique(neighbors[open_cells[neighbors]])
+        open_cells[front] = False # 방문한 셀은 다시 통과하지 않습니다.
+        steps[front] = step
+    cost[:] = steps.reshape(rows + 2, width)[1:-1, 1:-1] * np.float32(cell_size)
+    return cost
+
+
+class ExplorationPlanner:
+    """
+    ROS에 의존하지 않는 프론티어 탐사 계획기.
+    지도(numpy 배열)와 로봇 자세(x, y, yaw)만 받아 다음 목표를 결정하므로,
+    ExplorerNode뿐 아니라 벤치마크/테스트에서도 그대로 사용할 수 있습니다.
+    """
+    # plan()의 결과 상태
+    GOAL = 'GOAL'                           # 목표를 찾음
+    NO_FRONTIERS = 'NO_FRONTIERS'           # 지도에 프론티어가 더 이상 없음 (탐사 완료)
+    NO_VALID_FRONTIER = 'NO_VALID_FRONTIER' # 프론티어는 있으나 조건을 만족하는 것이 없음
+
+    def __init__(self, logger=None, planning_max_cells=250000, unreachable_cost_factor=2.0,
+                 pyramid_factors=(2, 4, 8), blacklist=None):
+        self.logger = logger or logging.getLogger(__name__)
+        # Visited frontiers set
+        self.visited_frontiers = set()
+        # 거부/실패한 목표 주변을 일정 시간 동안 피하기 위한 공간 블랙리스트
+        self.goal_blacklist = blacklist or SpatialBlacklist()
+        # 큰 지도에서는 저해상도 단계에서 프론티어/웨이브프론트를 계산하고 목표 주변만 원본 해상도로 정밀화합니다.
+        self.map_pyramid = MapPyramid(factors=pyramid_factors)
+        self.planning_max_cells = planning_max_cells # 계획 단계 격자의 최대 셀 수 (이하이면 원본 해상도를 그대로 사용)
+        self.unreachable_cost_factor = unreachable_cost_factor # 웨이브프론트가 닿지 않는 프론티어의 직선거리 가중치
+        # 마지막 결정의 세부 정보 (로그/벤치마크용)
+        self.last_decision = {}
+        # (factor, 시작 셀, 피라미드 revision) -> 웨이브프론트. 지도와 로봇 셀이 그대로면 다시 계산하지 않습니다.
+        self._wavefront_key = None
+        self._wavefront = None
+
+    def plan(self, map_array, resolution, origin, robot_pose, now=None, changed=None):
+        """
+        다음 탐사 목표를 결정합니다.
+        robot_pose는 map 좌표계의 (x, y, yaw), origin은 지도 원점 (x, y) 입니다.
+        changed는 지난 호출 이후 바뀐 지도 영역 (r0, r1, c0, c1)의 목록이며, 모르면 None입니다 (MapPyramid.update 참고).
+        (status, (goal_x, goal_y) 또는 None)을 반환합니다.
+        """
+        now = time.monotonic() if now is None else now
+        # 지도 피라미드를 갱신하고, 지도 크기에 맞는 계획 해상도를 고릅니다.
+        self.map_pyramid.update(map_array, changed)
+        map_array = self.map_pyramid.level(1)
+        factor = self.map_pyramid.planning_factor(self.planning_max_cells)
+        frontiers = find_frontiers(self.map_pyramid.level(factor))
+        if not frontiers and factor > 1:
+            # 축소 과정에서 좁은 프론티어가 사라졌을 수 있으므로 원본 해상도로 한 번 더 확인합니다.
+            factor = 1
+            frontiers = find_frontiers(map_array)
+
+        self.last_decision = {'factor': factor, 'frontiers': len(frontiers), 'cost': None}
+        if not frontiers:
+            return self.NO_FRONTIERS, None
+
+        wavefront = None
+        if factor > 1:
+            start_cell = world_to_cell(robot_pose[0], robot_pose[1], resolution, origin, factor)
+            wavefront = self.wavefront(factor, start_cell, resolution * factor)
+        chosen_frontier, cost = self.choose_frontier(
+            frontiers, resolution, origin, robot_pose, factor, wavefront, now)
+        if chosen_frontier is None:
+            return self.NO_VALID_FRONTIER, None
+
+        # 저해상도에서 고른 프론티어는 주변만 원본 해상도로 정밀화합니다.
+        goal = self.refine_frontier(map_array, chosen_frontier, factor, resolution, origin, robot_pose, now)
+        self.last_decision['cost'] = cost
+        return self.GOAL, goal
+
+    def wavefront(self, factor, start_cell, cell_size):
+        """factor 단계의 웨이브프론트를 반환합니다. 지도가 바뀌지 않았고 로봇이 같은 셀에 있으면 이전 결과를 재사용합니다."""
+        key = (factor, start_cell, cell_size, self.map_pyramid.revision)
+        if key != self._wavefront_key:
+            self._wavefront = compute_wavefront(self.map_pyramid.level(factor), start_cell, cell_size)
+            self._wavefront_key = key
+        return self._wavefront
+
+    def choose_frontier(self, frontiers, resolution, origin, robot_pose, factor=1, wavefront=None, now=None):
+        """
+        Choose the closest frontier that is in front of the robot.
+        factor > 1이면 frontiers는 축소 격자의 셀이며, wavefront가 주어지면
+        직선거리 대신 웨이브프론트 경로 거리로 비교합니다.
+        (선택한 셀, 점수)를 반환하며, 찾지 못하면 (None, inf) 입니다.
+        """
+        now = time.monotonic() if now is None else now
+        # 로봇의 현재 위치 (map 좌표계)
+        robot_x, robot_y, robot_yaw = robot_pose
+
+        min_distance = float('inf')
+        chosen_frontier = None
+
+        for frontier in frontiers:
+            # 방문 기록은 해상도와 무관하게 원본 격자 좌표로 관리합니다.
+            if (frontier[0] * factor, frontier[1] * factor) in self.visited_frontiers:
+                continue
+
+            # 프론티어의 월드 좌표를 계산합니다.
+            frontier_x, frontier_y = cell_to_world(frontier, resolution, origin, factor)
+
+            # 최근 실패한 지역 근처의 프론티어는 제외합니다.
+            if self.goal_blacklist.is_blocked(frontier_x, frontier_y, now):
+                continue
+
+            # 로봇 위치에서 프론티어로 향하는 각도를 계산합니다.
+            angle_to_frontier = math.atan2(frontier_y - robot_y, frontier_x - robot_x)
+
+            # 로봇의 현재 방향과 프론티어로의 방향 차이를 계산합니다.
+            angle_diff = abs(robot_yaw - angle_to_frontier)
+            # 각도 차이가 180도(pi)를 넘지 않도록 정규화합니다.
+            if angle_diff > math.pi:
+                angle_diff = 2 * math.pi - angle_diff
+
+            # 로봇의 전방 시야각(여기서는 +/- 90도, 즉 1.57 라디안) 내에 있는지 확인합니다.
+            if angle_diff > (11 * math.pi / 12.0):
+                continue
+
+            # 전방에 있는 프론티어 중에서 가장 가까운 것을 선택합니다.
+            distance = math.sqrt((robot_x - frontier_x)**2 + (robot_y - frontier_y)**2)
+            if wavefront is not None:
+                path_cost = float(wavefront[frontier])
+                # 축소 격자에서 좁은 통로가 막혀 보일 수 있으므로, 도달 불가 프론티어도 가중치를 두고 남겨둡니다.
+                distance = path_cost if path_cost != float('inf') else distance * self.unreachable_cost_factor
+            # 감쇠 중인 실패 기록이 남아있다면 거리 점수에 페널티를 더합니다.
+            distance += self.goal_blacklist.penalty(frontier_x, frontier_y, now)
+            if distance < min_distance:
+                min_distance = distance
+                chosen_frontier = frontier
+
+        if chosen_frontier:
+            self.visited_frontiers.add((chosen_frontier[0] * factor, chosen_frontier[1] * factor))
+            self.logger.info(f"Chosen FORWARD frontier: {chosen_frontier} (x{factor}) at distance {min_distance:.2f}m")
+        else:
+            self.logger.warning("No valid frontier found in front of the robot.")
+
+        return chosen_frontier, min_distance
+
+    def refine_frontier(self, map_array, coarse_frontier, factor, resolution, origin, robot_pose, now=None):
+        """
+        저해상도에서 선택한 프론티어 블록 주변(한 블록 여유)만 원본 해상도로 다시 검사하여
+        로봇에서 가장 가까운 실제 프론티어 셀의 월드 좌표를 반환합니다.
+        """
+        if factor == 1:
+            return cell_to_world(coarse_frontier, resolution, origin)
+        rows, cols = map_array.shape
+        r0 = max(coarse_frontier[0] * factor - factor, 0)
+        c0 = max(coarse_frontier[1] * factor - factor, 0)
+        r1 = min((coarse_frontier[0] + 2) * factor + 1, rows)
+        c1 = min((coarse_frontier[1] + 2) * factor + 1, cols)
+        candidates = find_frontiers(map_array[r0:r1, c0:c1])
+
+        robot_x, robot_y = robot_pose[0], robot_pose[1]
+        best, best_distance = None, float('inf')
+        for r, c in candidates:
+            x, y = cell_to_world((r + r0, c + c0), resolution, origin)
+            if self.goal_blacklist.is_blocked(x, y, now):
+                continue
+            distance = math.hypot(x - robot_x, y - robot_y)
+            if distance < best_distance:
+                best, best_distance = (x, y), distance
+        # 원본 해상도에서 프론티어를 찾지 못하면 블록 중심을 목표로 사용합니다.
+        return best if best is not None else cell_to_world(coarse_frontier, resolution, origin, factor)
+
+    def record_failure(self, x, y, now=None):
+        """거부/실패한 목표 주변을 블랙리스트에 기록합니다."""
+        self.goal_blacklist.record_failure(x, y, now=now)
@@ -4,16 +4,24 @@ from nav_msgs.msg import OccupancyGrid
 from geometry_msgs.msg import PoseStamped
 from nav2_msgs.action import NavigateToPose
 from rclpy.action import ActionClient
+from rclpy.callback_groups import MutuallyExclusiveCallbackGroup, ReentrantCallbackGroup
+from rclpy.executors import MultiThreadedExecutor
 import numpy as np
-import math
 import os
-import subprocess
+import threading
+import time
+from collections import deque
+from functools import partial
+from action_msgs.msg import GoalStatus
 
 # TF2\uc640 \uad00\ub828\ub41c \ub77c\uc774\ube0c\ub7ec\ub9ac\ub97c \ucd94\uac00\ud569\ub2c8\ub2e4.
 import tf2_ros
 from tf2_ros import LookupException, ConnectivityException, ExtrapolationException
 from tf_transformations import euler_from_quaternion
 from std_msgs.msg import String # 추가
+from map_writer import MapSnapshotWriter, quaternion_to_yaw, write_map
+from exploration_core import ExplorationPlanner, changed_region
+
 
 class ExplorerNode(Node):
     def __init__(self):
@@ -29,35 +37,103 @@ class ExplorerNode(Node):
         self.start_position = None # 탐색 시작 위치를 저장할 변수
         self.frontier_failure_count = 0
 
+        # --- 콜백 그룹: MultiThreadedExecutor에서 서로를 막지 않도록 역할별로 분리 ---
+        # 지도 수신, 자세 갱신, 탐사 계획은 각각 자기 그룹 안에서만 순차 실행되고,
+        # 네비게이션 액션 응답은 재진입 가능 그룹에서 언제든 처리됩니다.
+        self.map_group = MutuallyExclusiveCallbackGroup()
+        self.pose_group = MutuallyExclusiveCallbackGroup()
+        self.planning_group = MutuallyExclusiveCallbackGroup()
+        self.nav_group = ReentrantCallbackGroup()
+        # 콜백 스레드 간에 공유하는 지도/자세 스냅샷을 보호하는 락
+        self.state_lock = threading.Lock()
+
         # Subscriber to the map topic
         self.map_sub = self.create_subscription(
-            OccupancyGrid, '/map', self.map_callback, 10)
+            OccupancyGrid, '/map', self.map_callback, 10, callback_group=self.map_group)
 
         # Action client for navigation
-        self.nav_to_pose_client = ActionClient(self, NavigateToPose, 'navigate_to_pose')
+        self.nav_to_pose_client = ActionClient(
+            self, NavigateToPose, 'navigate_to_pose', callback_group=self.nav_group)
 
         # Publisher for exploration status
         self.status_publisher = self.create_publisher(String, '/exploration_status', 10)
 
-        # Visited frontiers set
-        self.visited_frontiers = set()
+        # 프론티어 탐색/선택 로직은 ROS와 무관한 exploration_core.ExplorationPlanner가 담당합니다.
+        # (방문한 프론티어, 실패 지역 블랙리스트, 지도 피라미드를 내부에서 관리)
+        self.planner = ExplorationPlanner(logger=self.get_logger())
+        self.current_goal = None # 현재 탐사 목표의 월드 좌표 (x, y)
+        # 보낸 목표마다 증가하는 번호. 새 목표가 선점(preempt)한 이전 목표의 결과를 구분하는 데 씁니다.
+        self.goal_seq = 0
+        # 네비게이션 콜백 스레드에서 발생한 실패 지점. 계획 스레드가 planner에 반영합니다.
+        self.pending_failures = deque()
 
         # Map and pose data
         self.map_data = None
+        self.map_array = None # map_data를 변환한 읽기 전용 numpy 격자 (계획 스레드가 그대로 공유)
+        # 마지막 계획 이후 지도가 바뀐 영역 목록. None이면 크기가 바뀌었거나 아직 계획 전이라 알 수 없습니다.
+        self.map_changes = None
         self.robot_pose = None # \ub85c\ubd07\uc758 \uc704\uce58\uc640 \ubc29\ud5a5\uc744 \ubaa8\ub450 \uc800\uc7a5\ud560 \ubcc0\uc218
+        self.robot_pose_2d = None # planner가 사용하는 (x, y, yaw) 튜플
 
         # --- TF2 \ub9ac\uc2a4\ub108 \ucd08\uae30\ud654 ---
         self.tf_buffer = tf2_ros.Buffer()
-        self.tf_listener = tf2_ros.TransformListener(self.tf_buffer, self)
+        # /tf 수신은 전용 스레드에서 처리하여 계획 계산이 길어져도 TF 버퍼가 밀리지 않게 합니다.
+        self.tf_listener = tf2_ros.TransformListener(self.tf_buffer, self, spin_thread=True)
 
         # --- \ub85c\ubd07 \uc790\uc138\ub97c \uc8fc\uae30\uc801\uc73c\ub85c \uc5c5\ub370\uc774\ud2b8\ud558\uae30 \uc704\ud55c \ud0c0\uc774\uba38 ---
-        self.pose_update_timer = self.create_timer(1.0, self.update_robot_pose)
+        self.pose_update_timer = self.create_timer(1.0, self.update_robot_pose, callback_group=self.pose_group)
 
         # Timer for periodic exploration
-        self.timer = self.create_timer(5.0, self.explore)
+        self.timer = self.create_timer(5.0, self.explore, callback_group=self.planning_group)
+
+        # --- 지도 저장: map_saver_cli 프로세스 대신 보유 중인 OccupancyGrid를 직접 파일로 저장 ---
+        self.map_file_path = os.path.join(os.path.expanduser('~'), 'my_explored_map')
+        self.map_extra_formats = ('png', 'npz') # PGM+YAML 외에 함께 저장할 압축 사본
+        # 탐사 중 비정상 종료에 대비해 주기적으로 체크포인트를 백그라운드 스레드에서 저장합니다.
+        self.checkpoint_writer = MapSnapshotWriter(
+            self.map_file_path + '_checkpoint', self.map_extra_formats, self.get_logger())
+        self.checkpoint_writer.start()
+        self.checkpoint_timer = self.create_timer(30.0, self.save_map_checkpoint, callback_group=self.planning_group)
 
     def map_callback(self, msg):
-        self.map_data = msg
+        # 수신 스레드에서 한 번만 numpy로 변환하고 읽기 전용으로 만들어, 계획 스레드가 복사 없이 공유합니다.
+        grid = np.asarray(msg.data, dtype=np.int8).reshape((msg.info.height, msg.info.width))
+        grid.flags.writeable = False
+        # 이전 지도와의 비교(O(N))는 수신 스레드에서 해두고, 계획 스레드에는 변경 영역만 넘겨 피라미드를 부분 갱신합니다.
+        region = changed_region(self.map_array, grid)
+        with self.state_lock:
+            if region is None:
+                self.map_changes = None
+            elif self.map_changes is not None:
+                self.map_changes.extend(region)
+            self.map_data = msg
+            self.map_array = grid
+
+    def map_snapshot(self):
+        """현재 보유한 OccupancyGrid를 (격자, 해상도, (x, y, yaw) 원점) 튜플로 변환합니다."""
+        with self.state_lock:
+            info = self.map_data.info
+            grid = self.map_array
+        q = info.origin.orientation
+        origin = (info.origin.position.x, info.origin.position.y, quaternion_to_yaw(q.x, q.y, q.z, q.w))
+        return grid, info.resolution, origin
+
+    def planning_snapshot(self):
+        """
+        계획에 사용할 지도와 자세, 지난 스냅샷 이후의 지도 변경 영역을 한 시점에 묶어 반환합니다.
+        반환 이후 다른 콜백이 갱신해도 영향이 없습니다.
+        """
+        with self.state_lock:
+            info = self.map_data.info
+            changes, self.map_changes = self.map_changes, []
+            return (self.map_array, info.resolution,
+                    (info.origin.position.x, info.origin.position.y), self.robot_pose_2d, changes)
+
+    def save_map_checkpoint(self):
+        """탐사 중 최신 지도를 백그라운드 스레드에 넘겨 원자적으로 저장합니다."""
+        if self.map_data is None or self.state == 'SHUTTING_DOWN':
+            return
+        self.checkpoint_writer.submit(*self.map_snapshot())
 
     # --- \ucd94\uac00\ub41c \uba54\uc11c\ub4dc: TF2\ub97c \uc0ac\uc6a9\ud558\uc5ec \ub85c\ubd07 \uc790\uc138 \uc5c5\ub370\uc774\ud2b8 ---
     def update_robot_pose(self):
@@ -68,7 +144,10 @@ class ExplorerNode(Node):
         try:
             # 'map' \ud504\ub808\uc784 \uae30\uc900\uc73c\ub85c 'base_link'\uc758 transform\uc744 \uc870\ud68c\ud569\ub2c8\ub2e4.
             trans = self.tf_buffer.lookup_transform('map', 'base_link', rclpy.time.Time())
-            self.robot_pose = trans.transform
+            pose_2d = self.pose_to_2d(trans.transform)
+            with self.state_lock:
+                self.robot_pose = trans.transform
+                self.robot_pose_2d = pose_2d
 
             # \ud0d0\uc0c9 \uc2dc\uc791 \uc704\uce58\ub97c \ud55c \ubc88\ub9cc \uae30\ub85d\ud569\ub2c8\ub2e4.
             if self.start_position is None and self.robot_pose is not None:
@@ -90,23 +169,39 @@ class ExplorerNode(Node):
         nav_goal.pose = goal_msg
 
         self.get_logger().info(f"Navigating to goal: x={x:.2f}, y={y:.2f}")
+        self.goal_seq += 1
+        self.current_goal = (x, y)
 
         self.nav_to_pose_client.wait_for_server()
         send_goal_future = self.nav_to_pose_client.send_goal_async(nav_goal)
-        send_goal_future.add_done_callback(self.goal_response_callback)
+        # 콜백에 목표 번호와 좌표를 묶어, 결과가 늦게 와도 그 목표 기준으로 처리합니다.
+        send_goal_future.add_done_callback(partial(self.goal_response_callback, self.goal_seq, (x, y)))
 
-    def goal_response_callback(self, future):
+    def goal_response_callback(self, seq, goal, future):
         goal_handle = future.result()
         if not goal_handle.accepted:
             self.get_logger().warning("Goal rejected!")
+            self.blacklist_goal(seq, goal, "rejected")
             return
         result_future = goal_handle.get_result_async()
-        result_future.add_done_callback(self.navigation_complete_callback)
+        result_future.add_done_callback(partial(self.navigation_complete_callback, seq, goal))
 
-    def navigation_complete_callback(self, future):
+    def navigation_complete_callback(self, seq, goal, future):
+        # 새 목표가 이 목표를 선점했거나 직접 취소한 경우, 그 결과는 목표 지역의 실패가 아닙니다.
+        if seq != self.goal_seq:
+            self.get_logger().info(f"Ignoring result of preempted goal ({goal[0]:.2f}, {goal[1]:.2f}).")
+            return
         try:
             result = future.result().result
+            status = future.result().status
             # self.get_logger().info(f"Navigation completed with result: {result}")
+            if status == GoalStatus.STATUS_CANCELED:
+                self.get_logger().info(f"Goal ({goal[0]:.2f}, {goal[1]:.2f}) was canceled.")
+                return
+
+            # 탐사 중 목표에 도달하지 못했다면 해당 지역을 블랙리스트에 기록합니다.
+            if status != GoalStatus.STATUS_SUCCEEDED and self.state == 'EXPLORING':
+                self.blacklist_goal(seq, goal, f"status={status}")
 
             # --- \ub85c\uc9c1 \ucd94\uac00: \ubcf5\uadc0 \uc0c1\ud0dc\uc5d0\uc11c \ub124\ube44\uac8c\uc774\uc158\uc774 \uc644\ub8cc\ub418\uba74 \ub9f5 \uc800\uc7a5 ---
             if self.state == 'RETURNING_HOME':
@@ -115,85 +210,31 @@ class ExplorerNode(Node):
 
         except Exception as e:
             self.get_logger().error(f"Navigation failed: {e}")
+            if self.state == 'EXPLORING':
+                self.blacklist_goal(seq, goal, "exception")
             # --- \ub85c\uc9c1 \ucd94\uac00: \ubcf5\uadc0 \uc911 \ub124\ube44\uac8c\uc774\uc158 \uc2e4\ud328 \uc2dc\uc5d0\ub3c4 \ub9f5 \uc800\uc7a5 ---
             if self.state == 'RETURNING_HOME':
                 self.get_logger().error("Failed to return to start. Saving map at current location and shutting down.")
                 self.save_map_and_shutdown()
 
-    def find_frontiers(self, map_array):
-        """
-        Detect frontiers in the occupancy grid map.
-        A frontier is a free cell that has an unknown neighbor.
-        """
-        frontiers = []
-        rows, cols = map_array.shape
-
-        for r in range(1, rows - 1):
-            for c in range(1, cols - 1):
-                # '0'\uc740 \ube44\uc5b4\uc788\ub294 \uacf5\uac04(free space)\uc744 \uc758\ubbf8\ud569\ub2c8\ub2e4.
-                if map_array[r, c] == 0:
-                    # 8\ubc29\ud5a5\uc758 \uc774\uc6c3 \uc140\ub4e4\uc744 \ud655\uc778\ud569\ub2c8\ub2e4.
-                    neighbors = map_array[r-1:r+2, c-1:c+2]
-                    # \uc774\uc6c3 \uc911\uc5d0 '-1'(unknown)\uc774 \ud558\ub098\ub77c\ub3c4 \uc788\ub2e4\uba74 \ud504\ub860\ud2f0\uc5b4\ub85c \uac04\uc8fc\ud569\ub2c8\ub2e4.
-                    if np.any(neighbors == -1):
-                        frontiers.append((r, c))
-
-        return frontiers
-
-    def choose_frontier(self, frontiers):
-        """
-        Choose the closest frontier that is in front of the robot.
-        """
-        if self.robot_pose is None:
-            self.get_logger().warning("Robot pose is not available yet. Cannot choose a frontier.")
-            return None
-
-        # \ub85c\ubd07\uc758 \ud604\uc7ac \uc704\uce58 (map \uc88c\ud45c\uacc4)
-        robot_x = self.robot_pose.translation.x
-        robot_y = self.robot_pose.translation.y
-
+    def blacklist_goal(self, seq, goal, reason):
+        """실패한 목표 주변을 블랙리스트에 기록하여 인접 셀이 다시 선택되지 않도록 합니다."""
+        if self.state != 'EXPLORING':
+            return
+        x, y = goal
+        # 이 콜백은 네비게이션 스레드에서 실행되므로, planner에는 계획 스레드가 다음 explore()에서 반영합니다.
+        self.pending_failures.append((x, y))
+        self.get_logger().warning(f"Blacklisted goal region around ({x:.2f}, {y:.2f}) ({reason}).")
+        if seq == self.goal_seq:
+            self.current_goal = None
+
+    def pose_to_2d(self, transform):
+        """TF로 얻은 로봇 자세를 planner가 사용하는 (x, y, yaw) 튜플로 변환합니다."""
         # \ub85c\ubd07\uc758 \ud604\uc7ac \ubc29\ud5a5 (yaw)\uc744 \ucffc\ud130\ub2c8\uc5b8\uc73c\ub85c\ubd80\ud130 \uacc4\uc0b0\ud569\ub2c8\ub2e4.
-        orientation_q = self.robot_pose.rotation
+        orientation_q = transform.rotation
         _, _, robot_yaw = euler_from_quaternion([
             orientation_q.x, orientation_q.y, orientation_q.z, orientation_q.w])
-
-        min_distance = float('inf')
-        chosen_frontier = None
-
-        for frontier in frontiers:
-            if frontier in self.visited_frontiers:
-                continue
-
-            # \ud504\ub860\ud2f0\uc5b4\uc758 \uc6d4\ub4dc \uc88c\ud45c\ub97c \uacc4\uc0b0\ud569\ub2c8\ub2e4.
-            frontier_x = frontier[1] * self.map_data.info.resolution + self.map_data.info.origin.position.x
-            frontier_y = frontier[0] * self.map_data.info.resolution + self.map_data.info.origin.position.y
-
-            # \ub85c\ubd07 \uc704\uce58\uc5d0\uc11c \ud504\ub860\ud2f0\uc5b4\ub85c \ud5a5\ud558\ub294 \uac01\ub3c4\ub97c \uacc4\uc0b0\ud569\ub2c8\ub2e4.
-            angle_to_frontier = math.atan2(frontier_y - robot_y, frontier_x - robot_x)
-
-            # \ub85c\ubd07\uc758 \ud604\uc7ac \ubc29\ud5a5\uacfc \ud504\ub860\ud2f0\uc5b4\ub85c\uc758 \ubc29\ud5a5 \ucc28\uc774\ub97c \uacc4\uc0b0\ud569\ub2c8\ub2e4.
-            angle_diff = abs(robot_yaw - angle_to_frontier)
-            # \uac01\ub3c4 \ucc28\uc774\uac00 180\ub3c4(pi)\ub97c \ub118\uc9c0 \uc54a\ub3c4\ub85d \uc815\uaddc\ud654\ud569\ub2c8\ub2e4.
-            if angle_diff > math.pi:
-                angle_diff = 2 * math.pi - angle_diff
-
-            # \ub85c\ubd07\uc758 \uc804\ubc29 \uc2dc\uc57c\uac01(\uc5ec\uae30\uc11c\ub294 +/- 90\ub3c4, \uc989 1.57 \ub77c\ub514\uc548) \ub0b4\uc5d0 \uc788\ub294\uc9c0 \ud655\uc778\ud569\ub2c8\ub2e4.
-            if angle_diff > (11 * math.pi / 12.0):
-                continue
-
-            # \uc804\ubc29\uc5d0 \uc788\ub294 \ud504\ub860\ud2f0\uc5b4 \uc911\uc5d0\uc11c \uac00\uc7a5 \uac00\uae4c\uc6b4 \uac83\uc744 \uc120\ud0dd\ud569\ub2c8\ub2e4.
-            distance = math.sqrt((robot_x - frontier_x)**2 + (robot_y - frontier_y)**2)
-            if distance < min_distance:
-                min_distance = distance
-                chosen_frontier = frontier
-
-        if chosen_frontier:
-            self.visited_frontiers.add(chosen_frontier)
-            self.get_logger().info(f"Chosen FORWARD frontier: {chosen_frontier} at distance {min_distance:.2f}m")
-        else:
-            self.get_logger().warning("No valid frontier found in front of the robot.")
-
-        return chosen_frontier
+        return (transform.translation.x, transform.translation.y, robot_yaw)
 
     # --- \ucd94\uac00\ub41c \uba54\uc11c\ub4dc: \ub9f5 \uc800\uc7a5 \ubc0f \ub178\ub4dc \uc885\ub8cc ---
     def save_map_and_shutdown(self):
@@ -207,6 +248,7 @@ class ExplorerNode(Node):
         # \ub354 \uc774\uc0c1 \ud0d0\uc0c9/\uc790\uc138 \uc5c5\ub370\uc774\ud2b8 \ud0c0\uc774\uba38\uac00 \ub3cc\uc9c0 \uc54a\ub3c4\ub85d \ucde8\uc18c
         self.timer.cancel()
         self.pose_update_timer.cancel()
+        self.checkpoint_timer.cancel()
 
         # 탐사 종료 메시지 발행
         status_msg = String()
@@ -214,21 +256,23 @@ class ExplorerNode(Node):
         self.status_publisher.publish(status_msg)
         self.get_logger().info("Published 'end' to /exploration_status topic.")
         # 메시지가 확실히 발행되도록 잠시 대기
-        self.create_timer(1.0, self._shutdown_node, oneshot=True)
+        self.create_timer(1.0, self._shutdown_node, oneshot=True, callback_group=self.planning_group)
 
     def _shutdown_node(self):
-        map_file_path = os.path.join(os.path.expanduser('~'), 'my_explored_map')
+        map_file_path = self.map_file_path
         self.get_logger().info(f"Saving map to {map_file_path}...")
+        self.checkpoint_writer.stop()
 
-        try:
-            # ros2 run nav2_map_server map_saver_cli -f <file_path> 명령어 실행
-            subprocess.run(
-                ['ros2', 'run', 'nav2_map_server', 'map_saver_cli', '-f', map_file_path],
-                check=True, timeout=30
-            )
-            self.get_logger().info("Map saved successfully!")
-        except (subprocess.CalledProcessError, FileNotFoundError, subprocess.TimeoutExpired) as e:
-            self.get_logger().error(f"Failed to save map: {e}")
+        if self.map_data is None:
+            self.get_logger().error("Failed to save map: no map data received.")
+        else:
+            try:
+                # 보유 중인 지도를 PGM+YAML(+PNG/NPZ)로 직접 저장합니다. (map_saver_cli와 같은 형식)
+                start = time.monotonic()
+                write_map(map_file_path, *self.map_snapshot(), extra_formats=self.map_extra_formats)
+                self.get_logger().info(f"Map saved successfully in {(time.monotonic() - start) * 1000:.1f} ms!")
+            except OSError as e:
+                self.get_logger().error(f"Failed to save map: {e}")
 
         self.get_logger().info("Shutting down explorer node.")
         # 노드를 안전하게 종료하고 rclpy를 shutdown 시킵니다.
@@ -249,29 +293,27 @@ class ExplorerNode(Node):
             self.get_logger().info("Waiting for start position to be captured...")
             return
 
-        map_array = np.array(self.map_data.data).reshape(
-            (self.map_data.info.height, self.map_data.info.width))
+        # 지도와 자세를 한 번에 스냅샷으로 가져온 뒤, 락 없이 계획을 계산합니다.
+        # 계산 중에도 지도 수신/자세 갱신/네비게이션 콜백은 다른 스레드에서 계속 처리됩니다.
+        map_array, resolution, origin, pose, changes = self.planning_snapshot()
+        while self.pending_failures:
+            self.planner.record_failure(*self.pending_failures.popleft())
 
-        frontiers = self.find_frontiers(map_array)
+        status, goal = self.planner.plan(map_array, resolution, origin, pose, changed=changes)
 
         # --- \ub85c\uc9c1 \uc218\uc815: \ud504\ub860\ud2f0\uc5b4\uac00 \ub354 \uc774\uc0c1 \uc5c6\uc73c\uba74 \ubcf5\uadc0 \uc0c1\ud0dc\ub85c \uc804\ud658 ---
-        if not frontiers:
+        if status == ExplorationPlanner.NO_FRONTIERS:
 
             self.state = 'RETURNING_HOME'
             self.navigate_to(self.start_position[0], self.start_position[1])
             return
 
-        chosen_frontier = self.choose_frontier(frontiers)
-
-        if not chosen_frontier:
+        if goal is None:
             self.frontier_failure_count += 1
             self.get_logger().warning(f"Failed to find a valid frontier to explorer. Failure count: {self.frontier_failure_count}")
         else:
             self.frontier_failure_count = 0
-
-            goal_x = chosen_frontier[1] * self.map_data.info.resolution + self.map_data.info.origin.position.x
-            goal_y = chosen_frontier[0] * self.map_data.info.resolution + self.map_data.info.origin.position.y
-            self.navigate_to(goal_x, goal_y)
+            self.navigate_to(goal[0], goal[1])
         # If failed twice, return to the recorded start position
         if self.frontier_failure_count == 40:
             self.get_logger().info("No more frontiers to explore. Exploration Complete!")
@@ -283,11 +325,15 @@ class ExplorerNode(Node):
 def main(args=None):
     rclpy.init(args=args)
     explorer_node = ExplorerNode()
+    # 지도 수신, 자세 갱신, 탐사 계획, 네비게이션 콜백이 서로 기다리지 않도록 멀티스레드 실행기를 사용합니다.
+    executor = MultiThreadedExecutor(num_threads=4)
+    executor.add_node(explorer_node)
     try:
-        rclpy.spin(explorer_node)
+        executor.spin()
     except KeyboardInterrupt:
         explorer_node.get_logger().info("Exploration stopped by user")
     finally:
+        executor.shutdown()
         # \ub178\ub4dc\uac00 \uc774\ubbf8 destroy_node()\uc640 rclpy.shutdown()\uc73c\ub85c \uc885\ub8cc\ub418\uc5c8\uc744 \uc218 \uc788\uc73c\ubbc0\ub85c
         # rclpy.ok()\ub97c \ud655\uc778\ud558\uc5ec \uc911\ubcf5 \ud638\ucd9c\uc744 \ubc29\uc9c0\ud569\ub2c8\ub2e4.
         if rclpy.ok():
@@ -296,10 +342,3 @@ def main(args=None):
 
 if __name__ == '__main__':
     main()
-
-
-if self.flagcount < 3
-    if distance >
-
-else
-    if distance
\ No newline at end of file
@@ -0,0 +1,164 @@
+import io
+import math
+import os
+import struct
+import tempfile
+import threading
+import time
+import zlib
+
+import numpy as np
+
+# nav2 map_saver_cli의 기본값과 동일한 trinary 임계값
+OCCUPIED_THRESH = 0.65
+FREE_THRESH = 0.25
+
+# PGM 픽셀 값 (map_saver와 동일: 점유=0, 빈 공간=254, 미탐색=205)
+PIXEL_OCCUPIED = 0
+PIXEL_FREE = 254
+PIXEL_UNKNOWN = 205
+
+
+def quaternion_to_yaw(x, y, z, w):
+    """쿼터니언에서 yaw(라디안)만 계산합니다."""
+    return math.atan2(2.0 * (w * z + x * y), 1.0 - 2.0 * (y * y + z * z))
+
+
+def occupancy_to_image(grid):
+    """
+    점유 격자(int8, -1~100)를 map_saver trinary 규칙에 따라 8비트 이미지로 변환합니다.
+    ROS 격자는 0번 행이 y 최소값이므로, 이미지 좌표계에 맞게 상하를 뒤집습니다.
+    """
+    grid = np.asarray(grid)
+    image = np.full(grid.shape, PIXEL_UNKNOWN, dtype=np.uint8)
+    image[(grid >= 0) & (grid <= FREE_THRESH * 100)] = PIXEL_FREE
+    image[grid >= OCCUPIED_THRESH * 100] = PIXEL_OCCUPIED
+    return np.ascontiguousarray(image[::-1])
+
+
+def encode_pgm(image):
+    height, width = image.shape
+    return f"P5\n{width} {height}\n255\n".encode('ascii') + image.tobytes()
+
+
+def encode_png(image, level=6):
+    """외부 의존성 없이 zlib으로 8비트 grayscale PNG를 만듭니다."""
+    height, width = image.shape
+
+    def chunk(tag, data):
+        return (struct.pack('>I', len(data)) + tag + data
+                + struct.pack('>I', zlib.crc32(tag + data) & 0xffffffff))
+
+    # 각 행 앞에 filter type 0(None) 바이트를 붙입니다.
+    raw = np.zeros((height, width + 1), dtype=np.uint8)
+    raw[:, 1:] = image
+    header = struct.pack('>IIBBBBB', width, height, 8, 0, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header)
+            + chunk(b'IDAT', zlib.compress(raw.tobytes(), level)) + chunk(b'IEND', b''))
+
+
+def encode_yaml(image_name, resolution, origin):
+    return (f"image: {image_name}\n"
+            f"mode: trinary\n"
+            f"resolution: {resolution}\n"
+            f"origin: [{origin[0]}, {origin[1]}, {origin[2]}]\n"
+            f"negate: 0\n"
+            f"occupied_thresh: {OCCUPIED_THRESH}\n"
+            f"free_thresh: {FREE_THRESH}\n").encode('ascii')
+
+
+def atomic_write(path, data):
+    """같은 디렉토리의 임시 파일에 쓴 뒤 os.replace로 교체하여, 중간에 죽어도 파일이 깨지지 않게 합니다."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_map(path_base, grid, resolution, origin, extra_formats=()):
+    """
+    점유 격자를 <path_base>.pgm + <path_base>.yaml 로 저장합니다 (map_server에서 바로 로드 가능).
+    extra_formats에 'png' 또는 'npz'를 넣으면 압축된 사본도 함께 저장합니다.
+    origin은 (x, y, yaw) 입니다. 저장한 파일 경로 목록을 반환합니다.
+    """
+    grid = np.asarray(grid, dtype=np.int8)
+    image = occupancy_to_image(grid)
+    written = []
+
+    pgm_path = path_base + '.pgm'
+    atomic_write(pgm_path, encode_pgm(image))
+    written.append(pgm_path)
+
+    if 'png' in extra_formats:
+        png_path = path_base + '.png'
+        atomic_write(png_path, encode_png(image))
+        written.append(png_path)
+
+    if 'npz' in extra_formats:
+        # 원본 격자 값(-1~100)을 그대로 보존하는 압축 사본
+        npz_path = path_base + '.npz'
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, data=grid, resolution=resolution, origin=np.asarray(origin))
+        atomic_write(npz_path, buffer.getvalue())
+        written.append(npz_path)
+
+    # YAML은 이미지가 모두 준비된 뒤 마지막에 교체합니다.
+    yaml_path = path_base + '.yaml'
+    atomic_write(yaml_path, encode_yaml(os.path.basename(pgm_path), resolution, origin))
+    written.append(yaml_path)
+    return written
+
+
+class MapSnapshotWriter(threading.Thread):
+    """
+    지도 체크포인트를 백그라운드 스레드에서 저장하는 클래스.
+    submit()은 가장 최신 스냅샷 하나만 보관하므로(latest-wins), 저장이 밀려도 메모리가 늘지 않습니다.
+    """
+    def __init__(self, path_base, extra_formats=(), logger=None):
+        super().__init__()
+        self.daemon = True
+        self.path_base = path_base
+        self.extra_formats = tuple(extra_formats)
+        self.logger = logger
+        self._lock = threading.Lock()
+        self._pending = None
+        self._wakeup = threading.Event()
+        self._shutdown_event = threading.Event()
+        self.last_saved_time = None
+
+    def submit(self, grid, resolution, origin):
+        """저장할 스냅샷을 등록합니다. 아직 저장되지 않은 이전 스냅샷은 덮어씁니다."""
+        with self._lock:
+            self._pending = (np.array(grid, dtype=np.int8, copy=True), resolution, tuple(origin))
+        self._wakeup.set()
+
+    def run(self):
+        while not self._shutdown_event.is_set():
+            self._wakeup.wait()
+            self._wakeup.clear()
+            with self._lock:
+                job, self._pending = self._pending, None
+            if job is None:
+                continue
+            start = time.monotonic()
+            try:
+                write_map(self.path_base, *job, extra_formats=self.extra_formats)
+                self.last_saved_time = time.time()
+                if self.logger:
+                    self.logger.info(f"Map checkpoint saved to {self.path_base} in {(time.monotonic() - start) * 1000:.1f} ms")
+            except OSError as e:
+                if self.logger:
+                    self.logger.error(f"Failed to save map checkpoint: {e}")
+
+    def stop(self):
+        self._shutdown_event.set()
+        self._wakeup.set()
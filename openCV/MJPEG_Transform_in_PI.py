@@ -1,26 +1,18 @@
-from picamera2 import Picamera2
-import cv2
+from camera_backend import open_camera
 
-# Initialize the Picamera2
-picam2 = Picamera2()
-picam2.preview_configuration.main.size = (1280, 720)
-picam2.preview_configuration.main.format = "RGB888"
-picam2.preview_configuration.align()
-picam2.configure("preview")
-picam2.start()
+# Initialize the camera
+# (hardware MJPEG encoder first, then software JPEG, or a fake camera on dev machines)
+camera = open_camera(size=(1280, 720), fps=30, quality=95)
 
 # This function captures video frames from the Raspberry Pi camera
 # and converts them into an MJPEG stream format. It does NOT perform inference.
 def gen_frames():
     while True:
-        # Capture frame-by-frame
-        frame = picam2.capture_array("main")
-
-        # Encode the frame as a JPEG image
-        ret, buffer = cv2.imencode('.jpg', frame)
-        if not ret:
+        # Capture frame-by-frame (already JPEG-encoded by the camera backend)
+        frame = camera.read()
+        if frame is None:
             continue
 
-        frame_bytes = buffer.tobytes()
+        frame_bytes = frame.data
         yield (b'--frame\r\n'
                b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
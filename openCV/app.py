@@ -1,16 +1,21 @@
 # app.py
-from flask import Flask, Response, request, render_template_string
+from flask import Flask, Response, request, render_template_string, jsonify
 import cv2
+import threading
 import time
 import os
 from ultralytics import YOLO
+from frame_source import LatestSlot, RtspSource
 
 # ===== 설정 =====
 RTSP_URL   = "rtsp://127.0.0.1:8554/cam?tcp"
 MODEL_PATH = "models/best_updated.pt" # 모델 파일명
 IMG_SIZE   = 640                  # 512~640 권장
 CONF_THRES = 0.40                 # 신뢰도 임계값
-SHOW_ONLY_DAMAGE = True          # True=손상 계열만 표시, False=모든 클>DAMAGE_KEYWORDS = ["damage", "damaged", "defect", "broken", "fail"]
+SHOW_ONLY_DAMAGE = True          # True=손상 계열만 표시, False=모든 클래스 표시
+DAMAGE_KEYWORDS = ["damage", "damaged", "defect", "broken", "fail"]
+JPEG_QUALITY = 80                 # /video로 내보내는 MJPEG 품질
+ERROR_BACKOFF_SEC = 0.5           # 추론 오류 후 다음 프레임까지 쉬는 시간 (같은 오류로 로그가 넘치지 않게)
 
 # (보안) 토큰 방식의 아주 단순한 인증
 # 환경변수 APP_TOKEN 을 우선 사용, 없으면 하드코드 값
@@ -26,14 +31,104 @@ damage_class_idxs = []
 if SHOW_ONLY_DAMAGE and names:
     try:
         # names 가 dict 또는 list 인 모든 경우 처리
-        iterable = names.items() if isinstance(names, dict) else enumer>        for idx, name in iterable:
+        iterable = names.items() if isinstance(names, dict) else enumerate(names)
+        for idx, name in iterable:
             lname = str(name).lower()
             if any(k in lname for k in DAMAGE_KEYWORDS):
                 damage_class_idxs.append(int(idx))
     except Exception as e:
         print("[WARN] damage 라벨 탐색 중 예외:", e)
-        yield (b"--frame\r\n"
-               b"Content-Type: image/jpeg\r\n\r\n" + jpg.tobytes() + b">
+
+
+# ===== 공유 파이프라인 =====
+# 시청자 수와 관계없이 RTSP 디코딩 1회, YOLO 추론 1회만 수행하고,
+# 인코딩된 MJPEG 파트 하나를 모든 /video 클라이언트가 참조로 공유합니다.
+
+class InferenceThread(threading.Thread):
+    """
+    최신 프레임에 YOLO 추론을 수행하고 결과 이미지를 MJPEG 파트로 한 번만 인코딩해 방송 슬롯에 넣는 스레드.
+    추론이 카메라보다 느리면 중간 프레임은 건너뛰고 항상 가장 최근 프레임을 처리합니다.
+    """
+    def __init__(self, source, parts):
+        super().__init__()
+        self.daemon = True
+        self.source = source
+        self.parts = parts
+        self.is_running = True
+        self.processed = 0
+        self.last_infer_ms = 0.0
+        self.errors = 0
+
+    def run(self):
+        sequence = 0
+        classes = damage_class_idxs if (SHOW_ONLY_DAMAGE and damage_class_idxs) else None
+        while self.is_running:
+            item = self.source.wait_newer(sequence, timeout=1.0)
+            if item is None:
+                continue
+            sequence = item.sequence
+            frame = item.image
+            try:
+                start = time.time()
+                results = model(frame, imgsz=IMG_SIZE, conf=CONF_THRES, classes=classes, verbose=False)
+                annotated = results[0].plot()
+                self.last_infer_ms = (time.time() - start) * 1000
+                ok, jpg = cv2.imencode(".jpg", annotated, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+            except Exception as e:
+                # 프레임 하나/모델 오류로 스레드가 죽으면 모든 /video 시청자가 멈추므로, 기록하고 다음 프레임으로 넘어갑니다.
+                self.errors += 1
+                print(f"[ERROR] 추론 중 예외 (프레임 {sequence}, 누적 {self.errors}회): {e}")
+                time.sleep(ERROR_BACKOFF_SEC)
+                continue
+            if not ok:
+                continue
+            self.processed += 1
+            # 멀티파트 헤더까지 붙인 완성된 파트를 만들어 두면, 클라이언트마다 바이트를 다시 만들 필요가 없습니다.
+            self.parts.put(b"--frame\r\n"
+                           b"Content-Type: image/jpeg\r\n\r\n" + jpg.tobytes() + b"\r\n")
+
+    def stop(self):
+        self.is_running = False
+
+
+# 그래버: RTSP를 쉬지 않고 읽어 가장 최신 프레임만 남기는 소스 (재연결/통계는 FrameSource가 담당)
+grabber = RtspSource(RTSP_URL)
+part_slot = LatestSlot()    # 추론 -> 방송: 완성된 MJPEG 파트 (bytes)
+inference = InferenceThread(grabber, part_slot)
+_pipeline_lock = threading.Lock()
+_pipeline_started = False
+viewer_count = 0
+
+
+def start_pipeline():
+    """그래버/추론 스레드를 한 번만 시작합니다 (여러 번 호출해도 안전)."""
+    global _pipeline_started
+    with _pipeline_lock:
+        if not _pipeline_started:
+            grabber.start()
+            inference.start()
+            _pipeline_started = True
+
+
+def gen():
+    """
+    /video 클라이언트 하나에 대한 제너레이터.
+    디코딩/추론 없이 방송 슬롯의 최신 파트를 기다렸다가 그대로 보냅니다. 느린 클라이언트는 중간 파트를 건너뜁니다.
+    """
+    global viewer_count
+    with _pipeline_lock:
+        viewer_count += 1
+    sequence = 0
+    try:
+        while True:
+            sequence, part = part_slot.wait_newer(sequence, timeout=5.0)
+            if part is not None:
+                yield part
+    finally:
+        with _pipeline_lock:
+            viewer_count -= 1
+
+
 # ===== 간단 인증 (토큰) =====
 @app.before_request
 def simple_auth():
@@ -47,7 +142,8 @@ def simple_auth():
 # ===== 라우트 =====
 @app.route("/")
 def index():
-    # 편의상 링크 제공(여기 문자열의 token 값을 실제 비밀번호로 바꿔서 >    return render_template_string("""
+    # 편의상 링크 제공(여기 문자열의 token 값을 실제 비밀번호로 바꿔서 사용)
+    return render_template_string("""
     <h3>RTSP→YOLO→Flask 데모</h3>
     <p><a href="/video?token={{token}}">/video 열기</a></p>
     """, token=APP_TOKEN)
@@ -56,9 +152,26 @@ def index():
 def health():
     return "OK"
 
+@app.route("/stats")
+def stats():
+    # 파이프라인 상태 (시청자 수와 무관하게 수신/추론 프레임 수는 한 번씩만 증가)
+    return jsonify({
+        "rtsp_connected": grabber.connected,
+        "source": grabber.stats.snapshot(),
+        "processed_frames": inference.processed,
+        "last_infer_ms": round(inference.last_infer_ms, 1),
+        "inference_errors": inference.errors,
+        "viewers": viewer_count,
+    })
+
 @app.route("/video")
 def video():
-    return Response(gen(), mimetype="multipart/x-mixed-replace; boundar>
-if __name__ == "__main__":                                                  # Ultralytics 경고 제거용(선택)
-    os.makedirs(os.path.expanduser("~/.config/Ultralytics"), exist_ok=T>    os.environ.setdefault("YOLO_CONFIG_DIR", os.path.expanduser("~/.con>
+    start_pipeline()
+    return Response(gen(), mimetype="multipart/x-mixed-replace; boundary=frame")
+
+if __name__ == "__main__":
+    # Ultralytics 경고 제거용(선택)
+    os.makedirs(os.path.expanduser("~/.config/Ultralytics"), exist_ok=True)
+    os.environ.setdefault("YOLO_CONFIG_DIR", os.path.expanduser("~/.config/Ultralytics"))
+    start_pipeline()
     app.run(host="0.0.0.0", port=8080, threaded=True)
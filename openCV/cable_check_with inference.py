@@ -1,52 +1,181 @@
 from ultralytics import YOLO
-from picamera2 import Picamera2
+from camera_backend import open_capture_camera
+from frame_source import LatestSlot
 import cv2
+import numpy as np
+import os
+import threading
+import time
 
-# Initialize the Picamera2
-picam2 = Picamera2()
-picam2.preview_configuration.main.size = (1280, 720)
-picam2.preview_configuration.main.format = "RGB888"
-picam2.preview_configuration.align()
-picam2.configure("preview")
-picam2.start()
+# ===== Settings =====
+MODEL_PATH = "/home/pi/best_reversion_ncnn_model"
+IMG_SIZE = 640
+WARNING_CLASS_NAME = 'warning'
+WARNING_CONF_THRES = 0.7
+# Threads used by NCNN for one inference. Capture and annotate/encode run on their own threads,
+# so leaving one core free for them is usually faster than giving NCNN all four.
+NCNN_THREADS = int(os.environ.get("NCNN_THREADS", max((os.cpu_count() or 4) - 1, 1)))
+STATS_INTERVAL = 5.0 # seconds between per-stage timing reports
 
-ncnn_model = YOLO("/home/pi/best_reversion_ncnn_model",task='detect')
+# Initialize the camera
+# (inference needs raw frames only, so the camera is opened without the JPEG encoder or lores stream;
+#  capture_array() waits for the next frame, which paces the capture stage to the camera FPS.
+#  On dev machines the fake camera is used instead.)
+camera = open_capture_camera(size=(1280, 720), fps=30)
 
-def gen_frames():
-    while True:
-        # Capture frame-by-frame
-        frame = picam2.capture_array("main")
-
-        # Run YOLO inference on the frame
-        results = ncnn_model(frame)
-        
-        class_names = results[0].names
-        warning_class_index = -1
-        for idx, name in class_names.items():
-            if name == 'warning':
-                warning_class_index = idx
+ncnn_model = YOLO(MODEL_PATH, task='detect')
+
+# Resolve the 'warning' class index once at load time instead of scanning names on every frame
+warning_class_index = -1
+for idx, name in ncnn_model.names.items():
+    if name == WARNING_CLASS_NAME:
+        warning_class_index = idx
+        break
+
+
+def configure_ncnn_threads(model, num_threads):
+    """Run one warm-up inference so the NCNN net is loaded, then set its thread count."""
+    model(np.zeros((IMG_SIZE, IMG_SIZE, 3), dtype=np.uint8), imgsz=IMG_SIZE, verbose=False)
+    net = getattr(model.predictor.model, 'net', None)
+    if net is not None:
+        # Every extractor created for later inferences copies these options
+        net.opt.num_threads = num_threads
+        print(f"[Pipeline] NCNN num_threads = {num_threads}")
+
+
+class StageTimer:
+    """Collects processing time and throughput for one pipeline stage."""
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._count = 0
+        self._total_ms = 0.0
+        self._max_ms = 0.0
+        self._start = time.time()
+
+    def record(self, elapsed_ms):
+        with self._lock:
+            self._count += 1
+            self._total_ms += elapsed_ms
+            self._max_ms = max(self._max_ms, elapsed_ms)
+
+    def snapshot(self, reset=True):
+        with self._lock:
+            elapsed = max(time.time() - self._start, 1e-6)
+            stats = {
+                'stage': self.name,
+                'fps': round(self._count / elapsed, 2),
+                'avg_ms': round(self._total_ms / self._count, 1) if self._count else None,
+                'max_ms': round(self._max_ms, 1),
+            }
+            if reset:
+                self._count, self._total_ms, self._max_ms, self._start = 0, 0.0, 0.0, time.time()
+            return stats
+
+
+class PipelineStage(threading.Thread):
+    """
+    One pipeline stage on its own thread.
+    It waits for the newest item in its input slot (skipping stale ones), processes it and puts the result in its output slot.
+    """
+    def __init__(self, name, process, input_slot, output_slot):
+        super().__init__()
+        self.daemon = True
+        self.process = process
+        self.input_slot = input_slot
+        self.output_slot = output_slot
+        self.timer = StageTimer(name)
+        self.is_running = True
+
+    def run(self):
+        sequence = 0
+        while self.is_running:
+            if self.input_slot is None:
+                item = None # the capture stage has no input and paces itself on the camera
+            else:
+                sequence, item = self.input_slot.wait_newer(sequence, timeout=1.0)
+                if item is None:
+                    continue
+            start = time.time()
+            result = self.process(item)
+            self.timer.record((time.time() - start) * 1000)
+            if result is not None:
+                self.output_slot.put(result)
+
+    def stop(self):
+        self.is_running = False
+
+
+# ===== Stage functions =====
+def capture_stage(_):
+    # Capture frame-by-frame
+    return time.time(), camera.capture_array()
+
+
+def inference_stage(item):
+    captured_at, frame = item
+    # Run YOLO inference on the frame
+    results = ncnn_model(frame, imgsz=IMG_SIZE, verbose=False)
+    return captured_at, frame, results[0]
+
+
+def annotate_encode_stage(item):
+    captured_at, frame, result = item
+    # Visualize the results on the frame
+    annotated_frame = result.plot()
+    boxes = result.boxes
+
+    error_message = ""
+    if warning_class_index != -1:
+        for box in boxes:
+            if int(box.cls) == warning_class_index and box.conf.item() > WARNING_CONF_THRES:
+                error_message = "ERROR Detection!"
                 break
-				
-        # Visualize the results on the frame
-        annotated_frame = results[0].plot()
-        boxes = results[0].boxes
-
-        
-        error_message = ""
-        if warning_class_index != -1:
-            for box in boxes:
-                if box.cls == warning_class_index and box.conf.item() > 0.7:
-                    error_message = "ERROR Detection!"
-                    break
-        
-        if error_message:
-            cv2.putText(annotated_frame, error_message, (10, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2, cv2.LINE_AA)
-        
-        ret, buffer = cv2.imencode('.jpg', annotated_frame)
-        if not ret:
-            continue  # ? now legal, because it's inside a while loop
-
-        frame_bytes = buffer.tobytes()
-        yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
 
+    if error_message:
+        cv2.putText(annotated_frame, error_message, (10, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2, cv2.LINE_AA)
+
+    ret, buffer = cv2.imencode('.jpg', annotated_frame)
+    if not ret:
+        return None
+
+    frame_bytes = buffer.tobytes()
+    latency_timer.record((time.time() - captured_at) * 1000)
+    return (b'--frame\r\n'
+            b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
+
+
+# ===== Pipeline: capture -> inference -> annotate/encode, connected by latest-frame slots =====
+captured_slot = LatestSlot()
+inferred_slot = LatestSlot()
+part_slot = LatestSlot()
+latency_timer = StageTimer('capture->encoded')
+stages = [
+    PipelineStage('capture', capture_stage, None, captured_slot),
+    PipelineStage('inference', inference_stage, captured_slot, inferred_slot),
+    PipelineStage('annotate+encode', annotate_encode_stage, inferred_slot, part_slot),
+]
+
+
+def report_stats():
+    """Print per-stage throughput and timings every STATS_INTERVAL seconds."""
+    while True:
+        time.sleep(STATS_INTERVAL)
+        for stats in [stage.timer.snapshot() for stage in stages] + [latency_timer.snapshot()]:
+            print(f"[Pipeline] {stats['stage']:<16} {stats['fps']:>6.2f} FPS  "
+                  f"avg {stats['avg_ms'] or 0:>7.1f} ms  max {stats['max_ms']:>7.1f} ms")
+
+
+configure_ncnn_threads(ncnn_model, NCNN_THREADS)
+for stage in stages:
+    stage.start()
+threading.Thread(target=report_stats, daemon=True).start()
+
+
+def gen_frames():
+    # Every viewer shares the same encoded part; a slow viewer simply skips to the newest one
+    sequence = 0
+    while True:
+        sequence, part = part_slot.wait_newer(sequence, timeout=5.0)
+        if part is not None:
+            yield part
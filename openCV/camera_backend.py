@@ -0,0 +1,465 @@
+# camera_backend.py
+# 라즈베리파이 카메라 캡처 백엔드 모음.
+# picamera2의 하드웨어 MJPEG 인코더로 압축 프레임을 직접 받아 ARM CPU의 JPEG 인코딩 부담을 없애고,
+# 하드웨어 인코더를 쓸 수 없으면 소프트웨어 인코딩으로, picamera2가 없는 개발용 PC에서는 가짜 카메라로 동작합니다.
+#
+# 사용 예:
+#     camera = open_camera(size=(640, 480), fps=10, quality=90)
+#     frame = camera.read()            # EncodedFrame (JPEG 바이트)
+#     gray = camera.read_lores()       # 분석용 저해상도 흑백 프레임 (numpy)
+#     camera.stop()
+import collections
+import io
+import os
+import threading
+import time
+
+import numpy as np
+
+try:
+    from picamera2 import Picamera2
+    from picamera2.encoders import JpegEncoder, MJPEGEncoder
+    from picamera2.outputs import FileOutput
+    PICAMERA2_AVAILABLE = True
+except ImportError:
+    PICAMERA2_AVAILABLE = False
+
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+# CAMERA_BACKEND 환경변수로 백엔드를 강제할 수 있습니다: auto | hardware | software | fake | replay
+# replay는 camera_source.VirtualPicamera2로 영상 파일/이미지 폴더를 재생합니다 (CAMERA_REPLAY_SOURCE 등 환경변수 참고).
+DEFAULT_BACKEND = os.environ.get("CAMERA_BACKEND", "auto")
+DEFAULT_LORES_SIZE = (320, 240)
+
+# 인코딩된 프레임 한 장.
+# timestamp는 프레임이 준비된 시각(time.time()), sequence는 백엔드 내 프레임 번호,
+# encode_ms는 CPU 인코딩에 걸린 시간입니다 (하드웨어 인코딩이면 None).
+EncodedFrame = collections.namedtuple(
+    "EncodedFrame", ["data", "timestamp", "sequence", "codec", "keyframe", "size", "encode_ms"])
+
+
+class LatestFrame:
+    """
+    가장 최근 프레임 하나만 보관하는 버퍼 (latest-wins).
+    생산자는 put()으로 덮어쓰고, 소비자는 자신이 마지막으로 본 sequence보다 새 프레임이 올 때까지 get()에서 기다립니다.
+    """
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._frame = None
+        self._sequence = 0
+
+    def put(self, data, codec, keyframe=True, size=None, encode_ms=None):
+        with self._condition:
+            self._sequence += 1
+            self._frame = EncodedFrame(data, time.time(), self._sequence, codec, keyframe, size, encode_ms)
+            self._condition.notify_all()
+
+    def get(self, after_sequence=0, timeout=None):
+        """after_sequence보다 새 프레임을 반환합니다. timeout 안에 오지 않으면 None."""
+        with self._condition:
+            if not self._condition.wait_for(
+                    lambda: self._frame is not None and self._frame.sequence > after_sequence, timeout):
+                return None
+            return self._frame
+
+
+class _EncoderOutput(io.BufferedIOBase):
+    """picamera2 인코더의 출력을 LatestFrame으로 넘기는 파일형 객체."""
+    def __init__(self, buffer, codec, size):
+        super().__init__()
+        self.buffer = buffer
+        self.codec = codec
+        self.size = size
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        # MJPEG 프레임은 각각 독립적인 JPEG이므로 latest-wins 버퍼에서 건너뛰어도 스트림이 깨지지 않습니다.
+        self.buffer.put(bytes(data), self.codec, size=self.size)
+        return len(data)
+
+
+class CameraBackend:
+    """모든 캡처 백엔드의 공통 인터페이스."""
+    name = "base"
+
+    def __init__(self, size=(640, 480), fps=10, quality=90, lores_size=DEFAULT_LORES_SIZE):
+        self.size = tuple(size)
+        self.fps = fps
+        self.quality = quality
+        self.lores_size = tuple(lores_size) if lores_size else None
+        self.codec = "mjpeg"
+        self.frames = LatestFrame()
+        self._last_sequence = 0
+
+    def start(self):
+        raise NotImplementedError
+
+    def stop(self):
+        raise NotImplementedError
+
+    def read(self, timeout=2.0):
+        """이전에 read()로 받은 프레임보다 새 프레임을 기다려 반환합니다. 시간 초과 시 None."""
+        frame = self.frames.get(self._last_sequence, timeout)
+        if frame is not None:
+            self._last_sequence = frame.sequence
+        return frame
+
+    def read_jpeg(self, timeout=2.0):
+        """JPEG 바이트만 필요할 때 사용하는 편의 함수."""
+        frame = self.read(timeout)
+        return frame.data if frame is not None else None
+
+    def read_lores(self):
+        """분석용 저해상도 흑백(Y) 프레임을 반환합니다. 지원하지 않으면 None."""
+        return None
+
+    def capture_array(self):
+        """추론 등에 사용할 원본 해상도 BGR 프레임을 반환합니다."""
+        raise NotImplementedError
+
+    def reconfigure(self, size=None, fps=None, quality=None):
+        """
+        해상도/FPS/JPEG 품질을 바꿉니다 (혼잡 제어용).
+        실행 중에 바꿀 수 없는 항목이 바뀌면 카메라를 잠시 멈췄다가 다시 시작합니다.
+        """
+        size = tuple(size) if size else self.size
+        fps = fps or self.fps
+        quality = quality or self.quality
+        restart = self._needs_restart(size, fps, quality)
+        if restart:
+            self.stop()
+        self.size, self.fps, self.quality = size, fps, quality
+        if restart:
+            self.start()
+        else:
+            self._apply_quality()
+
+    def _needs_restart(self, size, fps, quality):
+        return size != self.size or fps != self.fps
+
+    def _apply_quality(self):
+        """재시작 없이 바뀐 품질(과 실행 중에 바꿀 수 있는 FPS)을 반영합니다. 매 프레임 값을 읽는 백엔드는 할 일이 없습니다."""
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class Picamera2Backend(CameraBackend):
+    """
+    picamera2 카메라. 비디오 설정에 main(인코딩용)과 lores(분석용) 두 스트림을 함께 구성합니다.
+    hardware=True이면 V4L2 하드웨어 인코더(MJPEGEncoder)를,
+    False이면 picamera2의 소프트웨어 JpegEncoder를 사용합니다. 어느 쪽이든 capture_array + cv2.imencode는 거치지 않습니다.
+    (H.264는 P-프레임을 하나라도 건너뛰면 다음 IDR까지 영상이 깨지는데, latest-wins 버퍼와 지금의 소비자들은
+    JPEG만 다루므로 지원하지 않습니다.)
+    """
+    def __init__(self, size=(640, 480), fps=10, quality=90, lores_size=DEFAULT_LORES_SIZE,
+                 hardware=True, bitrate=None):
+        super().__init__(size, fps, quality, lores_size)
+        self.hardware = hardware
+        self.bitrate = bitrate
+        self.name = ("hardware-" if hardware else "software-") + self.codec
+        self.picam2 = None
+        self.encoder = None
+        self._output = None
+
+    def start(self):
+        self.picam2 = Picamera2()
+        streams = {"main": {"format": "RGB888", "size": self.size}}
+        if self.lores_size:
+            # lores 스트림은 Pi 4 이하에서 YUV420만 지원합니다. Y 평면이 곧 흑백 이미지입니다.
+            streams["lores"] = {"format": "YUV420", "size": self.lores_size}
+        config = self.picam2.create_video_configuration(
+            **streams, controls={"FrameRate": self.fps}, encode="main")
+        self.picam2.configure(config)
+        self.encoder = self._create_encoder()
+        self._output = FileOutput(_EncoderOutput(self.frames, self.codec, self.size))
+        self.picam2.start_recording(self.encoder, self._output)
+        print(f"[Camera] {self.name} 백엔드 시작: {self.size[0]}x{self.size[1]} @ {self.fps} FPS")
+        return self
+
+    def _create_encoder(self):
+        if self.hardware:
+            # 하드웨어 MJPEG 인코더는 품질 대신 비트레이트로 조절합니다. JPEG 품질 값을 대략적인 비트레이트로 환산합니다.
+            bitrate = self.bitrate or int(self.size[0] * self.size[1] * self.fps * (0.5 + 4.5 * self.quality / 100.0))
+            return MJPEGEncoder(bitrate=bitrate)
+        return JpegEncoder(q=self.quality)
+
+    def _needs_restart(self, size, fps, quality):
+        # 스트림 크기만 카메라 재설정이 필요합니다. FPS와 품질은 실행 중에 바꿉니다 (_apply_quality).
+        return size != self.size
+
+    def _apply_quality(self):
+        if self.picam2 is None or self.encoder is None:
+            return
+        self.picam2.set_controls({"FrameRate": self.fps})
+        if not self.hardware:
+            # 소프트웨어 JpegEncoder는 매 프레임 q 값을 읽으므로 바로 바꿀 수 있습니다.
+            self.encoder.q = self.quality
+            return
+        # 하드웨어 인코더의 비트레이트(품질, FPS로 환산)는 인코더 시작 시에만 설정되므로,
+        # 카메라는 계속 돌리면서 인코더만 새 비트레이트로 바꿔 끼웁니다.
+        self.picam2.stop_encoder(self.encoder)
+        self.encoder = self._create_encoder()
+        self.picam2.start_encoder(self.encoder, self._output)
+
+    def stop(self):
+        if self.picam2 is not None:
+            try:
+                self.picam2.stop_recording()
+            finally:
+                self.picam2.close()
+                self.picam2 = None
+
+    def read_lores(self):
+        if not self.lores_size or self.picam2 is None:
+            return None
+        yuv = self.picam2.capture_array("lores")
+        return yuv[:self.lores_size[1], :self.lores_size[0]]
+
+    def capture_array(self):
+        return self.picam2.capture_array("main")
+
+
+class RawCaptureBackend(CameraBackend):
+    """
+    인코더와 lores 스트림 없이 main 스트림만 여는 picamera2 카메라 (capture_array 전용).
+    원본 프레임으로 추론만 하는 프로그램에서 JPEG 인코딩/lores 처리에 코어를 쓰지 않도록 합니다. read()는 프레임을 주지 않습니다.
+    """
+    name = "raw-capture"
+
+    def __init__(self, size=(640, 480), fps=10):
+        super().__init__(size, fps, lores_size=None)
+        self.picam2 = None
+
+    def start(self):
+        self.picam2 = Picamera2()
+        config = self.picam2.create_video_configuration(
+            main={"format": "RGB888", "size": self.size}, controls={"FrameRate": self.fps})
+        self.picam2.configure(config)
+        self.picam2.start()
+        print(f"[Camera] {self.name} 백엔드 시작: {self.size[0]}x{self.size[1]} @ {self.fps} FPS")
+        return self
+
+    def stop(self):
+        if self.picam2 is not None:
+            try:
+                self.picam2.stop()
+            finally:
+                self.picam2.close()
+                self.picam2 = None
+
+    def capture_array(self):
+        # picamera2의 capture_array는 다음 프레임이 준비될 때까지 기다리므로 카메라 FPS에 맞춰집니다.
+        return self.picam2.capture_array("main")
+
+
+class OpenCVEncodeBackend(CameraBackend):
+    """
+    picamera2 인코더를 쓰지 않는 기존 방식 (capture_array + cv2.imencode).
+    인코더 초기화가 모두 실패했을 때의 최후 대안입니다.
+    camera_factory로 Picamera2 대신 camera_source.VirtualPicamera2를 넣으면 같은 캡처/인코딩 경로를 하드웨어 없이 실행합니다.
+    """
+    name = "opencv-jpeg"
+
+    def __init__(self, size=(640, 480), fps=10, quality=90, lores_size=DEFAULT_LORES_SIZE, camera_factory=None):
+        super().__init__(size, fps, quality, lores_size)
+        self.camera_factory = camera_factory
+        self.picam2 = None
+        self._thread = None
+        self._running = False
+
+    def start(self):
+        self.picam2 = (self.camera_factory or Picamera2)()
+        config = self.picam2.create_preview_configuration(
+            main={"format": "RGB888", "size": self.size}, controls={"FrameRate": self.fps})
+        self.picam2.configure(config)
+        self.picam2.start()
+        self._running = True
+        self._thread = threading.Thread(target=self._capture_loop, daemon=True)
+        self._thread.start()
+        print(f"[Camera] {self.name} 백엔드 시작: {self.size[0]}x{self.size[1]} @ {self.fps} FPS")
+        return self
+
+    def _capture_loop(self):
+        # 카메라 프레임 속도에 맞춰 캡처되므로 별도의 sleep은 필요 없습니다.
+        while self._running:
+            frame = self.picam2.capture_array("main")
+            encode_start = time.time()
+            ok, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+            if ok:
+                self.frames.put(buffer.tobytes(), "mjpeg", size=self.size,
+                                encode_ms=(time.time() - encode_start) * 1000)
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+        if self.picam2 is not None:
+            self.picam2.stop()
+            self.picam2.close()
+            self.picam2 = None
+
+    def read_lores(self):
+        if not self.lores_size or self.picam2 is None:
+            return None
+        frame = self.picam2.capture_array("main")
+        return cv2.resize(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), self.lores_size, interpolation=cv2.INTER_AREA)
+
+    def capture_array(self):
+        return self.picam2.capture_array("main")
+
+
+class FakeCamera(CameraBackend):
+    """
+    카메라가 없는 리눅스 개발 PC용 가짜 카메라.
+    움직이는 막대와 프레임 번호가 그려진 합성 영상을 지정한 FPS로 만들어 JPEG로 인코딩합니다.
+    """
+    name = "fake"
+
+    def __init__(self, size=(640, 480), fps=10, quality=90, lores_size=DEFAULT_LORES_SIZE):
+        super().__init__(size, fps, quality, lores_size)
+        self._thread = None
+        self._running = False
+        self._latest_array = None
+        self._index = 0
+        self._array_sequence = 0 # 마지막 capture_array()가 반환한 프레임 번호
+
+    def start(self):
+        if cv2 is None:
+            raise RuntimeError("가짜 카메라는 JPEG 인코딩에 OpenCV(cv2)가 필요합니다.")
+        self._running = True
+        self._thread = threading.Thread(target=self._generate_loop, daemon=True)
+        self._thread.start()
+        print(f"[Camera] {self.name} 백엔드 시작: {self.size[0]}x{self.size[1]} @ {self.fps} FPS")
+        return self
+
+    def _render(self):
+        """프레임 번호에 따라 위치가 바뀌는 막대와 텍스트를 그린 BGR 이미지를 만듭니다."""
+        width, height = self.size
+        frame = np.empty((height, width, 3), dtype=np.uint8)
+        frame[:] = np.linspace(40, 200, width, dtype=np.uint8)[None, :, None]
+        bar = (self._index * 8) % width
+        frame[:, bar:bar + 20] = (0, 0, 255)
+        cv2.putText(frame, f"FAKE #{self._index}", (10, 40), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+        return frame
+
+    def _needs_restart(self, size, fps, quality):
+        # 합성 영상은 매 프레임 크기/FPS/품질을 다시 읽으므로 재시작이 필요 없습니다.
+        return False
+
+    def _generate_loop(self):
+        next_time = time.time()
+        while self._running:
+            frame = self._render()
+            encode_start = time.time()
+            ok, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+            if ok:
+                self._latest_array = frame
+                self.frames.put(buffer.tobytes(), "mjpeg", size=self.size,
+                                encode_ms=(time.time() - encode_start) * 1000)
+            self._index += 1
+            next_time += 1.0 / self.fps
+            time.sleep(max(next_time - time.time(), 0))
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+
+    def read_lores(self):
+        frame = self._latest_array
+        if not self.lores_size or frame is None:
+            return None
+        return cv2.resize(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), self.lores_size, interpolation=cv2.INTER_AREA)
+
+    def capture_array(self):
+        # 실제 카메라처럼 지난 capture_array() 이후의 새 프레임을 기다리므로, 호출하는 쪽이 FPS보다 빨리 돌지 않습니다.
+        frame = self.frames.get(self._array_sequence, timeout=2.0)
+        if frame is not None:
+            self._array_sequence = frame.sequence
+        return self._latest_array.copy()
+
+
+def open_replay_camera(source=None, size=(640, 480), fps=10, quality=90, lores_size=DEFAULT_LORES_SIZE,
+                       jitter_ms=None, drop_rate=None, offset=0, seed=None):
+    """VirtualPicamera2 위에서 OpenCVEncodeBackend를 실행하는 재생 카메라를 시작합니다."""
+    from camera_source import VirtualPicamera2
+
+    camera = OpenCVEncodeBackend(size, fps, quality, lores_size, camera_factory=lambda: VirtualPicamera2(
+        source, jitter_ms=jitter_ms, drop_rate=drop_rate, offset=offset, seed=seed))
+    camera.name = "replay-jpeg"
+    return camera.start()
+
+
+def open_virtual_cameras(count, source=None, size=(640, 480), fps=10, quality=90, lores_size=None,
+                         jitter_ms=None, drop_rate=None, offset_step=37):
+    """
+    가상 카메라 count대를 한 프로세스에서 시작합니다 (여러 로봇을 흉내 낸 부하 테스트용).
+    카메라마다 재생 시작 위치와 난수 시드를 달리하여 모든 카메라가 같은 프레임을 동시에 내보내지 않게 합니다.
+    """
+    return [open_replay_camera(source, size, fps, quality, lores_size, jitter_ms, drop_rate,
+                               offset=index * offset_step, seed=index)
+            for index in range(count)]
+
+
+def open_capture_camera(backend=None, size=(640, 480), fps=10):
+    """
+    원본 프레임(capture_array)만 필요한 프로그램용 카메라를 시작합니다. 인코더/lores 스트림을 만들지 않습니다.
+    picamera2가 없거나 fake/replay를 지정하면 open_camera()와 같은 개발용 카메라를 사용합니다.
+    """
+    backend = backend or DEFAULT_BACKEND
+    if backend in ("fake", "replay") or not PICAMERA2_AVAILABLE:
+        return open_camera(backend, size=size, fps=fps, lores_size=None)
+    return RawCaptureBackend(size, fps).start()
+
+
+def open_camera(backend=None, size=(640, 480), fps=10, quality=90, lores_size=DEFAULT_LORES_SIZE):
+    """
+    사용 가능한 가장 좋은 백엔드를 골라 시작한 뒤 반환합니다.
+    auto: 하드웨어 인코더 -> picamera2 소프트웨어 인코더 -> OpenCV 인코딩 순서로 시도하고,
+    picamera2가 설치되지 않은 환경에서는 가짜 카메라를 사용합니다.
+    replay: 가상 카메라로 CAMERA_REPLAY_SOURCE(영상 파일/이미지 폴더/synthetic)를 재생합니다.
+    """
+    backend = backend or DEFAULT_BACKEND
+    if backend == "replay":
+        return open_replay_camera(size=size, fps=fps, quality=quality, lores_size=lores_size)
+    if backend == "fake" or (backend == "auto" and not PICAMERA2_AVAILABLE):
+        if backend == "auto":
+            print("[Camera] picamera2를 찾을 수 없어 가짜 카메라를 사용합니다.")
+        return FakeCamera(size, fps, quality, lores_size).start()
+
+    candidates = {
+        "hardware": [lambda: Picamera2Backend(size, fps, quality, lores_size, hardware=True)],
+        "software": [lambda: Picamera2Backend(size, fps, quality, lores_size, hardware=False),
+                     lambda: OpenCVEncodeBackend(size, fps, quality, lores_size)],
+    }
+    if backend == "auto":
+        factories = candidates["hardware"] + candidates["software"]
+    elif backend in candidates:
+        factories = candidates[backend]
+    else:
+        raise ValueError(f"알 수 없는 카메라 백엔드: {backend}")
+
+    last_error = None
+    for factory in factories:
+        camera = factory()
+        try:
+            return camera.start()
+        except Exception as e:
+            # 하드웨어 인코더가 없는 보드(Pi 5 등)에서는 여기서 다음 후보로 넘어갑니다.
+            print(f"[Camera] {camera.name} 백엔드를 시작할 수 없습니다: {e}")
+            last_error = e
+            try:
+                camera.stop()
+            except Exception:
+                pass
+    raise RuntimeError(f"사용 가능한 카메라 백엔드가 없습니다: {last_error}")
@@ -0,0 +1,229 @@
+# camera_source.py
+# 하드웨어 없이 캡처/스트리밍/추론 경로를 돌리기 위한 가상 카메라.
+# VirtualPicamera2는 이 저장소가 쓰는 picamera2.Picamera2의 캡처 API(create_*_configuration, configure, start,
+# capture_array, stop, close)를 그대로 흉내 내며, 합성 영상 / 영상 파일 / 이미지 폴더를 목표 FPS와 해상도로 재생합니다.
+# 프레임 간격 흔들림(jitter)과 프레임 누락(drop)을 넣을 수 있고, 한 프로세스에서 여러 대를 동시에 돌릴 수 있습니다.
+#
+# 사용 예:
+#     picam2 = VirtualPicamera2(source="clip.mp4", jitter_ms=15, drop_rate=0.02)
+#     picam2.configure(picam2.create_preview_configuration(main={"format": "RGB888", "size": (640, 480)},
+#                                                          controls={"FrameRate": 10}))
+#     picam2.start()
+#     frame = picam2.capture_array()   # BGR numpy, 실제 카메라처럼 다음 프레임까지 기다림
+#
+# 스트리밍 코드에서는 camera_backend.open_camera(backend="replay")를 사용하면 됩니다 (CAMERA_REPLAY_SOURCE 환경변수로 소스 지정).
+import functools
+import os
+import random
+import threading
+import time
+
+import numpy as np
+
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+# 환경변수로 지정하는 기본값 (open_camera(backend="replay")와 CAMERA_BACKEND=replay에서 사용)
+DEFAULT_SOURCE = os.environ.get("CAMERA_REPLAY_SOURCE", "synthetic")
+DEFAULT_JITTER_MS = float(os.environ.get("CAMERA_REPLAY_JITTER_MS", "0"))
+DEFAULT_DROP_RATE = float(os.environ.get("CAMERA_REPLAY_DROP", "0"))
+MAX_PRELOAD_FRAMES = 600   # 이미지 폴더를 메모리에 올려 둘 최대 프레임 수 (여러 가상 카메라가 공유)
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+class SyntheticFrames:
+    """camera_backend.FakeCamera와 같은 합성 영상 (그라데이션 배경 + 움직이는 막대 + 프레임 번호)."""
+    def __init__(self, size, offset=0):
+        self.size = size
+        self.index = offset
+        width, _ = size
+        self._background = np.linspace(40, 200, width, dtype=np.uint8)[None, :, None]
+
+    def next(self):
+        width, height = self.size
+        frame = np.empty((height, width, 3), dtype=np.uint8)
+        frame[:] = self._background
+        bar = (self.index * 8) % width
+        frame[:, bar:bar + 20] = (0, 0, 255)
+        cv2.putText(frame, f"VIRTUAL #{self.index}", (10, 40), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+        self.index += 1
+        return frame
+
+
+@functools.lru_cache(maxsize=8)
+def load_clip(path, size):
+    """
+    이미지 폴더를 목표 해상도로 한 번만 디코딩해 둡니다. 같은 폴더를 재생하는 가상 카메라들은 이 결과를 공유하므로,
+    카메라 수가 늘어도 디코딩 비용과 메모리는 늘지 않습니다.
+    """
+    names = sorted(name for name in os.listdir(path) if name.lower().endswith(IMAGE_EXTENSIONS))
+    frames = []
+    for name in names[:MAX_PRELOAD_FRAMES]:
+        image = cv2.imread(os.path.join(path, name), cv2.IMREAD_COLOR)
+        if image is not None:
+            frames.append(_fit(image, size))
+    if not frames:
+        raise ValueError(f"이미지 폴더에 재생할 이미지가 없습니다: {path}")
+    return tuple(frames)
+
+
+class ClipFrames:
+    """미리 올려 둔 프레임 목록을 반복 재생합니다. offset으로 카메라마다 시작 위치를 다르게 줄 수 있습니다."""
+    def __init__(self, frames, offset=0):
+        self.frames = frames
+        self.index = offset % len(frames)
+
+    def next(self):
+        frame = self.frames[self.index]
+        self.index = (self.index + 1) % len(self.frames)
+        return frame
+
+
+class VideoFrames:
+    """영상 파일을 반복 재생합니다. 파일의 FPS와 관계없이 가상 카메라의 FPS로 한 프레임씩 꺼냅니다."""
+    def __init__(self, path, size, offset=0):
+        self.path = path
+        self.size = size
+        self._capture = cv2.VideoCapture(path)
+        if not self._capture.isOpened():
+            raise ValueError(f"영상 파일을 열 수 없습니다: {path}")
+        count = int(self._capture.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        if offset and count > 0:
+            self._capture.set(cv2.CAP_PROP_POS_FRAMES, offset % count)
+
+    def next(self):
+        ok, image = self._capture.read()
+        if not ok:
+            # 끝까지 재생했으면 처음으로 되감습니다.
+            self._capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, image = self._capture.read()
+            if not ok:
+                raise ValueError(f"영상 파일에서 프레임을 읽을 수 없습니다: {self.path}")
+        return _fit(image, self.size)
+
+    def close(self):
+        self._capture.release()
+
+
+def _fit(image, size):
+    if (image.shape[1], image.shape[0]) == tuple(size):
+        return image
+    return cv2.resize(image, tuple(size), interpolation=cv2.INTER_AREA)
+
+
+def open_frames(source, size, offset=0):
+    """source 종류에 맞는 프레임 공급자를 만듭니다: 'synthetic', 이미지 폴더, 영상 파일."""
+    if cv2 is None:
+        raise RuntimeError("가상 카메라는 OpenCV(cv2)가 필요합니다.")
+    if not source or source == "synthetic":
+        return SyntheticFrames(size, offset)
+    if os.path.isdir(source):
+        return ClipFrames(load_clip(source, tuple(size)), offset)
+    return VideoFrames(source, size, offset)
+
+
+class VirtualPicamera2:
+    """
+    picamera2.Picamera2를 대신하는 가상 카메라.
+    start() 후 내부 스레드가 FrameRate에 맞춰 프레임을 만들고, capture_array()는 실제 카메라처럼 다음 프레임을 기다려 복사본을 반환합니다.
+    jitter_ms만큼 프레임 간격을 흔들고, drop_rate 확률로 센서 프레임을 건너뜁니다 (그 간격만큼 프레임이 오지 않음).
+    picamera2 인코더(start_recording)는 지원하지 않으므로 인코딩은 OpenCVEncodeBackend처럼 CPU에서 합니다.
+    """
+    def __init__(self, source=None, jitter_ms=None, drop_rate=None, offset=0, seed=None):
+        self.source = source if source is not None else DEFAULT_SOURCE
+        self.jitter_ms = DEFAULT_JITTER_MS if jitter_ms is None else jitter_ms
+        self.drop_rate = DEFAULT_DROP_RATE if drop_rate is None else drop_rate
+        self.offset = offset
+        self.camera_properties = {"Model": "virtual", "Source": self.source}
+        self.camera_config = None
+        self.frames_produced = 0
+        self.frames_dropped = 0
+        self._random = random.Random(seed)
+        self._condition = threading.Condition()
+        self._main = None
+        self._sequence = 0
+        self._frames = None
+        self._thread = None
+        self._running = False
+
+    # --- 설정 (picamera2와 같은 형태의 딕셔너리) ---
+    def create_preview_configuration(self, main=None, lores=None, controls=None, **kwargs):
+        main = dict({"format": "RGB888", "size": (640, 480)}, **(main or {}))
+        return {"main": main, "lores": dict(lores) if lores else None, "controls": dict(controls or {})}
+
+    create_video_configuration = create_preview_configuration
+    create_still_configuration = create_preview_configuration
+
+    def configure(self, config):
+        if self._running:
+            raise RuntimeError("카메라를 멈춘 뒤에 설정을 바꿔야 합니다.")
+        self.camera_config = config
+
+    def set_controls(self, controls):
+        self.camera_config.setdefault("controls", {}).update(controls)
+
+    @property
+    def size(self):
+        return tuple(self.camera_config["main"]["size"])
+
+    @property
+    def fps(self):
+        return float(self.camera_config["controls"].get("FrameRate", 30))
+
+    # --- 실행 ---
+    def start(self):
+        if self.camera_config is None:
+            self.configure(self.create_preview_configuration())
+        self._frames = open_frames(self.source, self.size, self.offset)
+        self._running = True
+        self._thread = threading.Thread(target=self._produce_loop, daemon=True)
+        self._thread.start()
+
+    def _produce_loop(self):
+        next_time = time.time()
+        while self._running:
+            frame = self._frames.next()
+            if self.drop_rate and self._random.random() < self.drop_rate:
+                self.frames_dropped += 1
+            else:
+                with self._condition:
+                    self._main = frame
+                    self._sequence += 1
+                    self.frames_produced += 1
+                    self._condition.notify_all()
+            next_time += 1.0 / self.fps
+            jitter = self._random.uniform(-self.jitter_ms, self.jitter_ms) / 1000 if self.jitter_ms else 0.0
+            # 흔들림은 이번 프레임에만 적용하고 다음 예정 시각은 그대로 두어 평균 FPS를 유지합니다.
+            time.sleep(max(next_time + jitter - time.time(), 0))
+
+    def capture_array(self, name="main", wait=True):
+        """다음 프레임을 기다려 반환합니다. 'main'은 BGR(RGB888 형식과 같은 메모리 배치), 'lores'는 YUV420(I420)."""
+        with self._condition:
+            sequence = self._sequence
+            if wait and not self._condition.wait_for(lambda: self._sequence > sequence or not self._running, 2.0):
+                raise TimeoutError("가상 카메라에서 프레임이 오지 않습니다.")
+            if self._main is None:
+                raise RuntimeError("카메라가 시작되지 않았습니다.")
+            frame = self._main
+        if name == "lores":
+            lores = self.camera_config.get("lores")
+            if not lores:
+                raise ValueError("lores 스트림이 설정되지 않았습니다.")
+            return cv2.cvtColor(_fit(frame, lores["size"]), cv2.COLOR_BGR2YUV_I420)
+        return frame.copy()
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+        with self._condition:
+            self._condition.notify_all()
+
+    def close(self):
+        self.stop()
+        if hasattr(self._frames, "close"):
+            self._frames.close()
+        self._frames = None
@@ -0,0 +1,89 @@
+# congestion_control.py
+# 카메라 스트림의 혼잡 제어기.
+# 전송 큐 깊이, 웹 서버가 보내는 프레임별 ack 왕복 시간(RTT), 인코딩 시간을 보고
+# JPEG 품질 -> 프레임 속도 -> 해상도 순서로 한 단계씩 낮추거나 올려, 지연 시간을 목표 예산 안에 유지합니다.
+import collections
+
+# 스트림의 현재 동작 지점 (프레임 헤더에 그대로 실어 보냅니다)
+OperatingPoint = collections.namedtuple("OperatingPoint", ["width", "height", "fps", "quality"])
+
+
+def build_ladder(resolutions, fps_range, quality_range, quality_step=10, fps_step=2):
+    """
+    가장 좋은 설정부터 가장 가벼운 설정까지, 단계마다 전송량이 줄어드는 동작 지점 목록을 만듭니다.
+    1) 최대 해상도/최대 FPS에서 품질을 낮추고, 2) 최소 품질에서 FPS를 낮추고, 3) 최소 품질/최소 FPS에서 해상도를 낮춥니다.
+    """
+    resolutions = sorted(resolutions, key=lambda s: s[0] * s[1], reverse=True)
+    fps_min, fps_max = fps_range
+    q_min, q_max = quality_range
+    width, height = resolutions[0]
+
+    ladder = [OperatingPoint(width, height, fps_max, q) for q in range(q_max, q_min - 1, -quality_step)]
+    if ladder[-1].quality != q_min:
+        ladder.append(OperatingPoint(width, height, fps_max, q_min))
+    for fps in range(fps_max - fps_step, fps_min - 1, -fps_step):
+        ladder.append(OperatingPoint(width, height, fps, q_min))
+    if ladder[-1].fps != fps_min:
+        ladder.append(OperatingPoint(width, height, fps_min, q_min))
+    for width, height in resolutions[1:]:
+        ladder.append(OperatingPoint(width, height, fps_min, q_min))
+    return ladder
+
+
+class CongestionController:
+    """
+    주기적으로 update()를 호출하면 다음 동작 지점을 결정합니다.
+    혼잡 신호가 보이면 즉시 낮추고(심하면 두 단계), 여유 있는 구간이 up_hold번 연속되어야 한 단계 올립니다.
+    """
+    def __init__(self, resolutions=((640, 480), (480, 360), (320, 240)), fps_range=(4, 10),
+                 quality_range=(50, 90), quality_step=10, fps_step=2, latency_budget_ms=300.0, up_hold=3):
+        self.ladder = build_ladder(resolutions, fps_range, quality_range, quality_step, fps_step)
+        self.level = 0
+        self.latency_budget_ms = latency_budget_ms
+        self.up_hold = up_hold
+        self._good_intervals = 0
+        self.last_reason = "start"
+
+    @property
+    def current(self):
+        return self.ladder[self.level]
+
+    def update(self, queue_depth, rtt_ms=None, encode_ms=None):
+        """
+        한 제어 구간의 측정값으로 동작 지점을 갱신합니다. 바뀌었으면 새 OperatingPoint, 아니면 None을 반환합니다.
+        queue_depth: 구간 동안의 평균 전송 대기 프레임 수
+        rtt_ms: 구간 동안의 ack 지연 (p90 등 대표값, ack가 없으면 None)
+        encode_ms: 구간 동안의 평균 인코딩 시간 (하드웨어 인코더이면 None)
+        """
+        frame_interval_ms = 1000.0 / self.current.fps
+        step = 0
+        if rtt_ms is not None and rtt_ms > 2 * self.latency_budget_ms:
+            step, reason = 2, f"rtt {rtt_ms:.0f}ms > 2x budget"
+        elif rtt_ms is not None and rtt_ms > self.latency_budget_ms:
+            step, reason = 1, f"rtt {rtt_ms:.0f}ms > budget"
+        elif queue_depth >= 1.0:
+            step, reason = 1, f"queue depth {queue_depth:.1f}"
+        elif encode_ms is not None and encode_ms > 0.8 * frame_interval_ms:
+            step, reason = 1, f"encode {encode_ms:.0f}ms"
+
+        if step:
+            self._good_intervals = 0
+            return self._move(step, reason)
+
+        # 예산의 60% 이하로 여유가 있고 큐가 비어 있을 때만 '좋은 구간'으로 셉니다.
+        if (rtt_ms is None or rtt_ms < 0.6 * self.latency_budget_ms) and queue_depth < 0.5:
+            self._good_intervals += 1
+            if self._good_intervals >= self.up_hold:
+                self._good_intervals = 0
+                return self._move(-1, "headroom")
+        else:
+            self._good_intervals = 0
+        return None
+
+    def _move(self, step, reason):
+        level = min(max(self.level + step, 0), len(self.ladder) - 1)
+        if level == self.level:
+            return None
+        self.level = level
+        self.last_reason = reason
+        return self.current
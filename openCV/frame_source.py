@@ -0,0 +1,454 @@
+# frame_source.py
+# 영상 수신 경로를 하나로 통일한 FrameSource 모음.
+# MJPEG-over-HTTP, RTSP(TCP), WebSocket(바이너리 JPEG 또는 JSON+base64), 로컬 영상 파일을 같은 인터페이스로 읽습니다.
+# 모든 소스가 지수 백오프 재연결, 최신 프레임 버퍼링(latest-wins), 프레임별 수신 시각, 디코딩 통계를 공유하므로
+# 현장에 맞는 전송 방식으로 바꾸는 것은 URL 설정만 바꾸면 됩니다.
+#
+# 사용 예:
+#     source = open_source("rtsp://127.0.0.1:8554/cam")   # http://, ws://, 파일 경로도 가능
+#     source.start()
+#     frame = source.read(timeout=5.0)
+#     if frame is not None:
+#         image = frame.image     # BGR numpy (필요할 때 한 번만 디코딩)
+#         jpeg = frame.jpeg       # JPEG 바이트 (수신한 바이트가 있으면 재인코딩 없이 그대로)
+import base64
+import json
+import logging
+import os
+import threading
+import time
+import urllib.request
+from collections import deque
+
+import numpy as np
+
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+RECONNECT_DELAY_MIN = 0.5   # 첫 재연결 대기 시간 (초)
+RECONNECT_DELAY_MAX = 10.0  # 재연결 대기 시간 상한 (초)
+CLOCK_PROBE_INTERVAL = 2.0  # WebSocket 소스가 카메라 서버와 시계를 맞추는 주기 (초)
+CLOCK_SAMPLES = 16          # 시계 오프셋 추정에 쓰는 최근 표본 수
+
+
+class Frame:
+    """
+    수신한 프레임 한 장. JPEG 바이트와 디코딩된 이미지 중 가진 쪽만 들고 있다가,
+    다른 형태가 필요해지면 그때 한 번만 변환하여 캐시합니다.
+    """
+    __slots__ = ("sequence", "timestamp", "meta", "decoded_at", "_jpeg", "_image", "_b64", "_stats")
+
+    def __init__(self, sequence, timestamp, jpeg=None, image=None, b64=None, meta=None, stats=None):
+        self.sequence = sequence
+        self.timestamp = timestamp # 수신(캡처) 시각, time.time()
+        self.meta = meta or {}     # 송신측이 보낸 부가 정보 (frame_id, timestamp, op, trace 등)
+        self.decoded_at = None     # image를 처음 디코딩한 시각 (지연 시간 추적용)
+        self._jpeg = jpeg
+        self._image = image
+        self._b64 = b64
+        self._stats = stats
+
+    @property
+    def jpeg(self):
+        if self._jpeg is None:
+            if self._b64 is not None:
+                self._jpeg = base64.b64decode(self._b64)
+            elif self._image is not None:
+                ok, buffer = cv2.imencode(".jpg", self._image)
+                self._jpeg = buffer.tobytes() if ok else None
+        return self._jpeg
+
+    @property
+    def b64(self):
+        """base64 문자열 (JSON 소스에서 받은 문자열이 있으면 그대로 재사용)."""
+        if self._b64 is None and self.jpeg is not None:
+            self._b64 = base64.b64encode(self.jpeg).decode("utf-8")
+        return self._b64
+
+    @property
+    def image(self):
+        if self._image is None and self.jpeg is not None:
+            start = time.time()
+            self._image = cv2.imdecode(np.frombuffer(self.jpeg, np.uint8), cv2.IMREAD_COLOR)
+            self.decoded_at = time.time()
+            if self._stats is not None:
+                self._stats.record_decode((self.decoded_at - start) * 1000)
+        return self._image
+
+
+class LatestSlot:
+    """가장 최근 값 하나만 보관하고, 새 값이 들어올 때까지 기다릴 수 있는 슬롯."""
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._value = None
+        self._sequence = 0
+
+    def put(self, value):
+        with self._condition:
+            self._value = value
+            self._sequence += 1
+            self._condition.notify_all()
+
+    def wait_newer(self, sequence, timeout=None):
+        """sequence보다 새 값이 오면 (새 sequence, 값)을, 시간 초과면 (sequence, None)을 반환합니다."""
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._sequence > sequence, timeout):
+                return sequence, None
+            return self._sequence, self._value
+
+
+class ClockOffsetEstimator:
+    """
+    NTP와 같은 방식으로 원격(Pi) 시계와 로컬 시계의 차이를 추정합니다.
+    t0: 요청을 보낸 로컬 시각, t1: 원격이 응답한 시각, t2: 응답을 받은 로컬 시각.
+    최근 표본 중 왕복 시간이 가장 짧은 것이 큐 대기의 영향을 가장 덜 받았으므로 그 값을 사용합니다.
+    """
+    def __init__(self, max_samples=CLOCK_SAMPLES):
+        self._lock = threading.Lock()
+        self._samples = deque(maxlen=max_samples) # (rtt, offset)
+
+    def add_sample(self, t0, t1, t2):
+        rtt = t2 - t0
+        if rtt < 0:
+            return
+        with self._lock:
+            self._samples.append((rtt, t1 - (t0 + t2) / 2))
+
+    def _best(self):
+        with self._lock:
+            return min(self._samples) if self._samples else None
+
+    @property
+    def offset(self):
+        """원격 시계 - 로컬 시계 (초). 표본이 없으면 None."""
+        best = self._best()
+        return best[1] if best else None
+
+    def to_local(self, remote_ts):
+        offset = self.offset
+        return remote_ts - offset if offset is not None else None
+
+    def snapshot(self):
+        best = self._best()
+        if best is None:
+            return {"offset_ms": None, "rtt_ms": None, "samples": 0}
+        # 오프셋의 오차는 최대 왕복 시간의 절반입니다.
+        return {"offset_ms": round(best[1] * 1000, 2), "rtt_ms": round(best[0] * 1000, 2),
+                "samples": len(self._samples)}
+
+
+class SourceStats:
+    """소스별 수신/디코딩 통계. snapshot()은 여러 스레드에서 호출해도 안전합니다."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.frames = 0          # 수신한 프레임 수
+        self.dropped = 0         # 읽히기 전에 새 프레임으로 덮어쓴 수
+        self.bytes = 0           # 수신한 압축 데이터 크기 (JPEG 기준)
+        self.wire_bytes = 0      # 소켓에서 실제로 읽은 크기 (헤더/base64/JSON 포함, 알 수 없는 소스는 0)
+        self.reconnects = 0
+        self.decode_count = 0
+        self.decode_ms_total = 0.0
+        self.started = time.time()
+
+    def record_frame(self, size, dropped):
+        with self._lock:
+            self.frames += 1
+            self.bytes += size
+            self.dropped += int(dropped)
+
+    def record_wire(self, size):
+        with self._lock:
+            self.wire_bytes += size
+
+    def record_decode(self, decode_ms):
+        with self._lock:
+            self.decode_count += 1
+            self.decode_ms_total += decode_ms
+
+    def snapshot(self):
+        with self._lock:
+            elapsed = max(time.time() - self.started, 1e-6)
+            return {
+                "frames": self.frames,
+                "dropped": self.dropped,
+                "fps": round(self.frames / elapsed, 2),
+                "kbps": round(self.bytes * 8 / 1000 / elapsed, 1),
+                "wire_kbps": round(self.wire_bytes * 8 / 1000 / elapsed, 1) if self.wire_bytes else None,
+                "reconnects": self.reconnects,
+                "decode_ms_avg": round(self.decode_ms_total / self.decode_count, 2) if self.decode_count else None,
+            }
+
+
+class FrameSource(threading.Thread):
+    """
+    모든 소스의 공통 기반 클래스.
+    하위 클래스는 _connect()와 _frames()만 구현하면 되며, 연결/재연결/버퍼링/통계는 여기서 처리합니다.
+    on_status(connected: bool) 콜백으로 연결 상태 변화를 알려줍니다.
+    """
+    reconnect = True # 파일 소스처럼 끝나면 다시 열 필요가 없는 경우 False
+
+    def __init__(self, url, on_status=None):
+        super().__init__()
+        self.daemon = True
+        self.url = url
+        self.on_status = on_status
+        self.is_running = True
+        self.connected = False
+        self.stats = SourceStats()
+        self._condition = threading.Condition()
+        self._latest = None
+        self._sequence = 0
+        self._last_read = 0
+
+    # --- 하위 클래스 구현 부분 ---
+    def _connect(self):
+        """연결을 열고 실패하면 예외를 던집니다."""
+        raise NotImplementedError
+
+    def _frames(self):
+        """(jpeg, image, b64, meta) 튜플을 계속 내보내는 제너레이터. 연결이 끊기면 끝나거나 예외를 던집니다."""
+        raise NotImplementedError
+
+    def _close(self):
+        pass
+
+    # --- 공통 부분 ---
+    def run(self):
+        delay = RECONNECT_DELAY_MIN
+        while self.is_running:
+            try:
+                self._connect()
+                self._set_connected(True)
+                delay = RECONNECT_DELAY_MIN
+                for jpeg, image, b64, meta in self._frames():
+                    if not self.is_running:
+                        break
+                    self._publish(jpeg, image, b64, meta)
+            except Exception as e:
+                if self.is_running: # stop()으로 연결을 닫은 경우는 오류가 아님
+                    logging.warning(f"[FrameSource] {self.url} 수신 오류: {e}")
+            finally:
+                self._close()
+                self._set_connected(False)
+
+            if not self.reconnect or not self.is_running:
+                break
+            # 지수 백오프로 재연결합니다.
+            self.stats.reconnects += 1
+            logging.info(f"[FrameSource] {delay:.1f}초 후 {self.url}에 재연결합니다.")
+            time.sleep(delay)
+            delay = min(delay * 2, RECONNECT_DELAY_MAX)
+        self.is_running = False
+        with self._condition:
+            self._condition.notify_all()
+
+    def _set_connected(self, connected):
+        if self.connected != connected:
+            self.connected = connected
+            if self.on_status:
+                self.on_status(connected)
+
+    def _publish(self, jpeg, image, b64, meta):
+        size = len(jpeg) if jpeg is not None else (len(b64) * 3 // 4 if b64 is not None else 0)
+        with self._condition:
+            dropped = self._latest is not None and self._latest.sequence > self._last_read
+            self._sequence += 1
+            self._latest = Frame(self._sequence, time.time(), jpeg, image, b64, meta, self.stats)
+            self._condition.notify_all()
+        self.stats.record_frame(size, dropped)
+
+    def wait_newer(self, sequence, timeout=None):
+        """sequence보다 새 프레임을 기다려 반환합니다. 여러 소비자가 각자 sequence를 관리할 때 사용합니다."""
+        with self._condition:
+            self._condition.wait_for(
+                lambda: not self.is_running or (self._latest is not None and self._latest.sequence > sequence),
+                timeout)
+            if self._latest is None or self._latest.sequence <= sequence:
+                return None
+            self._last_read = max(self._last_read, self._latest.sequence)
+            return self._latest
+
+    def read(self, timeout=None):
+        """마지막으로 read()한 프레임보다 새 프레임을 반환합니다. 시간 초과 또는 소스 종료 시 None."""
+        return self.wait_newer(self._last_read, timeout)
+
+    def stop(self):
+        self.is_running = False
+        self._close()
+        with self._condition:
+            self._condition.notify_all()
+
+
+class MjpegHttpSource(FrameSource):
+    """multipart/x-mixed-replace MJPEG 스트림. JPEG 시작/끝 마커로 프레임을 잘라내므로 경계 문자열에 의존하지 않습니다."""
+    chunk_size = 64 * 1024
+
+    def __init__(self, url, on_status=None, timeout=5.0):
+        super().__init__(url, on_status)
+        self.timeout = timeout
+        self._response = None
+
+    def _connect(self):
+        self._response = urllib.request.urlopen(self.url, timeout=self.timeout)
+
+    def _frames(self):
+        buffer = bytearray()
+        while self.is_running:
+            chunk = self._response.read1(self.chunk_size) if hasattr(self._response, "read1") else self._response.read(self.chunk_size)
+            if not chunk:
+                return
+            self.stats.record_wire(len(chunk))
+            buffer += chunk
+            while True:
+                start = buffer.find(b"\xff\xd8")
+                end = buffer.find(b"\xff\xd9", start + 2) if start >= 0 else -1
+                if start < 0 or end < 0:
+                    # 시작 마커 이전의 헤더는 버립니다.
+                    if start > 0:
+                        del buffer[:start]
+                    break
+                yield bytes(buffer[start:end + 2]), None, None, {}
+                del buffer[:end + 2]
+
+    def _close(self):
+        if self._response is not None:
+            try:
+                self._response.close()
+            except Exception:
+                pass
+            self._response = None
+
+
+class OpenCVCaptureSource(FrameSource):
+    """cv2.VideoCapture 기반 소스 (RTSP, 영상 파일). 디코딩은 OpenCV 내부에서 이루어집니다."""
+    def __init__(self, url, on_status=None):
+        super().__init__(url, on_status)
+        self._capture = None
+
+    def _open_capture(self):
+        return cv2.VideoCapture(self.url)
+
+    def _connect(self):
+        self._capture = self._open_capture()
+        if not self._capture.isOpened():
+            raise ConnectionError("VideoCapture를 열 수 없습니다.")
+
+    def _frames(self):
+        while self.is_running:
+            start = time.time()
+            ok, image = self._capture.read()
+            if not ok:
+                return
+            self.stats.record_decode((time.time() - start) * 1000)
+            yield None, image, None, {}
+
+    def _close(self):
+        if self._capture is not None:
+            self._capture.release()
+            self._capture = None
+
+
+class RtspSource(OpenCVCaptureSource):
+    """
+    RTSP(TCP) 소스. 쉬지 않고 읽어 최신 프레임만 남기므로 OpenCV 내부 버퍼에 의한 지연이 쌓이지 않습니다.
+    """
+    def _open_capture(self):
+        # UDP 패킷 손실로 프레임이 깨지지 않도록 TCP 전송을 기본으로 사용합니다.
+        os.environ.setdefault("OPENCV_FFMPEG_CAPTURE_OPTIONS", "rtsp_transport;tcp")
+        capture = cv2.VideoCapture(self.url, cv2.CAP_FFMPEG)
+        capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        return capture
+
+
+class VideoFileSource(OpenCVCaptureSource):
+    """로컬 영상 파일. realtime=True이면 파일의 FPS에 맞춰 재생하고, loop=True이면 끝에서 처음으로 돌아갑니다."""
+    def __init__(self, url, on_status=None, loop=True, realtime=True):
+        super().__init__(url, on_status)
+        self.loop = loop
+        self.realtime = realtime
+        self.reconnect = loop
+
+    def _frames(self):
+        fps = self._capture.get(cv2.CAP_PROP_FPS) or 30.0
+        interval = 1.0 / fps
+        next_time = time.time()
+        for item in super()._frames():
+            yield item
+            if self.realtime:
+                next_time += interval
+                time.sleep(max(next_time - time.time(), 0))
+
+
+class WebSocketSource(FrameSource):
+    """
+    WebSocket 소스. 바이너리 메시지는 JPEG 바이트로, 텍스트 메시지는 {'image': base64, ...} JSON으로 해석합니다.
+    ack=True이면 frame_id가 있는 프레임을 받는 즉시 {'type': 'ack', 'frame_id': n}을 돌려보냅니다 (카메라 서버 혼잡 제어용).
+    CLOCK_PROBE_INTERVAL마다 {'type': 'clock', 't0': ...}를 보내고 카메라 서버의 응답으로 시계 오프셋(self.clock)을 추정합니다.
+    카메라 서버가 프레임 직전에 보내는 {'type': 'sent', 'frame_id', 'sent_at'}은 같은 frame_id 프레임의 meta['sent_at']이 됩니다.
+    """
+    def __init__(self, url, on_status=None, timeout=5.0, ack=True):
+        super().__init__(url, on_status)
+        self.timeout = timeout
+        self.ack = ack
+        self.clock = ClockOffsetEstimator()
+        self._ws = None
+        self._last_probe = 0.0
+        self._sent_at = None # (frame_id, 카메라 서버의 전송 시작 시각)
+
+    def _connect(self):
+        import websocket # websocket-client
+        # 프레임은 JSON + base64(ASCII)라 UTF-8 검사가 필요 없고, websocket-client의 순수 파이썬 검사는 프레임마다 수십 ms가 걸립니다.
+        self._ws = websocket.create_connection(self.url, timeout=self.timeout, skip_utf8_validation=True)
+
+    def _frames(self):
+        while self.is_running:
+            message = self._ws.recv()
+            if not message:
+                return # 연결이 닫힘
+            self.stats.record_wire(len(message))
+            if isinstance(message, bytes):
+                yield message, None, None, {}
+                continue
+            received_at = time.time()
+            try:
+                data = json.loads(message)
+                if isinstance(data, dict) and data.get("type") == "clock":
+                    self.clock.add_sample(data["t0"], data["t1"], received_at)
+                    continue
+                if isinstance(data, dict) and data.get("type") == "sent":
+                    self._sent_at = (data.get("frame_id"), data.get("sent_at"))
+                    continue
+                b64_image = data.pop("image")
+            except (json.JSONDecodeError, KeyError, AttributeError) as e:
+                logging.warning(f"[FrameSource] 수신한 데이터가 올바른 JSON 형식이 아닙니다: {e}")
+                continue
+            if self._sent_at is not None and self._sent_at[0] == data.get("frame_id"):
+                data["sent_at"] = self._sent_at[1]
+                self._sent_at = None
+            if self.ack and "frame_id" in data:
+                self._ws.send(json.dumps({"type": "ack", "frame_id": data["frame_id"]}))
+            if received_at - self._last_probe >= CLOCK_PROBE_INTERVAL:
+                self._last_probe = received_at
+                self._ws.send(json.dumps({"type": "clock", "t0": time.time()}))
+            yield None, None, b64_image, data
+
+    def _close(self):
+        if self._ws is not None:
+            try:
+                self._ws.close()
+            except Exception:
+                pass
+            self._ws = None
+
+
+def open_source(url, on_status=None, **kwargs):
+    """URL 스킴에 맞는 FrameSource를 만듭니다 (시작은 호출한 쪽에서 start())."""
+    if url.startswith(("http://", "https://")):
+        return MjpegHttpSource(url, on_status, **kwargs)
+    if url.startswith(("rtsp://", "rtsps://")):
+        return RtspSource(url, on_status, **kwargs)
+    if url.startswith(("ws://", "wss://")):
+        return WebSocketSource(url, on_status, **kwargs)
+    return VideoFileSource(url, on_status, **kwargs)
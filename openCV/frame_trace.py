@@ -0,0 +1,144 @@
+# frame_trace.py
+# 프레임 번호(frame_id) 기준의 구간별 지연 시간 추적.
+# 카메라 서버가 보낸 capture/encode/send 시각(Pi 시계)을 시계 오프셋으로 웹 서버 시계로 바꾸고,
+# 웹 서버의 receive/decode/infer/emit, 브라우저의 display ack 시각과 합쳐 구간(hop)별 히스토그램을 만듭니다.
+import threading
+import time
+from collections import OrderedDict
+
+# 프레임이 거치는 순서. 각 구간의 지연 시간은 '이 단계 시각 - 직전에 기록된 단계 시각'입니다.
+HOPS = ("capture", "encode", "send", "receive", "decode", "infer", "emit", "display")
+PI_HOPS = ("capture", "encode", "send")
+
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+MAX_PENDING = 256          # 완료를 기다리는 프레임 기록의 최대 개수
+PENDING_TIMEOUT = 5.0      # display ack가 이 시간 안에 오지 않으면 있는 구간만으로 마감 (초)
+
+
+class LatencyHistogram:
+    """고정 버킷(ms) 히스토그램. 백분위는 버킷 상한으로 근사합니다."""
+    def __init__(self, buckets=BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1) # 마지막 칸은 상한 초과
+        self.count = 0
+        self.total_ms = 0.0
+        self.min_ms = None
+        self.max_ms = None
+
+    def add(self, value_ms):
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value_ms <= bound:
+                index = i
+                break
+        self.counts[index] += 1
+        self.count += 1
+        self.total_ms += value_ms
+        self.min_ms = value_ms if self.min_ms is None else min(self.min_ms, value_ms)
+        self.max_ms = value_ms if self.max_ms is None else max(self.max_ms, value_ms)
+
+    def percentile(self, p):
+        if not self.count:
+            return None
+        target = self.count * p / 100.0
+        running = 0
+        for i, count in enumerate(self.counts):
+            running += count
+            if running >= target:
+                return self.buckets[i] if i < len(self.buckets) else self.max_ms
+        return self.max_ms
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total_ms / self.count, 2) if self.count else None,
+            "min_ms": round(self.min_ms, 2) if self.min_ms is not None else None,
+            "max_ms": round(self.max_ms, 2) if self.max_ms is not None else None,
+            "p50_ms": self.percentile(50), "p95_ms": self.percentile(95), "p99_ms": self.percentile(99),
+            "buckets": {(f"<={bound}" if i < len(self.buckets) else f">{self.buckets[-1]}"): count
+                        for i, (bound, count) in enumerate(zip(self.buckets + (None,), self.counts))},
+        }
+
+
+class FrameTracer:
+    """
+    frame_id별로 단계 시각을 모았다가, display ack가 오거나 PENDING_TIMEOUT이 지나면 구간별 히스토그램에 반영합니다.
+    여러 스레드(이미지 스레드, Socket.IO 핸들러)에서 호출해도 안전합니다.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = OrderedDict() # frame_id -> {hop: 로컬 시각}
+        self._last_frame_id = None
+        self.hops = {hop: LatencyHistogram() for hop in HOPS[1:]}
+        self.end_to_end = LatencyHistogram() # capture(없으면 receive) -> 마지막으로 기록된 단계
+        self.completed = 0
+        self.displayed = 0
+
+    def begin(self, frame_id, received_at, remote_trace=None, clock=None):
+        """
+        수신한 프레임의 기록을 시작합니다. remote_trace는 카메라 서버가 보낸 {hop: Pi 시각}이며,
+        clock(frame_source.ClockOffsetEstimator)의 오프셋이 준비된 경우에만 로컬 시각으로 바꿔 포함합니다.
+        """
+        stamps = {}
+        if remote_trace and clock is not None and clock.offset is not None:
+            for hop in PI_HOPS:
+                if remote_trace.get(hop) is not None:
+                    stamps[hop] = clock.to_local(remote_trace[hop])
+        stamps["receive"] = received_at
+        with self._lock:
+            if self._last_frame_id is not None and frame_id < self._last_frame_id:
+                # 카메라 서버가 재시작되어 번호가 처음부터 다시 시작된 경우
+                self._flush_locked(force=True)
+            self._last_frame_id = frame_id
+            self._pending[frame_id] = stamps
+            self._flush_locked()
+
+    def mark(self, frame_id, hop, timestamp=None):
+        """frame_id의 hop 단계 시각을 기록합니다. display가 기록되면 그 프레임을 마감합니다."""
+        timestamp = timestamp or time.time()
+        with self._lock:
+            stamps = self._pending.get(frame_id)
+            if stamps is None or hop in stamps:
+                return # 이미 마감됐거나 다른 브라우저가 먼저 ack한 경우
+            stamps[hop] = timestamp
+            if hop == "display":
+                self.displayed += 1
+                self._complete_locked(self._pending.pop(frame_id))
+
+    def _flush_locked(self, force=False):
+        now = time.time()
+        while self._pending:
+            frame_id, stamps = next(iter(self._pending.items()))
+            if not force and len(self._pending) <= MAX_PENDING and now - stamps["receive"] < PENDING_TIMEOUT:
+                break
+            self._complete_locked(self._pending.pop(frame_id))
+
+    def _complete_locked(self, stamps):
+        previous = None
+        for hop in HOPS:
+            if hop not in stamps:
+                continue
+            if previous is not None:
+                self.hops[hop].add((stamps[hop] - stamps[previous]) * 1000)
+            previous = hop
+        first = stamps.get("capture", stamps["receive"])
+        self.end_to_end.add((stamps[previous] - first) * 1000)
+        self.completed += 1
+
+    def snapshot(self):
+        with self._lock:
+            self._flush_locked()
+            return {
+                "completed": self.completed,
+                "displayed": self.displayed,
+                "pending": len(self._pending),
+                "hops": {hop: histogram.snapshot() for hop, histogram in self.hops.items() if histogram.count},
+                "end_to_end": self.end_to_end.snapshot(),
+            }
+
+    def summary_line(self):
+        """로그용 한 줄 요약: 구간별 p50/p95 (ms)."""
+        snapshot = self.snapshot()
+        parts = [f"{hop} {h['p50_ms']}/{h['p95_ms']}" for hop, h in snapshot["hops"].items()]
+        e2e = snapshot["end_to_end"]
+        return f"{' | '.join(parts)} | 전체 {e2e['p50_ms']}/{e2e['p95_ms']} (p50/p95 ms, {snapshot['completed']}프레임)"
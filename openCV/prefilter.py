@@ -0,0 +1,112 @@
+# prefilter.py
+# 라즈베리파이에서 돌리는 저비용 후보 검출기.
+# 기존 NCNN 모델을 작은 입력 크기(imgsz)로 실행하여 프레임마다 '손상 후보 점수'(0~1)를 매기고,
+# 카메라 서버가 이 점수를 프레임 메타데이터에 실어 보내면 웹 서버는 후보 프레임과 일부 샘플만 정밀 추론합니다.
+import os
+import threading
+import time
+
+try:
+    from ultralytics import YOLO
+except ImportError:
+    YOLO = None
+
+PREFILTER_MODEL_PATH = os.environ.get("PREFILTER_MODEL", "/home/pi/best_reversion_ncnn_model")
+PREFILTER_IMGSZ = 256          # 정밀 추론(640)보다 훨씬 작은 입력 크기
+PREFILTER_MIN_CONF = 0.10      # 이 값 이하의 검출은 점수에 반영하지 않음
+PREFILTER_HOLD_SEC = 1.0       # 후보가 검출되면 이 시간 동안 점수를 유지 (검출 직전/직후 프레임도 분석되도록)
+PREFILTER_RETRY_MIN_SEC = 0.5  # 캡처/추론 실패 시 재시도 간격 (실패가 이어지면 두 배씩 늘림)
+PREFILTER_RETRY_MAX_SEC = 5.0
+CANDIDATE_KEYWORDS = ["warning", "damage", "damaged", "defect", "broken", "fail"]
+
+
+class CandidatePrefilter(threading.Thread):
+    """
+    카메라의 최신 프레임을 자기 속도로 가져와 작은 입력 크기로 추론하고, 최신 후보 점수를 보관하는 스레드.
+    방송 루프는 candidate_for()로 점수만 읽으므로 prefilter가 느려도 스트림 FPS에는 영향이 없습니다.
+    점수는 채점한 프레임의 캡처 시각과 함께 보관하고, 그 시각과 한 프레임 간격 이내의 프레임에만 붙입니다.
+    카메라 재설정(해상도/FPS/화질 변경) 중 캡처가 실패해도 스레드는 멈추지 않고 간격을 늘려 가며 다시 시도합니다.
+    """
+    def __init__(self, camera, model_path=PREFILTER_MODEL_PATH, imgsz=PREFILTER_IMGSZ):
+        super().__init__()
+        self.daemon = True
+        self.camera = camera
+        self.imgsz = imgsz
+        self.is_running = True
+        self.model = YOLO(model_path, task='detect')
+        names = self.model.names
+        iterable = names.items() if isinstance(names, dict) else enumerate(names)
+        # 후보로 볼 클래스 인덱스는 로드 시 한 번만 계산합니다.
+        self.candidate_classes = [int(idx) for idx, name in iterable
+                                  if any(k in str(name).lower() for k in CANDIDATE_KEYWORDS)]
+        self._lock = threading.Lock()
+        self._scored = None   # 마지막으로 채점한 프레임의 (캡처 시각, 점수)
+        self._last_hit = None # 마지막으로 후보가 검출된 프레임의 (캡처 시각, 점수)
+        self.infer_ms = None
+
+    def run(self):
+        retry_sec = PREFILTER_RETRY_MIN_SEC
+        while self.is_running:
+            try:
+                self._score_frame()
+                retry_sec = PREFILTER_RETRY_MIN_SEC
+            except Exception as e:
+                print(f"[Prefilter] 후보 검출 중 오류 발생, {retry_sec:.1f}초 후 다시 시도합니다: {e}")
+                time.sleep(retry_sec)
+                retry_sec = min(retry_sec * 2, PREFILTER_RETRY_MAX_SEC)
+
+    def _score_frame(self):
+        frame = self.camera.capture_array()
+        # capture_array()는 새 프레임이 준비되면 반환하므로, 반환 시각을 채점한 프레임의 캡처 시각으로 씁니다.
+        captured_at = start = time.time()
+        results = self.model(frame, imgsz=self.imgsz, conf=PREFILTER_MIN_CONF,
+                             classes=self.candidate_classes or None, verbose=False)
+        boxes = results[0].boxes
+        score = float(boxes.conf.max()) if len(boxes) else 0.0
+        with self._lock:
+            self.infer_ms = (time.time() - start) * 1000
+            self._scored = (captured_at, score)
+            if score > 0:
+                self._last_hit = (captured_at, score)
+
+    def candidate_for(self, timestamp):
+        """
+        timestamp(방송할 프레임이 준비된 시각)에 붙일 {'score', 'frame_ts', 'offset_ms', 'infer_ms'} 딕셔너리.
+        그 프레임과 한 프레임 간격 이내에 캡처해 채점한 점수만 붙이고, 없으면 None입니다 (웹 서버가 분석).
+        단, PREFILTER_HOLD_SEC 이내에 후보가 검출되었으면 그 점수를 붙입니다 (정밀 추론이 늘어나는 쪽이라 안전합니다).
+        """
+        period = 1.0 / max(self.camera.fps or 1, 1)
+        with self._lock:
+            scored, hit, infer_ms = self._scored, self._last_hit, self.infer_ms
+        if hit is not None and abs(timestamp - hit[0]) <= PREFILTER_HOLD_SEC:
+            frame_ts, score = hit
+        elif scored is not None and abs(timestamp - scored[0]) <= period:
+            frame_ts, score = scored
+        else:
+            return None
+        return {
+            'score': round(score, 3),
+            'frame_ts': frame_ts,
+            'offset_ms': round((timestamp - frame_ts) * 1000, 1),
+            'infer_ms': round(infer_ms, 1),
+        }
+
+    def stop(self):
+        self.is_running = False
+
+
+def start_prefilter(camera):
+    """
+    prefilter를 시작합니다. PREFILTER_MODEL=off 이거나 ultralytics/모델을 사용할 수 없으면 None을 반환하며,
+    그 경우 프레임에 후보 점수가 붙지 않아 웹 서버는 기존처럼 모든 프레임을 분석합니다.
+    """
+    if PREFILTER_MODEL_PATH.lower() in ("", "off", "none") or YOLO is None:
+        return None
+    try:
+        prefilter = CandidatePrefilter(camera)
+    except Exception as e:
+        print(f"[Prefilter] 모델을 불러올 수 없어 후보 점수를 비활성화합니다: {e}")
+        return None
+    prefilter.start()
+    print(f"[Prefilter] 후보 검출 시작 (imgsz={prefilter.imgsz}, 후보 클래스={prefilter.candidate_classes})")
+    return prefilter
@@ -0,0 +1,16 @@
+# bench: 한 대의 리눅스 PC에서 루프백으로 돌리는 스트리밍 벤치마크.
+# 합성 카메라 -> (WebSocket 서버 | MJPEG HTTP | RTSP) -> 웹 서버 이미지 클라이언트와 같은 FrameSource 수신 경로를
+# 전송 방식/인코딩 설정별로 실행하여 실제 전송 바이트, FPS, 지연 시간 백분위(p50/p95/p99)를 JSON으로 저장합니다.
+#
+# 사용 예 (openCV/test 폴더에서):
+#     python -m bench run --transports ws,mjpeg,rtsp --duration 10 --out results.json
+#     python -m bench compare before.json after.json
+import os
+import sys
+
+# camera_backend, frame_source 등 openCV/ 모듈과 WebSocket 서버(openCV/test/ws)를 불러오기 위한 경로 설정
+_HERE = os.path.dirname(os.path.abspath(__file__))
+for _path in (os.path.join(_HERE, '..', '..'), os.path.join(_HERE, '..', 'ws')):
+    _path = os.path.abspath(_path)
+    if _path not in sys.path:
+        sys.path.insert(0, _path)
@@ -0,0 +1,49 @@
+import argparse
+
+from .compare import compare
+from .fleet import run_fleet
+from .runner import parse_setting, run_matrix, write_results
+
+DEFAULT_SETTINGS = "640x480@10:90,640x480@10:70,320x240@10:70"
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m bench", description="루프백 스트리밍 벤치마크")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="벤치마크를 실행하고 결과를 JSON으로 저장")
+    run_parser.add_argument("--transports", default="ws,mjpeg,rtsp", help="쉼표로 구분 (ws, mjpeg, rtsp)")
+    run_parser.add_argument("--settings", default=DEFAULT_SETTINGS, help="가로x세로@FPS:품질, 쉼표로 구분")
+    run_parser.add_argument("--duration", type=float, default=10.0, help="조합별 측정 시간 (초)")
+    run_parser.add_argument("--warmup", type=float, default=2.0, help="측정 전 연결/버퍼 안정화 시간 (초)")
+    run_parser.add_argument("--out", default="bench_results.json")
+
+    compare_parser = commands.add_parser("compare", help="두 결과 파일을 비교")
+    compare_parser.add_argument("before")
+    compare_parser.add_argument("after")
+
+    fleet_parser = commands.add_parser("fleet", help="가상 카메라 여러 대를 각자의 WebSocket 포트로 서비스")
+    fleet_parser.add_argument("--cameras", type=int, default=8)
+    fleet_parser.add_argument("--source", default=None, help="영상 파일, 이미지 폴더 또는 synthetic (기본값)")
+    fleet_parser.add_argument("--setting", default="640x480@10:80", help="가로x세로@FPS:품질")
+    fleet_parser.add_argument("--jitter-ms", type=float, default=0.0, help="프레임 간격 흔들림 (±ms)")
+    fleet_parser.add_argument("--drop", type=float, default=0.0, help="프레임 누락 확률 (0~1)")
+    fleet_parser.add_argument("--host", default="0.0.0.0")
+    fleet_parser.add_argument("--base-port", type=int, default=9100)
+
+    args = parser.parse_args()
+    if args.command == "compare":
+        compare(args.before, args.after)
+        return
+    if args.command == "fleet":
+        width, height, fps, quality = parse_setting(args.setting)
+        run_fleet(args.cameras, args.source, (width, height), fps, quality,
+                  args.jitter_ms, args.drop, args.host, args.base_port)
+        return
+    transports = [t.strip() for t in args.transports.split(",") if t.strip()]
+    settings = [parse_setting(s) for s in args.settings.split(",") if s.strip()]
+    write_results(run_matrix(transports, settings, args.duration, args.warmup), args.out)
+
+
+if __name__ == "__main__":
+    main()
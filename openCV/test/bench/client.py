@@ -0,0 +1,80 @@
+# client.py
+# 웹 서버의 ImageClientThread와 같은 FrameSource(open_source)로 프레임을 받아 측정하는 벤치마크 클라이언트.
+# 받은 프레임은 모두 디코딩하고 바코드 번호로 캡처 시각을 찾아 지연 시간(캡처 -> 수신/디코딩 완료)을 기록합니다.
+import threading
+import time
+
+import numpy as np
+
+from frame_source import open_source
+from .synthetic import read_frame_id
+
+
+def latency_summary(latencies_ms):
+    """지연 시간 목록의 p50/p95/p99/평균/최대 (ms). 값이 없으면 None."""
+    if not latencies_ms:
+        return None
+    values = np.asarray(latencies_ms)
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"p50": round(float(p50), 2), "p95": round(float(p95), 2), "p99": round(float(p99), 2),
+            "mean": round(float(values.mean()), 2), "max": round(float(values.max()), 2)}
+
+
+class BenchClient(threading.Thread):
+    """reset()부터 result()까지의 구간에 대해 수신 프레임 수, 전송 바이트, 지연 시간을 모읍니다."""
+    def __init__(self, url, camera):
+        super().__init__()
+        self.daemon = True
+        self.camera = camera
+        self.source = open_source(url)
+        self.is_running = True
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._window_start = time.time()
+            self._wire_start = self.source.stats.wire_bytes
+            self._captured_start = self.camera.frames_captured
+            self._received = 0
+            self._unmatched = 0
+            self._latencies = []
+
+    def run(self):
+        self.source.start()
+        while self.is_running:
+            frame = self.source.read(timeout=1.0)
+            if frame is None:
+                continue
+            frame_id = read_frame_id(frame.image)
+            received_at = time.time()
+            captured_at = self.camera.capture_time(frame_id) if frame_id is not None else None
+            with self._lock:
+                self._received += 1
+                if captured_at is None:
+                    self._unmatched += 1
+                else:
+                    self._latencies.append((received_at - captured_at) * 1000)
+
+    def result(self):
+        with self._lock:
+            elapsed = max(time.time() - self._window_start, 1e-6)
+            captured = self.camera.frames_captured - self._captured_start
+            wire_bytes = self.source.stats.wire_bytes - self._wire_start
+            return {
+                "elapsed_s": round(elapsed, 2),
+                "frames_captured": captured,
+                "frames_received": self._received,
+                "frames_unmatched": self._unmatched,
+                "delivery_ratio": round(self._received / captured, 3) if captured else None,
+                "fps": round(self._received / elapsed, 2),
+                # RTSP처럼 OpenCV가 소켓을 직접 읽는 소스는 클라이언트에서 바이트를 셀 수 없어 None
+                "wire_bytes": wire_bytes or None,
+                "wire_kbps": round(wire_bytes * 8 / 1000 / elapsed, 1) if wire_bytes else None,
+                "bytes_per_frame": round(wire_bytes / self._received) if wire_bytes and self._received else None,
+                "latency_ms": latency_summary(self._latencies),
+            }
+
+    def stop(self):
+        self.is_running = False
+        self.source.stop()
@@ -0,0 +1,41 @@
+# compare.py
+# 두 벤치마크 결과(JSON)를 전송 방식/설정별로 짝지어 주요 지표의 변화를 표로 출력합니다.
+import json
+
+METRICS = [
+    ("fps", lambda run: run.get("fps"), True),
+    ("wire_kbps", lambda run: run.get("wire_kbps"), False),
+    ("p50_ms", lambda run: (run.get("latency_ms") or {}).get("p50"), False),
+    ("p95_ms", lambda run: (run.get("latency_ms") or {}).get("p95"), False),
+    ("p99_ms", lambda run: (run.get("latency_ms") or {}).get("p99"), False),
+]
+
+
+def _load(path):
+    with open(path) as f:
+        data = json.load(f)
+    return data, {(run["transport"], run["setting"]): run for run in data["runs"]}
+
+
+def _format_change(before, after, higher_is_better):
+    if before is None or after is None:
+        return f"{before if before is not None else '-':>9} -> {after if after is not None else '-':<9}"
+    change = (after - before) / before * 100 if before else 0.0
+    better = (change > 0) == higher_is_better
+    mark = "" if abs(change) < 5 else ("+" if better else "!")
+    return f"{before:>9} -> {after:<9} ({change:+.1f}%){mark}"
+
+
+def compare(before_path, after_path):
+    """변화가 5% 이상이면 개선은 '+', 악화는 '!'로 표시합니다."""
+    before_data, before_runs = _load(before_path)
+    after_data, after_runs = _load(after_path)
+    print(f"before: {before_data['env'].get('commit')}  after: {after_data['env'].get('commit')}")
+    for key in sorted(set(before_runs) | set(after_runs)):
+        before, after = before_runs.get(key), after_runs.get(key)
+        print(f"\n{key[0]} {key[1]}")
+        if not before or not after or before.get("status") != "ok" or after.get("status") != "ok":
+            print(f"  status: {before and before.get('status')} -> {after and after.get('status')}")
+            continue
+        for name, getter, higher_is_better in METRICS:
+            print(f"  {name:<10} {_format_change(getter(before), getter(after), higher_is_better)}")
@@ -0,0 +1,33 @@
+# fleet.py
+# 가상 카메라 여러 대를 한 프로세스에서 각자의 포트로 서비스합니다 (여러 로봇을 흉내 낸 웹 서버 부하 테스트용).
+# 각 카메라는 실제 카메라 서버와 같은 rpi_ws_server.serve_camera()로 서비스되므로
+# 웹 서버의 이미지 클라이언트는 ws://<host>:<base_port + n> 으로 접속하면 됩니다.
+import asyncio
+
+import rpi_ws_server
+from camera_backend import open_virtual_cameras
+from congestion_control import CongestionController
+
+
+async def serve_fleet(cameras, host, base_port):
+    servers = []
+    for index, camera in enumerate(cameras):
+        # 부하를 일정하게 유지하도록 동작 지점은 지정한 설정 하나로 고정하고, 접속자 목록은 카메라마다 따로 둡니다.
+        controller = CongestionController([camera.size], (camera.fps, camera.fps), (camera.quality, camera.quality))
+        servers.append(rpi_ws_server.serve_camera(camera, controller, host, base_port + index, clients={}))
+    await asyncio.gather(*servers)
+
+
+def run_fleet(count, source, size, fps, quality, jitter_ms, drop_rate, host, base_port):
+    cameras = open_virtual_cameras(count, source, size, fps, quality, jitter_ms=jitter_ms, drop_rate=drop_rate)
+    print(f"[Fleet] 가상 카메라 {count}대 ({source or 'synthetic'}, {size[0]}x{size[1]} @ {fps} FPS, "
+          f"jitter {jitter_ms} ms, drop {drop_rate:.0%})")
+    for index in range(count):
+        print(f"[Fleet]   camera {index}: ws://{host}:{base_port + index}")
+    try:
+        asyncio.run(serve_fleet(cameras, host, base_port))
+    except KeyboardInterrupt:
+        print("[Fleet] 종료합니다.")
+    finally:
+        for camera in cameras:
+            camera.stop()
@@ -0,0 +1,110 @@
+# runner.py
+# 전송 방식 x 인코딩 설정 조합을 하나씩 실행하고 결과를 커밋 간에 diff할 수 있는 JSON으로 저장합니다.
+import datetime
+import json
+import platform
+import re
+import subprocess
+import time
+
+import cv2
+
+from .client import BenchClient
+from .servers import SERVERS, ServerUnavailable
+from .synthetic import SyntheticCamera
+
+SCHEMA_VERSION = 1
+SETTING_PATTERN = re.compile(r"^(\d+)x(\d+)@(\d+):(\d+)$")
+
+
+def parse_setting(text):
+    """'640x480@10:90' -> (640, 480, 10, 90). 형식은 가로x세로@FPS:품질."""
+    match = SETTING_PATTERN.match(text.strip())
+    if not match:
+        raise ValueError(f"인코딩 설정 형식이 올바르지 않습니다 (예: 640x480@10:90): {text}")
+    return tuple(int(value) for value in match.groups())
+
+
+def setting_label(width, height, fps, quality):
+    return f"{width}x{height}@{fps}:{quality}"
+
+
+def run_once(transport, setting, duration, warmup):
+    """한 조합을 실행하여 결과 딕셔너리를 반환합니다. 실행할 수 없는 전송 방식은 status='skipped'."""
+    width, height, fps, quality = setting
+    run = {"transport": transport, "setting": setting_label(*setting),
+           "width": width, "height": height, "fps_target": fps, "quality": quality}
+    camera = SyntheticCamera(size=(width, height), fps=fps, quality=quality).start()
+    server = client = None
+    try:
+        try:
+            server = SERVERS[transport](camera).start()
+        except ServerUnavailable as e:
+            print(f"[Bench] {transport} 건너뜀: {e}")
+            return dict(run, status="skipped", reason=str(e))
+
+        client = BenchClient(server.url, camera)
+        client.start()
+        time.sleep(warmup)
+        client.reset()
+        sent_start = server.server_stats().get("sent_bytes")
+        time.sleep(duration)
+        result = client.result()
+        sent_end = server.server_stats().get("sent_bytes")
+        if sent_start is not None and sent_end is not None:
+            result["server_sent_bytes"] = sent_end - sent_start
+        run.update(result, status="ok" if result["frames_received"] else "failed")
+        return run
+    finally:
+        if client is not None:
+            client.stop()
+        if server is not None:
+            server.stop()
+        camera.stop()
+
+
+def _git(*args):
+    try:
+        return subprocess.check_output(["git", *args], stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    """결과를 비교할 때 필요한 실행 환경 정보."""
+    return {
+        "commit": _git("rev-parse", "--short", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "host": platform.node(),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "opencv": cv2.__version__,
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+    }
+
+
+def run_matrix(transports, settings, duration, warmup):
+    runs = []
+    for setting in settings:
+        for transport in transports:
+            print(f"[Bench] {transport} {setting_label(*setting)} 측정 중 ({duration:.0f}초)...")
+            run = run_once(transport, setting, duration, warmup)
+            if run["status"] == "ok":
+                latency = run["latency_ms"] or {}
+                print(f"[Bench]   FPS {run['fps']:.1f} | wire {run['wire_kbps'] or '-'} kbps | "
+                      f"p50 {latency.get('p50', '-')} / p95 {latency.get('p95', '-')} / p99 {latency.get('p99', '-')} ms")
+            runs.append(run)
+    return {
+        "schema": SCHEMA_VERSION,
+        "env": environment(),
+        "params": {"duration_s": duration, "warmup_s": warmup},
+        "runs": runs,
+    }
+
+
+def write_results(results, path):
+    # 키 순서를 고정하고 한 줄에 한 값씩 써서 커밋 간에 텍스트 diff가 잘 보이도록 합니다.
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write("\n")
+    print(f"[Bench] 결과를 {path}에 저장했습니다.")
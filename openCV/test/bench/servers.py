@@ -0,0 +1,221 @@
+# servers.py
+# 벤치마크용 루프백 서버. 각 서버는 start()로 백그라운드에서 시작하고 url로 접속 주소를, server_stats()로 송신측 통계를 제공합니다.
+#   WsLoopbackServer     : 실제 카메라 서버(rpi_ws_server)의 세션/방송 코드를 그대로 사용
+#   MjpegLoopbackServer  : MJPEG_Transform_in_PI.py와 같은 multipart/x-mixed-replace 스트림
+#   RtspLoopbackServer   : ffmpeg(libx264) -> mediamtx -> RTSP (두 실행 파일이 모두 있을 때만)
+import asyncio
+import json
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import rpi_ws_server
+from congestion_control import CongestionController
+
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class ServerUnavailable(Exception):
+    """이 환경에서 실행할 수 없는 전송 방식 (결과에 skipped로 기록됩니다)."""
+
+
+class WsLoopbackServer:
+    """
+    rpi_ws_server.serve_camera()를 별도 이벤트 루프 스레드에서 실행합니다.
+    벤치마크는 인코딩 설정별로 측정하므로 혼잡 제어 단계는 설정값 하나로 고정합니다.
+    """
+    transport = "ws"
+
+    def __init__(self, camera):
+        self.camera = camera
+        self.port = free_port()
+        self.url = f"ws://127.0.0.1:{self.port}"
+        self.clients = {} # 이 서버의 접속자 (rpi_ws_server의 전역 목록과 분리)
+        self._loop = None
+        self._thread = None
+        self._task = None
+        self._ready = threading.Event()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        # serve_camera가 포트를 연 뒤 on_ready로 알려 줄 때까지 기다립니다.
+        if not self._ready.wait(5.0):
+            raise ServerUnavailable("WebSocket 서버를 시작할 수 없습니다.")
+        return self
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        width, height = self.camera.size
+        controller = CongestionController([(width, height)], (self.camera.fps, self.camera.fps),
+                                          (self.camera.quality, self.camera.quality))
+        self._task = self._loop.create_task(
+            rpi_ws_server.serve_camera(self.camera, controller, "127.0.0.1", self.port, clients=self.clients,
+                                       on_ready=self._ready.set))
+        try:
+            # stop()이 취소하면 serve_camera가 방송 작업과 서버를 정리한 뒤 끝납니다.
+            self._loop.run_until_complete(self._task)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._loop.close()
+
+    def server_stats(self):
+        sessions = list(self.clients.values())
+        return {"sent_bytes": sum(session.total_bytes for session in sessions), "clients": len(sessions)}
+
+    def stop(self):
+        if self._task is not None:
+            self._loop.call_soon_threadsafe(self._task.cancel)
+        if self._thread is not None:
+            self._thread.join(timeout=5.0)
+
+
+class MjpegLoopbackServer:
+    """카메라 백엔드의 JPEG 프레임을 그대로 multipart 파트로 내보내는 HTTP 서버."""
+    transport = "mjpeg"
+
+    def __init__(self, camera):
+        self.camera = camera
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}/video_feed"
+        self.sent_bytes = 0
+        self._httpd = None
+
+    def start(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                self.send_response(200)
+                self.send_header("Content-Type", "multipart/x-mixed-replace; boundary=frame")
+                self.end_headers()
+                sequence = 0
+                try:
+                    while True:
+                        # 여러 클라이언트가 각자 sequence를 관리하도록 camera.read() 대신 버퍼를 직접 읽습니다.
+                        frame = server.camera.frames.get(sequence, timeout=2.0)
+                        if frame is None:
+                            continue
+                        sequence = frame.sequence
+                        part = b"--frame\r\nContent-Type: image/jpeg\r\n\r\n" + frame.data + b"\r\n"
+                        self.wfile.write(part)
+                        server.sent_bytes += len(part)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", self.port), Handler)
+        self._httpd.daemon_threads = True
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        return self
+
+    def server_stats(self):
+        return {"sent_bytes": self.sent_bytes}
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+
+
+class RtspLoopbackServer:
+    """
+    합성 카메라의 원본 프레임을 ffmpeg(libx264, zerolatency)로 H.264 인코딩해 mediamtx에 게시합니다.
+    라즈베리파이의 rpicam-vid | ffmpeg -> mediamtx 경로를 대신하며, JPEG 품질은 대략적인 CRF 값으로 환산합니다.
+    """
+    transport = "rtsp"
+    path = "bench"
+
+    def __init__(self, camera):
+        self.camera = camera
+        self.ffmpeg = shutil.which("ffmpeg")
+        self.mediamtx = os.environ.get("MEDIAMTX") or shutil.which("mediamtx")
+        if not self.ffmpeg or not self.mediamtx:
+            raise ServerUnavailable("ffmpeg 또는 mediamtx 실행 파일을 찾을 수 없습니다.")
+        self.port = free_port()
+        self.api_port = free_port()
+        self.url = f"rtsp://127.0.0.1:{self.port}/{self.path}"
+        self._processes = []
+        self._config_dir = None
+        self._running = False
+
+    def start(self):
+        self._config_dir = tempfile.mkdtemp(prefix="bench_mediamtx_")
+        config_path = os.path.join(self._config_dir, "mediamtx.yml")
+        with open(config_path, "w") as f:
+            f.write(f"logLevel: warn\nrtspAddress: 127.0.0.1:{self.port}\nprotocols: [tcp]\n"
+                    f"api: yes\napiAddress: 127.0.0.1:{self.api_port}\n"
+                    "rtmp: no\nhls: no\nwebrtc: no\nsrt: no\npaths:\n  all_others:\n")
+        self._processes.append(subprocess.Popen([self.mediamtx, config_path],
+                                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+        time.sleep(1.0)
+
+        width, height = self.camera.size
+        crf = round(18 + (100 - self.camera.quality) * 0.3)
+        publisher = subprocess.Popen(
+            [self.ffmpeg, "-loglevel", "error", "-f", "rawvideo", "-pix_fmt", "bgr24",
+             "-s", f"{width}x{height}", "-r", str(self.camera.fps), "-i", "-",
+             "-c:v", "libx264", "-preset", "ultrafast", "-tune", "zerolatency", "-crf", str(crf),
+             "-g", str(self.camera.fps * 2), "-pix_fmt", "yuv420p",
+             "-f", "rtsp", "-rtsp_transport", "tcp", self.url],
+            stdin=subprocess.PIPE, stdout=subprocess.DEVNULL)
+        self._processes.append(publisher)
+        self._running = True
+        threading.Thread(target=self._publish_loop, args=(publisher,), daemon=True).start()
+        time.sleep(1.0)
+        return self
+
+    def _publish_loop(self, publisher):
+        sequence = 0
+        while self._running:
+            frame = self.camera.frames.get(sequence, timeout=2.0)
+            if frame is None:
+                continue
+            sequence = frame.sequence
+            try:
+                publisher.stdin.write(self.camera.capture_array().tobytes())
+            except (BrokenPipeError, ValueError):
+                return
+
+    def server_stats(self):
+        # mediamtx API가 있으면 시청자에게 보낸 바이트 수를 가져옵니다 (버전에 따라 필드가 없을 수 있음).
+        try:
+            with urllib.request.urlopen(
+                    f"http://127.0.0.1:{self.api_port}/v3/paths/get/{self.path}", timeout=2.0) as response:
+                data = json.loads(response.read())
+            return {"sent_bytes": data.get("bytesSent"), "received_bytes": data.get("bytesReceived")}
+        except Exception:
+            return {"sent_bytes": None}
+
+    def stop(self):
+        self._running = False
+        for process in reversed(self._processes):
+            if process.stdin:
+                try:
+                    process.stdin.close()
+                except OSError:
+                    pass
+            process.terminate()
+            try:
+                process.wait(timeout=5.0)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        if self._config_dir:
+            shutil.rmtree(self._config_dir, ignore_errors=True)
+
+
+SERVERS = {server.transport: server for server in (WsLoopbackServer, MjpegLoopbackServer, RtspLoopbackServer)}
@@ -0,0 +1,82 @@
+# synthetic.py
+# 프레임 번호를 영상 안에 바코드로 그려 넣는 합성 카메라.
+# 수신측은 디코딩한 이미지에서 번호를 읽어 캡처 시각과 짝지으므로, 프레임이 중간에 버려져도 지연 시간을 정확히 잴 수 있고
+# 메타데이터를 실을 수 없는 전송 방식(MJPEG, RTSP)에도 같은 방법을 쓸 수 있습니다.
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+
+from camera_backend import FakeCamera
+
+ID_BITS = 20            # 프레임 번호 비트 수 (10 FPS 기준 약 29시간)
+CHECK_BITS = 4          # 잘못 읽은 바코드를 걸러내기 위한 체크섬 비트 수
+BAR_HEIGHT = 16         # 바코드 줄의 높이 (px)
+MAX_TRACKED = 2000      # 보관할 캡처 시각의 최대 개수
+
+
+def _checksum(frame_id):
+    return sum((frame_id >> shift) & 0xF for shift in range(0, ID_BITS, 4)) & 0xF
+
+
+def _block_width(width):
+    # 압축으로 번지지 않도록 8px(JPEG 블록) 단위로 맞춥니다.
+    return max(8, (width // (ID_BITS + CHECK_BITS + 2)) // 8 * 8)
+
+
+def draw_frame_id(image, frame_id):
+    """이미지 왼쪽 위에 frame_id와 체크섬을 흑백 블록으로 그립니다."""
+    frame_id &= (1 << ID_BITS) - 1
+    value = (frame_id << CHECK_BITS) | _checksum(frame_id)
+    block = _block_width(image.shape[1])
+    image[:BAR_HEIGHT, :block * (ID_BITS + CHECK_BITS)] = 0
+    for bit in range(ID_BITS + CHECK_BITS):
+        if value >> (ID_BITS + CHECK_BITS - 1 - bit) & 1:
+            image[:BAR_HEIGHT, bit * block:(bit + 1) * block] = 255
+    return image
+
+
+def read_frame_id(image):
+    """draw_frame_id()로 그린 번호를 읽습니다. 바코드가 없거나 체크섬이 맞지 않으면 None."""
+    if image is None or image.shape[0] < BAR_HEIGHT:
+        return None
+    block = _block_width(image.shape[1])
+    gray = cv2.cvtColor(image[:BAR_HEIGHT], cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image[:BAR_HEIGHT]
+    # 블록 가장자리는 압축 잡음이 크므로 가운데 부분만 봅니다.
+    margin_y, margin_x = BAR_HEIGHT // 4, block // 4
+    value = 0
+    for bit in range(ID_BITS + CHECK_BITS):
+        cell = gray[margin_y:BAR_HEIGHT - margin_y, bit * block + margin_x:(bit + 1) * block - margin_x]
+        value = (value << 1) | int(cell.mean() > 127)
+    frame_id, check = value >> CHECK_BITS, value & ((1 << CHECK_BITS) - 1)
+    return frame_id if _checksum(frame_id) == check else None
+
+
+class SyntheticCamera(FakeCamera):
+    """
+    FakeCamera에 프레임 번호 바코드를 더한 벤치마크용 카메라.
+    프레임을 그린 시각을 번호별로 보관하므로 capture_time(frame_id)로 캡처 시각을 조회할 수 있습니다.
+    """
+    name = "synthetic"
+
+    def __init__(self, size=(640, 480), fps=10, quality=90, lores_size=None):
+        super().__init__(size, fps, quality, lores_size)
+        self._times = OrderedDict()
+        self._times_lock = threading.Lock()
+
+    def _render(self):
+        frame = draw_frame_id(super()._render(), self._index)
+        with self._times_lock:
+            self._times[self._index & ((1 << ID_BITS) - 1)] = time.time()
+            if len(self._times) > MAX_TRACKED:
+                self._times.popitem(last=False)
+        return frame
+
+    @property
+    def frames_captured(self):
+        return self._index
+
+    def capture_time(self, frame_id):
+        with self._times_lock:
+            return self._times.get(frame_id)
@@ -1,90 +1,325 @@
 # pi_stream_ws_server.py (일부 수정)
-from picamera2 import Picamera2
-import cv2
+import os
+import sys
 import asyncio
+import concurrent.futures
+import functools
 import websockets
 import base64
 import numpy as np
 import time
 import json # json 라이브러리 추가
+
+# openCV/camera_backend.py를 불러오기 위해 상위 폴더를 경로에 추가합니다.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from camera_backend import open_camera
+from congestion_control import CongestionController
+from prefilter import start_prefilter
 # ... (기존 코드)
-connected_clients = set()
 
-async def video_stream_handler(websocket):
+# --- 클라이언트별 전송 설정 ---
+CLIENT_QUEUE_SIZE = 2        # 클라이언트별 대기 프레임 수 (가득 차면 가장 오래된 프레임을 버림)
+SEND_TIMEOUT = 2.0           # 한 프레임 전송에 허용하는 최대 시간 (초)
+MAX_FRAME_STRIDE = 4         # 느린 클라이언트에게 최대 N프레임마다 1장만 보냄
+DOWNGRADE_DROP_RATIO = 0.3   # 통계 구간 동안 버린 프레임 비율이 이 값을 넘으면 한 단계 다운그레이드
+MAX_SEND_TIMEOUTS = 3        # 최대 다운그레이드 상태에서 연속 전송 시간 초과가 이만큼 나면 연결을 끊음
+STATS_INTERVAL = 5.0         # 클라이언트별 통계 로그 주기 (초)
+
+# --- 혼잡 제어 설정 (해상도/FPS/품질을 이 범위 안에서 조절) ---
+LATENCY_BUDGET_MS = 300.0    # 프레임 전송 시작부터 웹 서버 ack까지 허용하는 지연 시간
+CONTROL_INTERVAL = 1.0       # 혼잡 제어 주기 (초)
+RESOLUTIONS = [(640, 480), (480, 360), (320, 240)]
+FPS_RANGE = (4, 10)
+QUALITY_RANGE = (50, 90)
+MAX_PENDING_ACKS = 64        # ack를 기다리는 프레임 기록의 최대 개수
+
+# websocket -> ClientSession (카메라 하나를 서비스하는 기본 서버용. serve_camera()에 별도 딕셔너리를 넘기면 한 프로세스에서 여러 대를 서비스할 수 있음)
+connected_clients = {}
+
+
+class ClientSession:
+    """
+    접속한 클라이언트 한 명의 전송 큐와 전송 작업을 관리합니다.
+    방송 루프는 offer()로 프레임을 넣기만 하고 기다리지 않으므로, 느린 클라이언트가 캡처 속도를 떨어뜨리지 않습니다.
+    """
+    def __init__(self, websocket):
+        self.websocket = websocket
+        self.address = websocket.remote_address
+        self.queue = asyncio.Queue(maxsize=CLIENT_QUEUE_SIZE)
+        self.frame_stride = 1 # 1이면 모든 프레임 전송, 2면 두 프레임마다 1장
+        self.consecutive_timeouts = 0
+        # 통계 (STATS_INTERVAL 구간마다 초기화)
+        self.sent_frames = 0
+        self.sent_bytes = 0
+        self.dropped_frames = 0
+        self.offered_frames = 0
+        self.total_bytes = 0
+        self.stats_start = time.time()
+        # 혼잡 제어용 측정값 (CONTROL_INTERVAL 구간마다 초기화)
+        self.acks_enabled = False # ack를 보내는 클라이언트(웹 서버)만 혼잡 제어에 반영합니다
+        self.sent_at = {}         # frame_id -> 전송 시작 시각
+        self.ack_rtts = []
+        self.depth_samples = []
+        self.sender_task = asyncio.create_task(self.sender())
+
+    def offer(self, frame_index, message):
+        """인코딩이 끝난 메시지를 큐에 넣습니다. 큐가 가득 차면 가장 오래된 프레임을 버립니다 (latest-wins)."""
+        if frame_index % self.frame_stride != 0:
+            return
+        self.offered_frames += 1
+        self.depth_samples.append(self.queue.qsize())
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped_frames += 1
+        self.queue.put_nowait((frame_index, message))
+
+    def handle_message(self, raw_message):
+        """
+        클라이언트가 보낸 메시지를 처리하고, 바로 돌려보낼 응답이 있으면 반환합니다.
+        {'type': 'ack', 'frame_id': n}이면 왕복 시간을 기록하고,
+        {'type': 'clock', 't0': ...}이면 이 서버의 현재 시각(t1)을 붙여 돌려보냅니다 (웹 서버의 시계 오프셋 추정용).
+        """
+        try:
+            data = json.loads(raw_message)
+        except (TypeError, ValueError):
+            return None
+        if not isinstance(data, dict):
+            return None
+        if data.get('type') == 'clock':
+            return json.dumps({'type': 'clock', 't0': data.get('t0'), 't1': time.time()})
+        if data.get('type') != 'ack':
+            return None
+        sent_time = self.sent_at.pop(data.get('frame_id'), None)
+        if sent_time is not None:
+            self.acks_enabled = True
+            self.ack_rtts.append((time.time() - sent_time) * 1000)
+        return None
+
+    def take_control_sample(self):
+        """혼잡 제어 구간의 (평균 큐 깊이, ack RTT 목록)을 반환하고 초기화합니다."""
+        depth = sum(self.depth_samples) / len(self.depth_samples) if self.depth_samples else 0.0
+        rtts = self.ack_rtts
+        self.depth_samples = []
+        self.ack_rtts = []
+        return depth, rtts
+
+    async def sender(self):
+        """큐에서 프레임을 꺼내 이 클라이언트에게만 전송합니다."""
+        while True:
+            frame_id, message = await self.queue.get()
+            send_start = time.time()
+            self.sent_at[frame_id] = send_start
+            if len(self.sent_at) > MAX_PENDING_ACKS:
+                # ack가 오지 않은 오래된 기록은 버립니다 (dict는 삽입 순서를 유지).
+                self.sent_at.pop(next(iter(self.sent_at)))
+            try:
+                # 전송 시각은 클라이언트마다 다르므로, 공유 메시지를 복사하지 않도록 작은 메시지로 먼저 보냅니다 (지연 시간 추적의 send 단계).
+                await self.websocket.send('{"type": "sent", "frame_id": %d, "sent_at": %.6f}' % (frame_id, send_start))
+                # 전송 도중 취소하면 웹소켓 프레임이 깨질 수 있으므로, 끝까지 보낸 뒤 걸린 시간으로 판단합니다.
+                await self.websocket.send(message)
+            except websockets.ConnectionClosed:
+                return
+            if time.time() - send_start > SEND_TIMEOUT:
+                self.consecutive_timeouts += 1
+                print(f"[WS] 클라이언트 {self.address} 전송 시간 초과 ({self.consecutive_timeouts}회 연속).")
+                if self.frame_stride >= MAX_FRAME_STRIDE and self.consecutive_timeouts >= MAX_SEND_TIMEOUTS:
+                    print(f"[WS] 클라이언트 {self.address}가 너무 느려 연결을 끊습니다.")
+                    await self.websocket.close(code=1013, reason="client too slow")
+                    return
+                self.downgrade()
+            else:
+                self.consecutive_timeouts = 0
+            self.sent_frames += 1
+            self.sent_bytes += len(message)
+            self.total_bytes += len(message)
+
+    def downgrade(self):
+        if self.frame_stride < MAX_FRAME_STRIDE:
+            self.frame_stride *= 2
+            print(f"[WS] 클라이언트 {self.address} 다운그레이드: {self.frame_stride}프레임마다 1장 전송.")
+
+    def upgrade(self):
+        if self.frame_stride > 1:
+            self.frame_stride //= 2
+            print(f"[WS] 클라이언트 {self.address} 업그레이드: {self.frame_stride}프레임마다 1장 전송.")
+
+    def report_and_adjust(self):
+        """구간 통계를 출력하고, 버린 프레임 비율에 따라 전송 간격을 조정한 뒤 통계를 초기화합니다."""
+        elapsed = max(time.time() - self.stats_start, 1e-6)
+        fps = self.sent_frames / elapsed
+        print(f"[WS] {self.address} | FPS: {fps:.1f} | 대기: {self.queue.qsize()}/{CLIENT_QUEUE_SIZE} | "
+              f"전송: {self.sent_bytes / 1024:.0f} KB ({self.total_bytes / (1024 * 1024):.1f} MB 누적) | "
+              f"버림: {self.dropped_frames}/{self.offered_frames} | 간격: 1/{self.frame_stride}")
+
+        drop_ratio = self.dropped_frames / self.offered_frames if self.offered_frames else 0.0
+        if drop_ratio > DOWNGRADE_DROP_RATIO:
+            self.downgrade()
+        elif self.dropped_frames == 0 and self.consecutive_timeouts == 0:
+            self.upgrade()
+
+        self.sent_frames = 0
+        self.sent_bytes = 0
+        self.dropped_frames = 0
+        self.offered_frames = 0
+        self.stats_start = time.time()
+
+    def close(self):
+        self.sender_task.cancel()
+
+
+async def video_stream_handler(websocket, clients=connected_clients):
     """클라이언트가 접속하면 호출되며, 영상 스트림을 전송합니다."""
     print(f"클라이언트 {websocket.remote_address} 접속.")
-    connected_clients.add(websocket)
+    session = ClientSession(websocket)
+    clients[websocket] = session
     try:
-        # 클라이언트가 연결을 끊을 때까지 계속 실행
-        await websocket.wait_closed()
+        # 클라이언트가 연결을 끊을 때까지 계속 실행 (그동안 ack 메시지를 처리)
+        async for raw_message in websocket:
+            reply = session.handle_message(raw_message)
+            if reply is not None:
+                await websocket.send(reply)
+    except websockets.ConnectionClosed:
+        pass
     finally:
         print(f"클라이언트 {websocket.remote_address} 접속 종료.")
-        connected_clients.remove(websocket)
-
-async def broadcast_frames():
-    # 1. Picamera2 객체 생성 및 10 FPS로 설정
-    picam2 = Picamera2()
-    config = picam2.create_preview_configuration(
-        main={"format": 'XRGB8888', "size": (640, 480)},
-        controls={"FrameRate": 10}
-    )
-    picam2.configure(config)
-    picam2.start()
-    print("카메라가 10 FPS로 설정되었습니다.")
+        clients.pop(websocket, None)
+        session.close()
 
+async def report_client_stats(clients=connected_clients):
+    """STATS_INTERVAL마다 클라이언트별 FPS, 큐 깊이, 전송량을 출력합니다."""
+    while True:
+        await asyncio.sleep(STATS_INTERVAL)
+        for session in list(clients.values()):
+            session.report_and_adjust()
+
+async def control_stream(camera, controller, encode_times, clients=connected_clients):
+    """
+    CONTROL_INTERVAL마다 큐 깊이, ack RTT, 인코딩 시간을 모아 혼잡 제어기에 넘기고,
+    동작 지점이 바뀌면 카메라를 다시 설정합니다.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(CONTROL_INTERVAL)
+        samples = [(session.acks_enabled, session.take_control_sample())
+                   for session in list(clients.values())]
+        # ack를 보내는 클라이언트(웹 서버)가 있으면 그 클라이언트만 기준으로 삼습니다.
+        # 다른 시청자는 031의 클라이언트별 다운그레이드로만 처리되어 웹 서버의 화질을 떨어뜨리지 않습니다.
+        if any(acks for acks, _ in samples):
+            samples = [sample for acks, sample in samples if acks]
+        else:
+            samples = [sample for _, sample in samples]
+        if not samples:
+            continue
+
+        queue_depth = max(depth for depth, _ in samples)
+        rtts = sorted(rtt for _, session_rtts in samples for rtt in session_rtts)
+        rtt_p90 = rtts[int(len(rtts) * 0.9)] if rtts else None
+        encode_ms = sum(encode_times) / len(encode_times) if encode_times else None
+        encode_times.clear()
+
+        op = controller.update(queue_depth, rtt_p90, encode_ms)
+        if op is not None:
+            print(f"[Control] 동작 지점 변경 ({controller.last_reason}): "
+                  f"{op.width}x{op.height} @ {op.fps} FPS, 품질 {op.quality} (단계 {controller.level})")
+            await loop.run_in_executor(None, camera.reconfigure, (op.width, op.height), op.fps, op.quality)
+
+async def broadcast_frames(camera, controller, encode_times, prefilter=None, clients=connected_clients, reader=None):
     # asyncio의 현재 이벤트 루프를 가져옵니다.
     loop = asyncio.get_running_loop()
     
-    FPS = 10
-    frame_duration = 1.0 / FPS
+    frame_index = 0
 
     while True:
-        loop_start_time = time.time()
-
-        frame = picam2.capture_array()
+        # 현재 동작 지점 (FPS는 혼잡 제어기가 camera.reconfigure()로 카메라에 적용하므로 여기서 따로 맞추지 않습니다)
+        op = controller.current
 
-        # JPEG 인코딩 (별도 스레드에서 실행하여 이벤트 루프 블로킹 방지)
-        retval, buffer = await loop.run_in_executor(
-            None, cv2.imencode, '.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 90]
-        )
-        if not retval:
+        # 이미 JPEG로 인코딩된 프레임을 받아옵니다. (인코딩은 카메라 백엔드가 담당하므로 cv2.imencode가 필요 없음)
+        # camera.read()는 새 프레임이 나올 때까지 기다리므로 방송 속도는 카메라의 프레임 속도를 따릅니다.
+        # 프레임을 기다리는 동안 클라이언트 전송 작업이 진행되도록 별도 스레드(reader, 없으면 기본 실행기)에서 기다립니다.
+        frame = await loop.run_in_executor(reader, camera.read)
+        if frame is None:
             continue
+        if frame.encode_ms is not None:
+            encode_times.append(frame.encode_ms)
 
         # Base64 인코딩
-        jpg_as_text = base64.b64encode(buffer).decode('utf-8')
+        jpg_as_text = base64.b64encode(frame.data).decode('utf-8')
 
-        # 현재 시간을 타임스탬프로 찍어서 JSON으로 만듦
-        current_timestamp = time.time()
-        message = json.dumps({
+        # 프레임이 준비된 시각을 타임스탬프로 찍어서 JSON으로 만듦
+        current_timestamp = frame.timestamp
+        # frame_id는 웹 서버가 ack로 돌려보내고, op는 현재 동작 지점(해상도/FPS/품질)을 알려줍니다.
+        # trace는 단계별 시각(이 서버의 시계)으로, 웹 서버가 구간별 지연 시간을 계산하는 데 씁니다.
+        # 하드웨어 인코더는 인코딩 시간을 알 수 없어 capture와 encode가 같은 값이 됩니다.
+        header = {
             'timestamp': current_timestamp,
-            'image': jpg_as_text
-        })
+            'frame_id': frame_index,
+            'trace': {'capture': current_timestamp - (frame.encode_ms or 0) / 1000, 'encode': current_timestamp},
+            'op': {'width': frame.size[0], 'height': frame.size[1], 'fps': op.fps,
+                   'quality': op.quality, 'level': controller.level},
+        }
+        # prefilter가 켜져 있으면 이 프레임과 한 프레임 간격 이내에 채점한 후보 점수를 붙여, 웹 서버가 정밀 추론할 프레임을 고르게 합니다.
+        candidate = prefilter.candidate_for(frame.timestamp) if prefilter else None
+        if candidate is not None:
+            header['candidate'] = candidate
+        message = json.dumps(dict(header, image=jpg_as_text))
 
-        # 연결된 모든 클라이언트에게 프레임 전송
-        if connected_clients:
-            await asyncio.wait([client.send(message) for client in connected_clients])
+        # 연결된 모든 클라이언트의 큐에 프레임을 넣음
+        # (메시지는 한 번만 인코딩하고 같은 문자열을 참조로 공유하며, 전송 완료를 기다리지 않음)
+        for session in list(clients.values()):
+            session.offer(frame_index, message)
+        frame_index += 1
 
-        # 10 FPS를 유지하기 위한 동적 sleep
-        elapsed_time = time.time() - loop_start_time
-        sleep_for = frame_duration - elapsed_time
-        if sleep_for > 0:
-            await asyncio.sleep(sleep_for)
-
-async def main():
-    """메인 함수: 웹소켓 서버와 프레임 방송을 함께 실행합니다."""
-    # 0.0.0.0: 모든 IP에서의 접속을 허용, 5001: 포트 번호
-    server = await websockets.serve(video_stream_handler, "0.0.0.0", 9091)
-    print("웹소켓 서버가 포트 9091에서 시작되었습니다.")
+async def serve_camera(camera, controller, host="0.0.0.0", port=9091, prefilter=None, clients=None, on_ready=None):
+    """
+    카메라 하나를 host:port에서 서비스합니다 (웹소켓 서버 + 프레임 방송 + 통계 + 혼잡 제어).
+    clients에 별도의 딕셔너리를 넘기면 같은 프로세스의 다른 카메라와 접속자가 섞이지 않습니다 (가상 카메라 여러 대로 부하 테스트할 때).
+    on_ready는 포트가 열린 뒤 호출됩니다 (벤치마크가 서버 준비를 기다리는 용도).
+    camera.read()는 다음 프레임까지 블로킹되므로 카메라마다 전용 읽기 스레드를 둡니다.
+    (공유 기본 실행기는 스레드가 cpu+4개뿐이라, 한 루프에서 카메라 수십 대를 돌리면 나머지 카메라의 읽기가 밀립니다.)
+    """
+    clients = connected_clients if clients is None else clients
+    reader = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"camera-reader-{port}")
+    server = await websockets.serve(functools.partial(video_stream_handler, clients=clients), host, port)
+    print(f"웹소켓 서버가 포트 {port}에서 시작되었습니다.")
+    if on_ready is not None:
+        on_ready()
+    encode_times = [] # 혼잡 제어 구간 동안의 프레임 인코딩 시간 (ms)
 
     # 프레임 방송 작업 실행
     # broadcast_frames 함수를 별도의 비동기 작업으로 생성
-    broadcast_task = asyncio.create_task(broadcast_frames())
+    tasks = [
+        asyncio.create_task(broadcast_frames(camera, controller, encode_times, prefilter, clients, reader)),
+        asyncio.create_task(report_client_stats(clients)),
+        asyncio.create_task(control_stream(camera, controller, encode_times, clients)),
+    ]
+    try:
+        # 서버 작업과 방송 작업을 '함께' 실행
+        await asyncio.gather(server.wait_closed(), *tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        server.close()
+        await server.wait_closed()
+        # 진행 중인 camera.read()는 타임아웃 안에 끝나므로 기다리지 않습니다.
+        reader.shutdown(wait=False)
+
+async def main():
+    """메인 함수: 웹소켓 서버와 프레임 방송을 함께 실행합니다."""
+    # 1. 카메라 백엔드 생성 및 혼잡 제어기의 최고 단계(640x480, 10 FPS, 품질 90)로 설정
+    # (하드웨어 JPEG 인코더 우선, 없으면 소프트웨어 인코딩, picamera2가 없는 PC에서는 가짜 카메라)
+    controller = CongestionController(RESOLUTIONS, FPS_RANGE, QUALITY_RANGE, latency_budget_ms=LATENCY_BUDGET_MS)
+    op = controller.current
+    camera = open_camera(size=(op.width, op.height), fps=op.fps, quality=op.quality)
+    print(f"카메라가 {op.fps} FPS로 설정되었습니다. (백엔드: {camera.name})")
+    # 저해상도 후보 검출기 (PREFILTER_MODEL=off 이면 사용하지 않음)
+    prefilter = start_prefilter(camera)
 
-    # 서버 작업과 방송 작업을 '함께' 실행
-    await asyncio.gather(server.wait_closed(), broadcast_task)
+    # 0.0.0.0: 모든 IP에서의 접속을 허용, 9091: 포트 번호
+    await serve_camera(camera, controller, "0.0.0.0", 9091, prefilter)
 
 if __name__ == "__main__":
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
-        print("서버를 종료합니다.")
\ No newline at end of file
+        print("서버를 종료합니다.")
@@ -13,12 +13,9 @@ import config
 import eventlet
 eventlet.monkey_patch()
 
-from flask import Flask, render_template, session
+from flask import Flask, render_template, session, jsonify
 from flask_socketio import SocketIO
 
-# --- 페이지 display
-import datetime
-
 # --- 페이지 display
 from web.control.routes import control_bp
 from web.disconnection_check.routes import disconnection_check_bp
@@ -28,14 +25,28 @@ import logging
 import atexit
 
 # --- 추가된 라이브러리 ---
-from web.threads.image_client import ImageClientThread
+from web.threads.image_client import ImageClientThread, model_info as live_model_info
 from web.threads.rosbridge_client import RosBridgeClientThread
+from web.threads.image_retention import ImageRetentionThread
+from web.threads.map_history import MapHistoryThread
+from web.threads.rescoring import RescoringThread
+from web.threads.warning_sync import WarningSyncThread
+from web.storage.image_store import ImageStore
+from web.storage.map_store import MapStore
+from web.storage.map_tiles import MapTiles, StoredMapTiles
+from web.storage.warning_heatmap import LocalWarningHeatmap, WarningHeatmap
+from web.storage.warning_repository import MongoWarningRepository
+from web.storage.local_warning_store import LocalWarningStore
+from web.storage.thumbnails import ThumbnailCache
 
 
 # --- 이미지 저장 경로 설정 ---
 IMAGE_STORAGE_ROOT = os.path.join(os.path.dirname(__file__), 'static', 'imgs', 'line_crash')
 os.makedirs(IMAGE_STORAGE_ROOT, exist_ok=True)
 logging.info(f"[File] 이미지 저장 경로 확인: {IMAGE_STORAGE_ROOT}")
+# 경고 이미지 저장소 (내용 해시 기반 분산 저장, 중복 제거, 사용량 집계)
+image_store = ImageStore(IMAGE_STORAGE_ROOT, 'imgs/line_crash')
+logging.info(f"[File] 이미지 저장소 사용량: {image_store.used_bytes / 1024 ** 2:.1f} MB ({image_store.file_count}개 파일)")
 
 
 # --- Flask 및 SocketIO 앱 초기화 ---
@@ -50,17 +61,31 @@ app.config['SECRET_KEY'] = 'secret!'
 socketio = SocketIO(app, cors_allowed_origins="*", async_mode='eventlet')
 
 # --- MongoDB 설정 ---
-warnings_collection = None
+# 경고 저장소: 'mongo' (MongoDB만 사용), 'local' (내장 SQLite 저장소를 기본으로 쓰고 MongoDB로 백그라운드 동기화),
+#             'auto' (기본값: MongoDB에 연결되면 MongoDB, 연결할 수 없으면 내장 저장소 + 연결되면 동기화)
+WARNING_STORE = getattr(config, 'WARNING_STORE', 'auto')
+MONGO_CONFIGURED = DB_connect
+mongo_warnings = None
 maps_collection = None
+map_store = None
+warning_heatmap = None
 if DB_connect:
     try:
         # config.py에 정의된 MONGODB_CLIENT를 사용
         mongo_client = config.MONGODB_CLIENT
         db = mongo_client.happy_circuit_db # 데이터베이스 선택
-        warnings_collection = db.warnings # 컬렉션 선택
+        mongo_warnings = MongoWarningRepository(db.warnings) # 컬렉션 선택
         maps_collection = db.maps # 지도 저장을 위한 컬렉션
-        # 위치 기반 중복 저장을 방지하기 위해 2dsphere 인덱스 생성
-        warnings_collection.create_index([("location", "2dsphere")])
+        # 위치 기반 중복 저장 방지용 2dsphere 인덱스와 경고 목록 페이지네이션용 (timestamp, _id) 복합 인덱스 생성
+        mongo_warnings.ensure_indexes()
+        # 탐사별 지도 이력 (압축 키프레임 + delta, 큰 지도는 GridFS)
+        map_store = MapStore(maps_collection)
+        map_store.ensure_indexes()
+        # 경고 위치 히트맵 집계 (경고 저장 시마다 해당 칸만 갱신)
+        warning_heatmap = WarningHeatmap(db.warning_heatmap)
+        warning_heatmap.ensure_indexes()
+        if db.warning_heatmap.estimated_document_count() == 0 and mongo_warnings.count() > 0:
+            warning_heatmap.rebuild(mongo_warnings)
         logging.info("[DB] MongoDB에 성공적으로 연결 및 'warnings', 'maps' 컬렉션과 인덱스 준비 완료.")
     except AttributeError:
         logging.error("[DB] 'config.py'에 'MONGODB_CLIENT'가 정의되지 않았습니다. DB 관련 기능이 비활성화됩니다.")
@@ -68,11 +93,47 @@ if DB_connect:
     except Exception as e:
         logging.error(f"[DB] MongoDB 연결 또는 설정 실패: {e}")
         DB_connect = False
+    if not DB_connect:
+        mongo_warnings = None
+
+
+def connect_mongo_warnings():
+    """동기화 스레드용: MongoDB warnings 컬렉션과 히트맵 집계를 준비합니다 (연결할 수 없으면 예외)."""
+    mongo_db = config.MONGODB_CLIENT.happy_circuit_db
+    mongo_db.command('ping')
+    MongoWarningRepository(mongo_db.warnings).ensure_indexes()
+    heatmap = WarningHeatmap(mongo_db.warning_heatmap)
+    heatmap.ensure_indexes()
+    return mongo_db.warnings, heatmap
+
+
+# --- 경고 저장소 선택 ---
+warning_repository = mongo_warnings
+local_warning_store = None
+if WARNING_STORE == 'local' or (WARNING_STORE == 'auto' and mongo_warnings is None):
+    # 내장 저장소 (단독 배포 또는 MongoDB 장애 시에도 경고를 저장하고 목록/히트맵을 제공)
+    # MongoDB가 설정되어 있으면 로컬에서 삭제한 경고도 동기화 스레드가 MongoDB에서 지우도록 기록합니다.
+    local_warning_store = LocalWarningStore(track_deletions=MONGO_CONFIGURED and hasattr(config, 'MONGODB_CLIENT'))
+    warning_repository = local_warning_store
+    warning_heatmap = LocalWarningHeatmap(local_warning_store)
+    logging.info(f"[DB] 내장 경고 저장소를 사용합니다: {local_warning_store.path} "
+                 f"(경고 {local_warning_store.count()}건, MongoDB 미동기화 {local_warning_store.pending_count()}건)")
+elif warning_repository is None:
+    logging.warning("[DB] 사용할 수 있는 경고 저장소가 없어 경고를 저장하지 않습니다.")
 
 # 블루프린트 등 다른 모듈에서 안전하게 접근할 수 있도록 app.config에 저장
 app.config['DB_CONNECTED'] = DB_connect
-app.config['WARNINGS_COLLECTION'] = warnings_collection
+app.config['WARNING_REPOSITORY'] = warning_repository
 app.config['MAPS_COLLECTION'] = maps_collection
+app.config['MAP_STORE'] = map_store
+app.config['WARNING_HEATMAP'] = warning_heatmap
+# 지도 타일 캐시: 실시간 지도(ROS 스레드가 갱신)와 저장된 지도 버전
+live_map_tiles = MapTiles()
+app.config['LIVE_MAP_TILES'] = live_map_tiles
+app.config['STORED_MAP_TILES'] = StoredMapTiles(map_store) if map_store is not None else None
+# 경고 이미지 썸네일 LRU 캐시 (static 폴더 기준 경로로 조회, 경고 이미지 저장소 안의 파일만)
+app.config['THUMBNAIL_CACHE'] = ThumbnailCache(image_store.absolute_path)
+app.config['IMAGE_STORE'] = image_store
 
 
 
@@ -92,6 +153,23 @@ def index():
     # index.html을 렌더링합니다.
     return render_template('index.html')
 
+@app.route('/api/latency')
+def latency_report():
+    """프레임 구간별(capture -> encode -> send -> receive -> decode -> infer -> emit -> display) 지연 시간 히스토그램."""
+    if 'image_thread' not in globals():
+        return jsonify({"error": "이미지 스레드가 실행 중이 아닙니다."}), 503
+    return jsonify(image_thread.latency_report())
+
+@app.route('/api/storage')
+def storage_report():
+    """경고 이미지 저장소 사용량, 썸네일 캐시 상태, 경고 저장소 종류(MongoDB/내장)와 미동기화 경고 수."""
+    warnings_report = None
+    if warning_repository is not None:
+        warnings_report = {"store": warning_repository.kind, "count": warning_repository.count(),
+                           "pending_sync": local_warning_store.pending_count() if local_warning_store else 0}
+    return jsonify({"images": image_store.usage(), "thumbnail_cache": app.config['THUMBNAIL_CACHE'].stats(),
+                    "warnings": warnings_report})
+
 # 웹 클라이언트가 처음 연결되었을 때 호출됩니다.
 @socketio.on('connect')
 def handle_web_client_connect():
@@ -114,6 +192,12 @@ def handle_web_client_disconnect():
             if ros_thread and ros_thread.robot_controller:
                 ros_thread.deactivate_controller()
 
+# 브라우저가 new_image를 화면에 표시했을 때 호출됩니다 (지연 시간 추적의 display 단계).
+@socketio.on('frame_displayed')
+def handle_frame_displayed(data):
+    if 'image_thread' in globals() and isinstance(data, dict) and 'frame_id' in data:
+        image_thread.tracer.mark(data['frame_id'], 'display')
+
 # 제어 페이지에 사용자가 접속했을 때 호출됩니다.
 @socketio.on('entered_control_page')
 def handle_entered_control_page():
@@ -163,6 +247,8 @@ def handle_start_exploration():
     if ros_thread and ros_thread.is_connected():
         ros_thread.start_exploration()
         logging.info("[Web Server] ROS를 통해 탐사 시작 명령을 전송했습니다.")
+        if 'map_history_thread' in globals():
+            map_history_thread.start_run()
     else:
         logging.warning("[Web Server] ROS가 연결되지 않아 탐사 시작 명령을 보낼 수 없습니다.")
 
@@ -170,23 +256,16 @@ def handle_start_exploration():
 def handle_exploration_finished():
     """탐사가 종료되었을 때 호출됩니다."""
     logging.info("[Web Server] 탐사 종료 알림 수신. 최종 지도를 DB에 저장합니다.")
-    if ros_thread and maps_collection is not None:
-        final_map = ros_thread.get_latest_map()
-        if final_map:
-            try:
-                map_document = {
-                    "timestamp": datetime.datetime.utcnow(),
-                    "map_data": final_map
-                }
-                maps_collection.insert_one(map_document)
-                logging.info("[DB] 최종 지도를 MongoDB에 성공적으로 저장했습니다.")
-            except Exception as e:
-                logging.error(f"[DB] 최종 지도 저장 실패: {e}")
+    if ros_thread and 'map_history_thread' in globals():
+        if ros_thread.get_latest_map():
+            run_id, version = map_history_thread.finish_run()
+            if version is not None:
+                logging.info(f"[DB] 최종 지도를 탐사 {run_id}의 v{version}으로 저장했습니다.")
         else:
             logging.warning("[Web Server] 저장할 지도가 없습니다.")
     elif not ros_thread:
         logging.error("[Web Server] ROS 스레드가 실행 중이 아니라서 지도를 저장할 수 없습니다.")
-    elif maps_collection is None:
+    elif map_store is None:
         logging.error("[DB] MongoDB 'maps' 컬렉션이 준비되지 않아 지도를 저장할 수 없습니다.")
 
 # --- 프로그램 종료 시 실행될 정리(cleanup) 함수 ---
@@ -204,17 +283,67 @@ def cleanup():
         image_thread.stop()
         image_thread.join() # 스레드가 완전히 끝날 때까지 대기
 
+    # 3. 지도 이력 기록 스레드 종료
+    if 'map_history_thread' in globals() and map_history_thread.is_alive():
+        logging.info("지도 이력 기록 스레드 종료 중...")
+        map_history_thread.stop()
+        map_history_thread.join()
+
+    # 4. 이미지 정리 스레드 종료
+    if 'retention_thread' in globals() and retention_thread.is_alive():
+        logging.info("이미지 정리 스레드 종료 중...")
+        retention_thread.stop()
+        retention_thread.join()
+
+    # 5. 재채점 스레드 종료 (내장 저장소를 닫기 전에)
+    if 'rescoring_thread' in globals() and rescoring_thread.is_alive():
+        logging.info("재채점 스레드 종료 중...")
+        rescoring_thread.stop()
+        rescoring_thread.join()
+
+    # 6. 경고 동기화 스레드 종료 및 내장 저장소 닫기
+    if globals().get('sync_thread') is not None and sync_thread.is_alive():
+        logging.info("경고 동기화 스레드 종료 중...")
+        sync_thread.stop()
+        sync_thread.join()
+    if local_warning_store is not None:
+        local_warning_store.close()
+
     logging.info("모든 스레드가 성공적으로 종료되었습니다. 프로그램을 완전히 종료합니다.")
 
 if __name__ == '__main__':
     # 1. RosBridge 클라이언트 스레드 인스턴스 생성 및 시작
-    ros_thread = RosBridgeClientThread(socketio, robot_status)
+    ros_thread = RosBridgeClientThread(socketio, robot_status, live_map_tiles)
     ros_thread.start()
 
+    # 1-1. 탐사 중 지도 이력 기록 스레드 (maps 컬렉션이 준비된 경우에만)
+    if map_store is not None:
+        map_history_thread = MapHistoryThread(ros_thread, map_store)
+        map_history_thread.start()
+
     # 2. Image 클라이언트 스레드 인스턴스 생성 및 시작
-    image_thread = ImageClientThread(socketio, robot_status, warnings_collection, IMAGE_STORAGE_ROOT)
+    image_thread = ImageClientThread(socketio, robot_status, warning_repository, image_store, warning_heatmap)
     image_thread.start()
 
+    # 2-1. 내장 저장소에 쌓인 경고를 MongoDB로 옮기는 스레드 (MongoDB가 설정된 경우에만)
+    sync_thread = None
+    if local_warning_store is not None and local_warning_store.track_deletions:
+        sync_thread = WarningSyncThread(local_warning_store, connect_mongo_warnings)
+        sync_thread.start()
+
+    # 2-2. 경고 이미지 보존 기간/용량 정리 스레드 (경고 문서와 함께 삭제하므로 경고 저장소가 있는 경우에만)
+    #      내장 저장소를 MongoDB와 동기화 중이면 MongoDB를 기준으로 파일을 정리합니다.
+    if warning_repository is not None:
+        retention_thread = ImageRetentionThread(image_store, warning_repository, app.config['THUMBNAIL_CACHE'],
+                                                warning_heatmap, mirror=sync_thread)
+        retention_thread.start()
+
+    # 2-3. 모델이 바뀐 경고를 지금 모델로 다시 채점하는 스레드 (실시간 추론이 쉬는 동안에만 돕니다)
+    if warning_repository is not None and live_model_info is not None and getattr(config, 'RESCORING_ENABLED', True):
+        rescoring_thread = RescoringThread(warning_repository, image_thread, app.static_folder, warning_heatmap,
+                                           robot_status)
+        rescoring_thread.start()
+
     # 3. 프로그램 종료 시 cleanup 함수가 실행되도록 등록
     atexit.register(cleanup)
 
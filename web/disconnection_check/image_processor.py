@@ -4,9 +4,12 @@ import numpy as np
 import os
 import base64
 
+import config
+
 # Path to your NCNN YOLO model
-# Ensure this path is correct for your local server setup
-MODEL_PATH = "/Users/go-eunchan/HappyCircuit/openCV/best_updated.pt"
+# config.py의 DISCONNECTION_MODEL_PATH로 지정합니다 (없으면 기존 로컬 경로).
+# 저장된 이미지를 여러 장 다시 분석할 때는 reanalysis.py(배치 추론, 결과 캐시)를 사용하세요.
+MODEL_PATH = getattr(config, 'DISCONNECTION_MODEL_PATH', "/Users/go-eunchan/HappyCircuit/openCV/best_updated.pt")
 
 # Load the YOLO model
 try:
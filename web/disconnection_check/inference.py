@@ -0,0 +1,78 @@
+"""
+경고 감지 추론에 공통으로 쓰는 도구: 추론 설정, 모델 버전(가중치 해시 + 설정), 모델 로드, 감지 결과 형식.
+실시간 분석(ImageClientThread)과 일괄 재분석(reanalysis.py)이 같은 형식으로 감지를 기록하도록 여기서 정의합니다.
+"""
+import hashlib
+import json
+import os
+
+import config
+
+HASH_CHUNK = 1024 * 1024
+# (경로, 수정 시각, 크기) -> 가중치 sha256. 같은 파일을 매번 다시 읽지 않습니다.
+_weights_digests = {}
+
+
+def inference_settings():
+    """결과에 영향을 주는 추론 설정 (모델 버전에 포함)."""
+    return {
+        "imgsz": config.YOLO_IMG_SIZE,
+        "conf": config.YOLO_CONF_THRES,
+        "damage_keywords": sorted(str(k).lower() for k in config.YOLO_DAMAGE_KEYWORDS),
+    }
+
+
+def weights_digest(model_path):
+    """가중치 파일 내용의 sha256. 파일 이름이 같아도 내용이 바뀌면 다른 값이 됩니다."""
+    stat = os.stat(model_path)
+    key = (os.path.abspath(model_path), stat.st_mtime_ns, stat.st_size)
+    if key not in _weights_digests:
+        digest = hashlib.sha256()
+        with open(model_path, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+                digest.update(chunk)
+        _weights_digests[key] = digest.hexdigest()
+    return _weights_digests[key]
+
+
+def model_version(model_path, settings):
+    """'<가중치 해시 12자리>-<설정 해시 8자리>'. 가중치나 추론 설정이 바뀌면 값이 바뀝니다."""
+    settings_digest = hashlib.sha1(json.dumps(settings, sort_keys=True).encode("utf-8")).hexdigest()
+    return f"{weights_digest(model_path)[:12]}-{settings_digest[:8]}"
+
+
+def model_stamp(model_path, settings):
+    """경고 문서에 남기는 모델 정보: 버전, 가중치 파일 이름, 추론 설정."""
+    return {"version": model_version(model_path, settings), "weights": os.path.basename(model_path),
+            "settings": settings}
+
+
+def load_model(model_path, damage_keywords):
+    """YOLO 모델을 읽고 (모델, 클래스 이름 dict, '손상' 관련 클래스 인덱스 집합)을 반환합니다."""
+    from ultralytics import YOLO
+    model = YOLO(model_path)
+    names = model.names if hasattr(model, "names") else {}
+    names = dict(names.items() if isinstance(names, dict) else enumerate(names))
+    damage_class_idxs = {int(idx) for idx, name in names.items()
+                         if any(k in str(name).lower() for k in damage_keywords)}
+    return model, names, damage_class_idxs
+
+
+def extract_detections(result, names, damage_class_idxs, version=None):
+    """
+    YOLO 결과 한 장에서 '손상' 클래스 감지만 경고 문서의 detections 형식으로 꺼냅니다.
+    version을 주면 감지마다 model_version으로 남깁니다.
+    """
+    detections = []
+    for box in result.boxes:
+        if int(box.cls) in damage_class_idxs:
+            detection = {
+                'class_id': int(box.cls),
+                'class_name': names.get(int(box.cls), 'Unknown'),
+                'confidence': float(box.conf),
+                'box_coords': box.xyxyn.cpu().numpy().tolist()  # 정규화된 좌표
+            }
+            if version is not None:
+                detection['model_version'] = version
+            detections.append(detection)
+    return detections
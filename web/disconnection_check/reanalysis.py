@@ -0,0 +1,324 @@
+"""
+저장된 이미지 일괄 재분석 (모델을 바꾼 뒤 몇 달치 경고 이미지를 다시 점수 매길 때).
+
+이미지를 배치로 묶어 프로세스 풀에서 추론하고, 결과를 (이미지 내용 해시, 모델 버전)으로 캐시합니다.
+- 같은 모델로 이미 분석한 이미지는 다시 추론하지 않습니다 (같은 내용의 이미지가 여러 번 나와도 한 번만 추론).
+- 결과를 배치마다 캐시에 커밋하므로, 중간에 멈춘 작업을 같은 명령으로 다시 실행하면 남은 이미지만 이어서 분석합니다.
+- 진행률, 캐시 적중 수, 초당 처리량, 남은 시간을 주기적으로 기록합니다.
+프로젝트 루트에서 다음과 같이 실행합니다:
+
+    python -m web.disconnection_check.reanalysis --dir web/static/imgs/line_crash --out rescored.ndjson
+    python -m web.disconnection_check.reanalysis --warnings --since 2025-06-01 --model new_best.pt --workers 4
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import config
+from web.disconnection_check.inference import (
+    HASH_CHUNK, extract_detections, inference_settings, load_model, model_version)
+from web.disconnection_check.warning_queries import parse_filters
+from web.storage.analysis_cache import AnalysisCache
+
+# 일괄 재분석 설정 (config.py에서 덮어쓸 수 있음)
+REANALYSIS_WORKERS = getattr(config, 'REANALYSIS_WORKERS', max(1, (os.cpu_count() or 2) - 1))
+REANALYSIS_BATCH = getattr(config, 'REANALYSIS_BATCH', 16)    # 한 번의 모델 호출에 넣는 이미지 수
+PROGRESS_INTERVAL = 10.0   # 진행률 로그 간격 (초)
+LOOKUP_BATCH = 256         # 캐시를 한 번에 조회하는 이미지 수
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+# ImageStore는 sha256(내용)을 파일 이름으로 쓰므로 이런 파일은 다시 읽지 않고 이름을 해시로 씁니다.
+CONTENT_ADDRESSED_NAME = re.compile(r'^[0-9a-f]{64}$')
+
+
+def content_hash(path):
+    """이미지 파일 내용의 sha256."""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    if CONTENT_ADDRESSED_NAME.match(stem):
+        return stem
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def iter_directory(root):
+    """폴더 아래의 이미지 (ref, 경로)를 이름 순으로 나열합니다 (썸네일 제외)."""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if name.lower().endswith(IMAGE_EXTENSIONS) and '.thumb.' not in name:
+                path = os.path.join(dirpath, name)
+                yield path, path
+
+
+def analysis_image_path(doc):
+    """
+    경고를 다시 분석할 이미지 (static 기준). 박스를 그리지 않은 원본 프레임(raw_image_path)이 있으면 그것을 쓰고,
+    원본 프레임을 저장하기 전의 경고는 박스가 그려진 image_path를 씁니다.
+    """
+    return doc.get("raw_image_path") or doc.get("image_path")
+
+
+def iter_warning_images(warning_repository, filters, static_root):
+    """조건에 맞는 경고의 (경고 _id, 분석할 이미지 절대 경로)를 최신순으로 나열합니다."""
+    for doc in warning_repository.iter_warnings(filters):
+        image_path = analysis_image_path(doc)
+        if image_path:
+            yield str(doc["_id"]), os.path.join(static_root, image_path)
+
+
+# --- 작업 프로세스 ---
+# 프로세스마다 모델을 한 번만 읽어 둡니다.
+_worker = {}
+
+
+def _init_worker(model_path, settings, version, torch_threads, nice):
+    import torch
+    if nice:
+        # 실시간 추론과 겹치지 않도록 낮은 우선순위로 실행합니다 (재채점 스레드).
+        os.nice(nice)
+    # 프로세스 여러 개가 각자 모든 코어를 쓰지 않도록 나눠 줍니다.
+    torch.set_num_threads(torch_threads)
+    model, names, damage_class_idxs = load_model(model_path, settings["damage_keywords"])
+    _worker.update(model=model, names=names, damage_class_idxs=damage_class_idxs, settings=settings, version=version)
+
+
+def _analyze_batch(batch):
+    """[(content_hash, 경로)] -> [(content_hash, detections 또는 None, 오류 메시지 또는 None)]"""
+    import cv2
+    results, images, loaded = [], [], []
+    for image_hash, path in batch:
+        image = cv2.imread(path)
+        if image is None:
+            results.append((image_hash, None, f"이미지를 읽을 수 없습니다: {path}"))
+        else:
+            images.append(image)
+            loaded.append(image_hash)
+    if images:
+        settings = _worker["settings"]
+        predictions = _worker["model"](images, imgsz=settings["imgsz"], conf=settings["conf"], verbose=False)
+        for image_hash, prediction in zip(loaded, predictions):
+            detections = extract_detections(prediction, _worker["names"], _worker["damage_class_idxs"],
+                                            _worker["version"])
+            results.append((image_hash, detections, None))
+    return results
+
+
+class _Progress:
+    """진행률과 처리량을 PROGRESS_INTERVAL마다 기록합니다."""
+    def __init__(self, total=None):
+        self.total = total
+        self.started = time.time()
+        self.last_log = self.started
+        self.done = 0
+        self.cached = 0
+        self.inferred = 0
+        self.errors = 0
+
+    def maybe_log(self, force=False):
+        now = time.time()
+        if not force and now - self.last_log < PROGRESS_INTERVAL:
+            return
+        self.last_log = now
+        elapsed = max(now - self.started, 1e-6)
+        rate = self.inferred / elapsed
+        text = f"{self.done}" + (f"/{self.total} ({self.done / self.total * 100:.1f}%)" if self.total else "")
+        if self.total and rate > 0 and self.done < self.total:
+            text += f", 남은 시간 약 {(self.total - self.done) / max(self.done / elapsed, 1e-6) / 60:.1f}분"
+        logging.info(f"[Reanalysis] {text} | 추론 {self.inferred} ({rate:.1f}장/s), 캐시 {self.cached}, "
+                     f"오류 {self.errors}, 경과 {elapsed:.0f}s")
+
+    def summary(self):
+        return {"done": self.done, "inferred": self.inferred, "cached": self.cached, "errors": self.errors,
+                "seconds": round(time.time() - self.started, 1)}
+
+
+class BatchReanalyzer:
+    """
+    (ref, 이미지 경로) 목록을 배치로 추론합니다. ref는 결과를 돌려줄 때 쓰는 식별자(경고 _id, 파일 경로 등)입니다.
+    모델은 캐시에 없는 이미지가 처음 나왔을 때 작업 프로세스에서 읽으므로, 모두 캐시에 있으면 모델을 읽지 않습니다.
+    작업 프로세스는 run()을 여러 번 불러도 유지되며, 다 쓰면 close()로 정리합니다.
+    torch_threads(작업 프로세스당 torch 스레드 수)와 nice(우선순위)로 다른 추론과 CPU를 나눠 쓸 수 있습니다.
+    """
+    def __init__(self, model_path=None, cache=None, workers=REANALYSIS_WORKERS, batch_size=REANALYSIS_BATCH,
+                 settings=None, torch_threads=None, nice=0, verbose=True):
+        self.model_path = model_path or config.YOLO_MODEL_PATH
+        self.settings = settings or inference_settings()
+        self.model_version = model_version(self.model_path, self.settings)
+        self.cache = cache or AnalysisCache()
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self.torch_threads = torch_threads or max(1, (os.cpu_count() or 1) // self.workers)
+        self.nice = nice
+        self.verbose = verbose
+        self._pool = None
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(self.workers, initializer=_init_worker,
+                                             initargs=(self.model_path, self.settings, self.model_version,
+                                                       self.torch_threads, self.nice))
+        return self._pool
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    def run(self, items, on_result=None, total=None, on_error=None):
+        """
+        items의 이미지를 모두 분석합니다. 이미지마다 on_result(ref, content_hash, detections, cached)를,
+        이미지를 읽을 수 없으면 on_error(ref, 오류 메시지)를 호출합니다.
+        반환값: 처리 통계 (done, inferred, cached, errors, seconds)
+        """
+        progress = _Progress(total)
+        if self.verbose:
+            logging.info(f"[Reanalysis] 모델 {self.model_path} (버전 {self.model_version}), "
+                         f"작업 프로세스 {self.workers}개, 배치 {self.batch_size}장")
+        # 추론을 기다리는 이미지: content_hash -> [ref, ...] (같은 내용의 이미지는 한 번만 추론)
+        waiting = {}
+        queue = []
+        in_flight = set()
+
+        def finish(done_futures):
+            for future in done_futures:
+                in_flight.discard(future)
+                results = future.result()
+                self.cache.put_many([(h, d) for h, d, error in results if error is None], self.model_version)
+                for image_hash, detections, error in results:
+                    refs = waiting.pop(image_hash, [])
+                    progress.done += len(refs)
+                    if error is not None:
+                        progress.errors += len(refs)
+                        logging.warning(f"[Reanalysis] {error}")
+                        if on_error is not None:
+                            for ref in refs:
+                                on_error(ref, error)
+                        continue
+                    progress.inferred += 1
+                    progress.cached += len(refs) - 1
+                    if on_result is not None:
+                        for ref in refs:
+                            on_result(ref, image_hash, detections, False)
+
+        def submit(batch):
+            # 메모리가 일정하도록 작업 프로세스당 2배치까지만 미리 보냅니다.
+            while len(in_flight) >= self.workers * 2:
+                finish(wait(in_flight, return_when=FIRST_COMPLETED).done)
+            in_flight.add(self._get_pool().submit(_analyze_batch, batch))
+
+        try:
+            for chunk in _chunked(items, LOOKUP_BATCH):
+                hashed = []
+                for ref, path in chunk:
+                    try:
+                        hashed.append((ref, path, content_hash(path)))
+                    except OSError as e:
+                        progress.done += 1
+                        progress.errors += 1
+                        logging.warning(f"[Reanalysis] 이미지를 읽을 수 없습니다: {path} ({e})")
+                        if on_error is not None:
+                            on_error(ref, str(e))
+                cached = self.cache.get_many([h for _, _, h in hashed], self.model_version)
+                for ref, path, image_hash in hashed:
+                    if image_hash in cached:
+                        progress.done += 1
+                        progress.cached += 1
+                        if on_result is not None:
+                            on_result(ref, image_hash, cached[image_hash], True)
+                    elif image_hash in waiting:
+                        waiting[image_hash].append(ref)
+                    else:
+                        waiting[image_hash] = [ref]
+                        queue.append((image_hash, path))
+                while len(queue) >= self.batch_size:
+                    submit(queue[:self.batch_size])
+                    del queue[:self.batch_size]
+                if self.verbose:
+                    progress.maybe_log()
+            if queue:
+                submit(queue)
+            while in_flight:
+                finish(wait(in_flight, return_when=FIRST_COMPLETED).done)
+                if self.verbose:
+                    progress.maybe_log()
+        except BaseException:
+            # 작업 프로세스가 죽었거나 중단된 경우 풀을 버립니다 (다음 run()에서 새로 만듦).
+            self.close()
+            raise
+        if self.verbose:
+            progress.maybe_log(force=True)
+        return progress.summary()
+
+
+def _chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m web.disconnection_check.reanalysis",
+                                     description="저장된 이미지를 새 모델로 일괄 재분석합니다 (캐시/이어서 실행 지원).")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--dir", help="이 폴더 아래의 이미지를 모두 분석")
+    source.add_argument("--warnings", action="store_true", help="경고 저장소의 경고 이미지를 분석 (아래 조건으로 거름)")
+    parser.add_argument("--store", choices=("mongo", "local"), default="mongo", help="--warnings에서 읽을 경고 저장소")
+    parser.add_argument("--since", help="이 시각 이후 (UTC, ISO 8601)")
+    parser.add_argument("--until", help="이 시각 이전 (UTC, ISO 8601)")
+    parser.add_argument("--bbox", help="minx,miny,maxx,maxy (odom 좌표)")
+    parser.add_argument("--class", dest="class_", help="클래스 이름, 쉼표로 구분")
+    parser.add_argument("--min-confidence", help="최소 신뢰도")
+    parser.add_argument("--model", help="가중치 파일 (기본값: config.YOLO_MODEL_PATH)")
+    parser.add_argument("--workers", type=int, default=REANALYSIS_WORKERS)
+    parser.add_argument("--batch-size", type=int, default=REANALYSIS_BATCH)
+    parser.add_argument("--out", help="결과를 NDJSON으로 저장할 파일")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+
+    if args.dir:
+        paths = list(iter_directory(args.dir))
+        items, total = paths, len(paths)
+    else:
+        filters = parse_filters({"since": args.since, "until": args.until, "bbox": args.bbox,
+                                 "class": args.class_, "min_confidence": args.min_confidence})
+        if args.store == "local":
+            from web.storage.local_warning_store import LocalWarningStore
+            warning_repository = LocalWarningStore()
+        else:
+            from web.storage.warning_repository import MongoWarningRepository
+            warning_repository = MongoWarningRepository(config.MONGODB_CLIENT.happy_circuit_db.warnings)
+        static_root = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static')
+        items, total = iter_warning_images(warning_repository, filters, static_root), None
+
+    reanalyzer = BatchReanalyzer(args.model, workers=args.workers, batch_size=args.batch_size)
+    out = open(args.out, "w", encoding="utf-8") if args.out else None
+
+    def write_result(ref, image_hash, detections, cached):
+        out.write(json.dumps({"ref": ref, "content_hash": image_hash, "model_version": reanalyzer.model_version,
+                              "cached": cached, "damage_detected": bool(detections), "detections": detections},
+                             ensure_ascii=False) + "\n")
+
+    try:
+        summary = reanalyzer.run(items, write_result if out else None, total)
+    finally:
+        reanalyzer.close()
+        if out:
+            out.close()
+    print(json.dumps(dict(summary, model_version=reanalyzer.model_version), ensure_ascii=False), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,28 +1,150 @@
-from flask import Blueprint, render_template, current_app
-import pymongo
+from flask import Blueprint, render_template, current_app, request, jsonify, abort, send_file, Response, \
+    stream_with_context
+
+from web.disconnection_check.warning_queries import (
+    DEFAULT_PAGE_SIZE, InvalidQuery, parse_filters, serialize_warning)
+from web.disconnection_check.warning_export import EXPORT_FORMATS, MIMETYPES, export_filename, iter_export
 
 # Blueprint 정의
 disconnection_check_bp = Blueprint('disconnection_check', __name__, template_folder='templates')
 
+
+def _warning_repository():
+    """경고 저장소(MongoDB 또는 내장 저장소)를 반환합니다. 사용할 수 있는 저장소가 없으면 None."""
+    return current_app.config.get('WARNING_REPOSITORY')
+
+
 @disconnection_check_bp.route('/disconnection_check')
 def disconnection_check_page():
     """
-    DB 연결 상태에 따라 저장된 경고를 표시하거나, 
+    DB 연결 상태에 따라 저장된 경고를 표시하거나,
     순찰을 먼저 진행하라는 메시지를 표시하는 페이지를 렌더링합니다.
+    첫 페이지만 서버에서 렌더링하고, 나머지는 스크롤할 때 /api/warnings 에서 이어서 불러옵니다.
     """
     # app.config에서 DB 정보 가져오기
-    db_connected = current_app.config.get('DB_CONNECTED', False)
-    warnings_collection = current_app.config.get('WARNINGS_COLLECTION')
+    warning_repository = _warning_repository()
+    if warning_repository is None:
+        return render_template('disconnection_check.html', db_connected=False, warnings=[], next_cursor=None)
 
-    warnings = []
-    if db_connected and warnings_collection is not None:
-        # DB에서 모든 경고를 시간 내림차순으로 조회합니다.
+    page_size = current_app.config.get('WARNINGS_PAGE_SIZE', DEFAULT_PAGE_SIZE)
+    try:
+        docs, next_cursor = warning_repository.page(limit=page_size)
+    except Exception as e:
+        # 로깅을 위해 print 대신 로거 사용을 권장합니다.
+        print(f"Error fetching warnings from DB: {e}")
+        # 에러 발생 시 db_connected를 False로 간주하여 처리
+        return render_template('disconnection_check.html', db_connected=False, warnings=[], next_cursor=None)
+
+    warnings = [serialize_warning(doc) for doc in docs]
+    return render_template('disconnection_check.html', db_connected=True, warnings=warnings,
+                           next_cursor=next_cursor, page_size=page_size)
+
+
+@disconnection_check_bp.route('/api/warnings')
+def list_warnings():
+    """
+    경고 목록/조회 JSON API (keyset 페이지네이션).
+    ?cursor=<이전 응답의 next_cursor>&limit=<개수> 로 요청하며, 마지막 페이지이면 next_cursor가 null입니다.
+    bbox, since, until, class, min_confidence로 거를 수 있습니다 (parse_filters 참고, 다음 페이지도 같은 조건으로 요청).
+    """
+    warning_repository = _warning_repository()
+    if warning_repository is None:
+        return jsonify({"error": "데이터베이스에 연결되지 않았습니다."}), 503
+
+    limit = request.args.get('limit', current_app.config.get('WARNINGS_PAGE_SIZE', DEFAULT_PAGE_SIZE), type=int)
+    try:
+        filters = parse_filters(request.args)
+        docs, next_cursor = warning_repository.page(request.args.get('cursor'), limit, filters)
+    except InvalidQuery as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"items": [serialize_warning(doc) for doc in docs], "next_cursor": next_cursor})
+
+
+@disconnection_check_bp.route('/api/warnings/heatmap')
+def warnings_heatmap():
+    """
+    미리 집계된 경고 히트맵 (격자 칸별 경고 수와 최대 신뢰도). warnings 컬렉션을 훑지 않습니다.
+    ?bbox=minx,miny,maxx,maxy 로 범위를, ?class=<클래스>로 특정 클래스만 셀 수 있습니다.
+    기간 조건이 필요하면 /api/warnings 의 since/until을 사용하세요.
+    """
+    heatmap = current_app.config.get('WARNING_HEATMAP')
+    if heatmap is None or _warning_repository() is None:
+        return jsonify({"error": "데이터베이스에 연결되지 않았습니다."}), 503
+    bbox = None
+    if request.args.get('bbox'):
         try:
-            warnings = list(warnings_collection.find().sort("timestamp", pymongo.DESCENDING))
-        except Exception as e:
-            # 로깅을 위해 print 대신 로거 사용을 권장합니다.
-            print(f"Error fetching warnings from DB: {e}")
-            # 에러 발생 시 db_connected를 False로 간주하여 처리
-            return render_template('disconnection_check.html', db_connected=False, warnings=[])
-
-    return render_template('disconnection_check.html', db_connected=db_connected, warnings=warnings)
+            bbox = [float(v) for v in request.args['bbox'].split(',')]
+            if len(bbox) != 4:
+                raise ValueError
+        except ValueError:
+            return jsonify({"error": "bbox는 minx,miny,maxx,maxy 형식이어야 합니다."}), 400
+    cells = heatmap.cells(bbox, request.args.get('class'))
+    return jsonify({"cell_size": heatmap.cell_size, "cells": cells,
+                    "max_count": max((c["count"] for c in cells), default=0)})
+
+
+@disconnection_check_bp.route('/api/warnings/export')
+def export_warnings():
+    """
+    경고를 파일로 내려받습니다. ?format=ndjson|csv|zip (zip은 warnings.ndjson과 이미지 포함).
+    /api/warnings와 같은 조건(bbox, since, until, class, min_confidence)으로 거르며, 결과를 메모리에 모으지 않고 스트리밍합니다.
+    """
+    warning_repository = _warning_repository()
+    if warning_repository is None:
+        return jsonify({"error": "데이터베이스에 연결되지 않았습니다."}), 503
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"error": f"format은 {', '.join(EXPORT_FORMATS)} 중 하나여야 합니다."}), 400
+    try:
+        filters = parse_filters(request.args)
+    except InvalidQuery as e:
+        return jsonify({"error": str(e)}), 400
+
+    chunks = iter_export(warning_repository, fmt, filters, current_app.config['THUMBNAIL_CACHE'].resolve)
+    response = Response(stream_with_context(chunks), mimetype=MIMETYPES[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename="{export_filename(fmt)}"'
+    response.cache_control.no_store = True
+    return response
+
+
+# 경고 이미지는 한 번 저장되면 바뀌지 않으므로 브라우저가 1년 동안 다시 묻지 않도록 합니다.
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+def _cache_forever(response):
+    response.cache_control.public = True
+    response.cache_control.max_age = IMMUTABLE_MAX_AGE
+    response.cache_control.immutable = True
+    return response
+
+
+@disconnection_check_bp.route('/warnings/thumbs/<path:image_path>')
+def warning_thumbnail(image_path):
+    """목록용 썸네일. 메모리 LRU 캐시 -> 원본 옆 썸네일 파일 -> 즉석 생성 순으로 찾습니다."""
+    thumbnail = current_app.config['THUMBNAIL_CACHE'].get(image_path)
+    if thumbnail is None:
+        abort(404)
+    response = Response(thumbnail.data, mimetype=thumbnail.mimetype)
+    response.set_etag(thumbnail.etag)
+    # If-None-Match(304)와 Range(206) 요청을 처리합니다.
+    response = response.make_conditional(request, accept_ranges=True, complete_length=len(thumbnail.data))
+    return _cache_forever(response)
+
+
+def _is_jpeg(path):
+    """JPEG 시작 표식(SOI)으로 시작하는 파일이면 True. 없는 파일이면 False."""
+    try:
+        with open(path, 'rb') as f:
+            return f.read(2) == b'\xff\xd8'
+    except OSError:
+        return False
+
+
+@disconnection_check_bp.route('/warnings/images/<path:image_path>')
+def warning_image(image_path):
+    """원본 경고 이미지 (경고 이미지 저장소 안의 파일만). 파일에서 바로 보내며 ETag, Range, 장기 캐시 헤더를 붙입니다."""
+    absolute_path = current_app.config['THUMBNAIL_CACHE'].resolve(image_path)
+    if absolute_path is None or not _is_jpeg(absolute_path):
+        abort(404)
+    response = send_file(absolute_path, conditional=True, etag=True, max_age=IMMUTABLE_MAX_AGE)
+    return _cache_forever(response)
@@ -0,0 +1,198 @@
+"""
+경고 내보내기 (NDJSON / CSV / 이미지를 포함한 ZIP).
+
+DB 커서에서 조금씩 읽어 바로 내보내므로 결과가 수만 건이어도 전체 결과나 압축 파일을 메모리에 올리지 않습니다.
+웹에서는 /api/warnings/export, 명령줄에서는 다음과 같이 사용합니다 (프로젝트 루트에서):
+
+    python -m web.disconnection_check.warning_export --format zip --since 2025-01-01 --class crack --out crack.zip
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import zipfile
+from datetime import datetime
+
+from web.disconnection_check.warning_queries import parse_filters
+
+EXPORT_FORMATS = ('ndjson', 'csv', 'zip')
+MIMETYPES = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv', 'zip': 'application/zip'}
+COPY_CHUNK = 64 * 1024
+CSV_COLUMNS = ['id', 'timestamp', 'x', 'y', 'theta', 'classes', 'max_confidence', 'detection_count', 'image_path']
+
+
+def export_filters(filters, started_at):
+    """내보내기를 시작한 시각 이후에 저장된 경고는 제외해, ZIP의 목록과 이미지가 같은 경고 집합을 가리키게 합니다."""
+    until = min(filters["until"], started_at) if "until" in filters else started_at
+    return dict(filters, until=until)
+
+
+def export_record(doc):
+    """경고 문서를 JSON으로 쓸 수 있는 형태로 바꿉니다."""
+    odom = doc.get("odom") or {}
+    detections = doc.get("detections") or []
+    return {
+        "id": str(doc["_id"]),
+        "timestamp": doc["timestamp"].isoformat() + "Z",
+        "x": odom.get("x"),
+        "y": odom.get("y"),
+        "theta": odom.get("theta"),
+        "classes": sorted({d.get("class_name") for d in detections if d.get("class_name")}),
+        "max_confidence": max((d.get("confidence", 0) for d in detections), default=None),
+        "detections": detections,
+        "image_path": doc.get("image_path"),
+    }
+
+
+def iter_ndjson(docs):
+    for doc in docs:
+        yield (json.dumps(export_record(doc), ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def iter_csv(docs):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        data = buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+        return data
+
+    writer.writerow(CSV_COLUMNS)
+    yield flush()
+    for doc in docs:
+        record = export_record(doc)
+        writer.writerow([record["id"], record["timestamp"], record["x"], record["y"], record["theta"],
+                         ";".join(record["classes"]), record["max_confidence"], len(record["detections"]),
+                         record["image_path"]])
+        yield flush()
+
+
+class _StreamBuffer(io.RawIOBase):
+    """zipfile이 쓰는 바이트를 모아 두었다가 꺼내 가게 하는 쓰기 전용 스트림 (seek 불가 -> ZIP 데이터 디스크립터 사용)."""
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def iter_zip(make_docs, resolve_image):
+    """
+    warnings.ndjson과 참조된 이미지(images/...)를 담은 ZIP을 만들면서 바로 내보냅니다.
+    make_docs()는 같은 조건의 경고 커서를 새로 여는 함수로, 목록과 이미지를 위해 두 번 읽습니다 (결과를 메모리에 모으지 않음).
+    resolve_image(image_path)는 이미지의 절대 경로를 반환합니다 (없으면 None).
+    """
+    stream = _StreamBuffer()
+    with zipfile.ZipFile(stream, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+        with archive.open("warnings.ndjson", mode="w", force_zip64=True) as entry:
+            for line in iter_ndjson(make_docs()):
+                entry.write(line)
+                yield stream.drain()
+        yield stream.drain()
+
+        for doc in make_docs():
+            image_path = doc.get("image_path")
+            arcname = f"images/{image_path}" if image_path else None
+            # 같은 이미지를 여러 경고가 공유할 수 있으므로(내용 해시 저장소) 한 번만 넣습니다.
+            if arcname is None or arcname in archive.NameToInfo:
+                continue
+            absolute_path = resolve_image(image_path)
+            if absolute_path is None or not os.path.isfile(absolute_path):
+                continue
+            # JPEG는 이미 압축되어 있으므로 다시 압축하지 않습니다.
+            info = zipfile.ZipInfo(arcname, date_time=doc["timestamp"].timetuple()[:6])
+            info.compress_type = zipfile.ZIP_STORED
+            with open(absolute_path, "rb") as source, archive.open(info, mode="w") as entry:
+                while True:
+                    chunk = source.read(COPY_CHUNK)
+                    if not chunk:
+                        break
+                    entry.write(chunk)
+                    yield stream.drain()
+            yield stream.drain()
+    # 중앙 디렉터리 (ZipFile을 닫을 때 기록됨)
+    yield stream.drain()
+
+
+def iter_export(warning_repository, fmt, filters, resolve_image, started_at=None):
+    """
+    형식에 맞는 바이트 조각 생성기를 반환합니다.
+    경고는 저장소의 iter_warnings()로 최신순으로 조금씩 읽습니다 (MongoDB 커서 또는 내장 저장소의 keyset 배치).
+    """
+    filters = export_filters(filters, started_at or datetime.utcnow())
+    if fmt == 'ndjson':
+        return iter_ndjson(warning_repository.iter_warnings(filters))
+    if fmt == 'csv':
+        return iter_csv(warning_repository.iter_warnings(filters))
+    if fmt == 'zip':
+        chunks = iter_zip(lambda: warning_repository.iter_warnings(filters), resolve_image)
+        # 압축기가 아직 내보낼 바이트를 만들지 않은 빈 조각은 건너뜁니다.
+        return (chunk for chunk in chunks if chunk)
+    raise ValueError(f"지원하지 않는 형식입니다: {fmt} ({', '.join(EXPORT_FORMATS)})")
+
+
+def export_filename(fmt, now=None):
+    return f"warnings_{(now or datetime.utcnow()).strftime('%Y%m%d_%H%M%S')}.{fmt}"
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m web.disconnection_check.warning_export",
+                                     description="경고를 NDJSON/CSV 또는 이미지를 포함한 ZIP으로 내보냅니다.")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="ndjson")
+    parser.add_argument("--out", help="출력 파일 (생략하면 표준 출력)")
+    parser.add_argument("--since", help="이 시각 이후 (UTC, ISO 8601)")
+    parser.add_argument("--until", help="이 시각 이전 (UTC, ISO 8601)")
+    parser.add_argument("--bbox", help="minx,miny,maxx,maxy (odom 좌표)")
+    parser.add_argument("--class", dest="class_", help="클래스 이름, 쉼표로 구분")
+    parser.add_argument("--min-confidence", help="최소 신뢰도")
+    parser.add_argument("--store", choices=("mongo", "local"), default="mongo",
+                        help="읽을 경고 저장소 (local: 내장 SQLite 저장소)")
+    args = parser.parse_args()
+
+    filters = parse_filters({"since": args.since, "until": args.until, "bbox": args.bbox,
+                             "class": args.class_, "min_confidence": args.min_confidence})
+    if args.store == "local":
+        from web.storage.local_warning_store import LocalWarningStore
+        warning_repository = LocalWarningStore()
+    else:
+        import config
+        from web.storage.warning_repository import MongoWarningRepository
+        warning_repository = MongoWarningRepository(config.MONGODB_CLIENT.happy_circuit_db.warnings)
+    static_root = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static')
+
+    def resolve_image(image_path):
+        return os.path.join(static_root, image_path)
+
+    out = open(args.out, "wb") if args.out else sys.stdout.buffer
+    written = 0
+    try:
+        for chunk in iter_export(warning_repository, args.format, filters, resolve_image):
+            out.write(chunk)
+            written += len(chunk)
+    finally:
+        if args.out:
+            out.close()
+    print(f"[Export] {args.format} {written / 1024:.1f} KB 내보냄{f' -> {args.out}' if args.out else ''}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
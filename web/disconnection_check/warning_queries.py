@@ -0,0 +1,172 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+import pymongo
+from bson import ObjectId
+from bson.errors import InvalidId
+from flask import url_for
+
+# 목록 화면에 표시하는 필드만 가져옵니다 (detections는 클래스와 신뢰도만, 박스 좌표 등은 제외).
+LIST_PROJECTION = {"timestamp": 1, "odom.x": 1, "odom.y": 1, "image_path": 1,
+                   "detections.class_name": 1, "detections.confidence": 1}
+# (timestamp, _id) 내림차순 정렬. _id를 함께 써서 같은 시각의 경고도 순서가 항상 정해집니다.
+LIST_SORT = [("timestamp", pymongo.DESCENDING), ("_id", pymongo.DESCENDING)]
+DEFAULT_PAGE_SIZE = 30
+MAX_PAGE_SIZE = 100
+
+
+class InvalidQuery(ValueError):
+    """클라이언트가 보낸 조회 조건을 해석할 수 없는 경우."""
+
+
+class InvalidCursor(InvalidQuery):
+    """클라이언트가 보낸 커서를 해석할 수 없는 경우."""
+
+
+def ensure_indexes(warnings_collection):
+    """목록 조회용 복합 인덱스를 만듭니다. 정렬과 커서 조건을 모두 이 인덱스로 처리하므로 페이지 비용이 일정합니다."""
+    warnings_collection.create_index(LIST_SORT, name="timestamp_id_desc")
+    # 이미지 정리 시 같은 이미지를 참조하는 다른 경고가 있는지 확인하는 용도
+    warnings_collection.create_index("image_path")
+    warnings_collection.create_index("raw_image_path", sparse=True)
+    # 조회 API용: 위치(bbox, odom 평면 좌표) + 기간, 클래스 + 기간
+    warnings_collection.create_index([("odom.x", pymongo.ASCENDING), ("odom.y", pymongo.ASCENDING),
+                                      ("timestamp", pymongo.DESCENDING)])
+    warnings_collection.create_index([("detections.class_name", pymongo.ASCENDING), ("timestamp", pymongo.DESCENDING)])
+    # 재채점용: 분석한 모델 버전
+    warnings_collection.create_index([("model.version", pymongo.ASCENDING), ("timestamp", pymongo.DESCENDING)])
+
+
+def _parse_time(value, name):
+    try:
+        return datetime.fromisoformat(value.strip().rstrip('Z'))
+    except ValueError as e:
+        raise InvalidQuery(f"{name}은(는) ISO 8601 시각이어야 합니다 (UTC): {value}") from e
+
+
+def parse_filters(args):
+    """
+    요청 인자를 저장소(Mongo/SQLite)에 상관없는 조회 조건으로 바꿉니다. 모든 인자는 선택 사항입니다.
+    - bbox=minx,miny,maxx,maxy : odom 좌표 범위 (location이 있는 경고만)
+    - since, until             : 감지 시각 범위 (UTC, since 이상 until 미만)
+    - class=a,b                : 이 클래스 중 하나가 감지된 경고
+    - min_confidence=0.5       : 신뢰도가 이 값 이상인 감지가 있는 경고 (class와 함께 쓰면 같은 감지에 둘 다 적용)
+    반환값: 주어진 조건만 담은 dict (bbox, since, until, classes, min_confidence). 조건이 없으면 빈 dict.
+    """
+    filters = {}
+    bbox = args.get('bbox')
+    if bbox:
+        try:
+            min_x, min_y, max_x, max_y = (float(v) for v in bbox.split(','))
+        except ValueError as e:
+            raise InvalidQuery(f"bbox는 minx,miny,maxx,maxy 형식이어야 합니다: {bbox}") from e
+        if min_x >= max_x or min_y >= max_y:
+            raise InvalidQuery(f"bbox의 최솟값이 최댓값보다 작아야 합니다: {bbox}")
+        filters["bbox"] = (min_x, min_y, max_x, max_y)
+
+    if args.get('since'):
+        filters["since"] = _parse_time(args['since'], 'since')
+    if args.get('until'):
+        filters["until"] = _parse_time(args['until'], 'until')
+
+    classes = [c.strip() for c in (args.get('class') or '').split(',') if c.strip()]
+    if classes:
+        filters["classes"] = classes
+    if args.get('min_confidence'):
+        try:
+            filters["min_confidence"] = float(args['min_confidence'])
+        except ValueError as e:
+            raise InvalidQuery(f"min_confidence는 숫자여야 합니다: {args['min_confidence']}") from e
+    return filters
+
+
+def mongo_filter(filters):
+    """parse_filters()의 결과를 Mongo 조회 조건으로 바꿉니다."""
+    filters = filters or {}
+    conditions = []
+    if "bbox" in filters:
+        # odom 좌표는 지도 평면의 미터 단위이므로 구면(2dsphere) 도형이 아닌 평면 범위로 거릅니다.
+        # (내장 저장소, 히트맵과 같은 직사각형. 숫자가 아닌 "N/A" 위치는 범위 조건에 걸리지 않음)
+        min_x, min_y, max_x, max_y = filters["bbox"]
+        conditions.append({"odom.x": {"$gte": min_x, "$lte": max_x}, "odom.y": {"$gte": min_y, "$lte": max_y}})
+
+    time_range = {}
+    if "since" in filters:
+        time_range["$gte"] = filters["since"]
+    if "until" in filters:
+        time_range["$lt"] = filters["until"]
+    if time_range:
+        conditions.append({"timestamp": time_range})
+
+    detection = {}
+    if filters.get("classes"):
+        detection["class_name"] = {"$in": list(filters["classes"])}
+    if "min_confidence" in filters:
+        detection["confidence"] = {"$gte": filters["min_confidence"]}
+    if detection:
+        conditions.append({"detections": {"$elemMatch": detection}})
+
+    if not conditions:
+        return {}
+    return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+
+def encode_cursor(doc):
+    """마지막으로 보낸 문서의 (timestamp, _id)를 URL에 넣을 수 있는 불투명한 문자열로 만듭니다."""
+    payload = {"t": doc["timestamp"].isoformat(), "id": str(doc["_id"])}
+    return base64.urlsafe_b64encode(json.dumps(payload).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(payload["t"]), ObjectId(payload["id"])
+    except (binascii.Error, ValueError, KeyError, TypeError, InvalidId) as e:
+        raise InvalidCursor(f"잘못된 커서입니다: {e}") from e
+
+
+def clamp_page_size(limit):
+    return max(1, min(int(limit), MAX_PAGE_SIZE))
+
+
+def fetch_warning_page(warnings_collection, cursor=None, limit=DEFAULT_PAGE_SIZE, filters=None):
+    """
+    커서 다음의 경고를 limit개 가져옵니다 (keyset 페이지네이션).
+    skip을 쓰지 않으므로 몇 번째 페이지든 인덱스에서 바로 이어서 읽습니다.
+    filters는 parse_filters()의 결과이며, 같은 조건으로 다음 페이지를 요청해야 합니다.
+    반환값: (문서 목록, 다음 페이지 커서 또는 None)
+    """
+    limit = clamp_page_size(limit)
+    query = mongo_filter(filters)
+    if cursor:
+        timestamp, last_id = decode_cursor(cursor)
+        after_cursor = {"$or": [
+            {"timestamp": {"$lt": timestamp}},
+            {"timestamp": timestamp, "_id": {"$lt": last_id}},
+        ]}
+        query = {"$and": [query, after_cursor]} if query else after_cursor
+    # 한 개를 더 읽어 다음 페이지가 있는지 확인합니다.
+    docs = list(warnings_collection.find(query, LIST_PROJECTION).sort(LIST_SORT).limit(limit + 1))
+    next_cursor = encode_cursor(docs[limit - 1]) if len(docs) > limit else None
+    return docs[:limit], next_cursor
+
+
+def serialize_warning(doc):
+    """목록 한 행을 JSON으로 보낼 형태로 바꿉니다."""
+    odom = doc.get("odom") or {}
+    image_path = doc.get("image_path")
+    detections = doc.get("detections") or []
+    return {
+        "id": str(doc["_id"]),
+        "timestamp": doc["timestamp"].isoformat() + "Z",
+        "time_text": doc["timestamp"].strftime('%Y-%m-%d %H:%M:%S'),
+        "x": odom.get("x"),
+        "y": odom.get("y"),
+        "image_url": url_for('disconnection_check.warning_image', image_path=image_path) if image_path else None,
+        "thumb_url": url_for('disconnection_check.warning_thumbnail', image_path=image_path) if image_path else None,
+        "classes": sorted({d.get("class_name") for d in detections if d.get("class_name")}),
+        "max_confidence": max((d.get("confidence", 0) for d in detections), default=None),
+    }
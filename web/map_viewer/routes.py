@@ -1,4 +1,6 @@
-from flask import Blueprint, render_template
+from flask import Blueprint, render_template, current_app, request, jsonify, Response
+
+from web.storage.map_store import map_to_dict
 
 map_bp = Blueprint('map_viewer', __name__, template_folder='../templates')
 
@@ -9,3 +11,133 @@ def show_map_page():
     /map URL 요청 시, base.html을 상속받은 map.html 페이지를 렌더링합니다.
     """
     return render_template('map.html')
+
+
+def _map_store():
+    return current_app.config.get('MAP_STORE')
+
+
+def _parse_version_ref(value):
+    """'<run_id>:<version>' 형식 (version을 생략하면 마지막 버전)."""
+    run_id, _, version = (value or '').partition(':')
+    if not run_id:
+        raise ValueError("run_id가 필요합니다.")
+    return run_id, int(version) if version else None
+
+
+@map_bp.route('/api/maps/runs')
+def list_map_runs():
+    """저장된 탐사 목록 (버전 수, 저장 용량, 시작/마지막 시각)."""
+    map_store = _map_store()
+    if map_store is None:
+        return jsonify({"error": "데이터베이스에 연결되지 않았습니다."}), 503
+    return jsonify(map_store.list_runs())
+
+
+@map_bp.route('/api/maps/<run_id>/versions')
+def list_map_versions(run_id):
+    """탐사의 버전 목록 (지도 데이터 없이 메타데이터만)."""
+    map_store = _map_store()
+    if map_store is None:
+        return jsonify({"error": "데이터베이스에 연결되지 않았습니다."}), 503
+    return jsonify(map_store.list_versions(run_id))
+
+
+@map_bp.route('/api/maps/<run_id>/versions/<int:version>')
+@map_bp.route('/api/maps/<run_id>/latest')
+def get_map_version(run_id, version=None):
+    """
+    지정한 버전의 지도를 복원합니다.
+    기본은 ROS 지도 메시지와 같은 JSON이고, ?format=raw 이면 int8 격자 바이트를 그대로 보냅니다 (메타데이터는 헤더).
+    """
+    map_store = _map_store()
+    if map_store is None:
+        return jsonify({"error": "데이터베이스에 연결되지 않았습니다."}), 503
+    loaded = map_store.load(run_id, version)
+    if loaded is None:
+        return jsonify({"error": "해당 지도 버전이 없습니다."}), 404
+    info, grid = loaded
+    if request.args.get('format') == 'raw':
+        response = Response(grid.tobytes(), mimetype='application/octet-stream')
+        response.headers['X-Map-Width'] = info['width']
+        response.headers['X-Map-Height'] = info['height']
+        response.headers['X-Map-Resolution'] = info['resolution']
+        response.headers['X-Map-Origin'] = f"{info['origin']['x']},{info['origin']['y']}"
+        return response
+    return jsonify(map_to_dict(info, grid))
+
+
+@map_bp.route('/api/maps/compare')
+def compare_maps():
+    """?a=<run_id>:<version>&b=<run_id>:<version> 두 지도를 겹치는 영역에서 비교한 요약."""
+    map_store = _map_store()
+    if map_store is None:
+        return jsonify({"error": "데이터베이스에 연결되지 않았습니다."}), 503
+    try:
+        result = map_store.compare(_parse_version_ref(request.args.get('a')), _parse_version_ref(request.args.get('b')))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if result is None:
+        return jsonify({"error": "해당 지도 버전이 없습니다."}), 404
+    return jsonify(result)
+
+
+# 버전을 지정한 저장 지도의 타일은 바뀌지 않으므로 오래 캐시합니다.
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+def _tile_source(source):
+    """
+    'live' -> 실시간 지도 타일, '<run_id>' -> 탐사의 마지막 버전, '<run_id>:<version>' -> 저장된 버전.
+    반환값: (MapTiles 또는 None, 내용이 바뀌지 않는 소스인지)
+    """
+    if source == 'live':
+        return current_app.config['LIVE_MAP_TILES'], False
+    stored_tiles = current_app.config.get('STORED_MAP_TILES')
+    if stored_tiles is None:
+        return None, False
+    run_id, version = _parse_version_ref(source)
+    immutable = version is not None
+    if version is None:
+        version = stored_tiles.map_store.latest_version(run_id)
+        if version is None:
+            return None, False
+    return stored_tiles.get(run_id, version), immutable
+
+
+@map_bp.route('/api/maps/tiles/<source>/meta')
+def map_tiles_meta(source):
+    """타일 소스의 지도 크기, 해상도, 원점, 타일 크기, level 수."""
+    try:
+        tiles, _ = _tile_source(source)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    meta = tiles.meta() if tiles is not None else None
+    if meta is None:
+        return jsonify({"error": "지도가 아직 없습니다."}), 404
+    return jsonify(meta)
+
+
+@map_bp.route('/api/maps/tiles/<source>/<int:level>/<int:tx>/<int:ty>.png')
+def map_tile(source, level, tx, ty):
+    """
+    PNG 타일. level 0은 셀 1개 = 1픽셀, level마다 2배 축소. (tx, ty)는 지도 왼쪽 위 기준 타일 위치.
+    실시간 지도는 ETag로 매번 재검증(바뀌지 않았으면 304), 버전을 지정한 저장 지도는 장기 캐시합니다.
+    """
+    try:
+        tiles, immutable = _tile_source(source)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    rendered = tiles.tile(level, tx, ty) if tiles is not None else None
+    if rendered is None:
+        return jsonify({"error": "해당 타일이 없습니다."}), 404
+    png, etag = rendered
+    response = Response(png, mimetype='image/png')
+    response.set_etag(etag)
+    if immutable:
+        response.cache_control.public = True
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    return response.make_conditional(request)
@@ -1,72 +1,208 @@
 document.addEventListener('DOMContentLoaded', () => {
     const canvas = document.getElementById('mapCanvas');
     const ctx = canvas.getContext('2d');
+    const sourceSelect = document.getElementById('mapSource');
+    const heatmapToggle = document.getElementById('heatmapToggle');
+
+    // 지도는 서버가 미리 그린 PNG 타일(/api/maps/tiles/...)로 받아 화면에 보이는 타일만 불러옵니다.
+    // level 0은 셀 1개 = 타일 1픽셀, level이 오를수록 2배씩 축소된 타일입니다.
+    const MAX_CACHED_TILES = 400;
 
     // 지도 및 로봇 위치 데이터를 저장할 상태 변수
-    let currentMap = null;
-    let robotPose = null; // 로봇의 현재 위치 및 방향
+    let source = 'live';     // 'live' 또는 저장된 탐사 '<run_id>' / '<run_id>:<version>'
+    let currentMap = null;   // 타일 메타데이터 {width, height, resolution, origin, tile_size, levels}
+    let robotPose = null;    // 로봇의 현재 위치 및 방향
+    let view = null;         // 화면 변환: 화면 픽셀 = offset + 셀 좌표 * scale (셀 y는 위쪽이 +y인 이미지 방향)
+    const tiles = new Map(); // 'source/level/tx/ty' -> Image
+    const tileRevisions = new Map(); // 실시간 지도에서 바뀐 타일의 URL을 바꾸기 위한 번호
+    let baseRevision = 0;            // 지도 크기가 바뀌어 모든 타일을 새로 받을 때의 번호
+    let redrawPending = false;
+    let heatmap = null;      // 경고 히트맵 {cell_size, cells: [{x, y, count, max_confidence}], max_count}
+    const HEATMAP_REFRESH_MS = 15000;
 
     if (typeof socket === 'undefined') {
         console.error('Socket.IO is not available. Make sure socket.js is loaded before map_renderer.js');
         return;
     }
 
+    /**
+     * 캔버스 크기를 감싸는 영역에 맞춥니다.
+     */
+    function resizeCanvas() {
+        const wrapper = canvas.parentElement;
+        canvas.width = wrapper.clientWidth;
+        canvas.height = Math.round(wrapper.clientWidth * 0.75);
+    }
+
+    /**
+     * 지도 전체가 캔버스에 들어오도록 화면 변환을 초기화합니다.
+     */
+    function fitView() {
+        const scale = Math.min(canvas.width / currentMap.width, canvas.height / currentMap.height);
+        view = {
+            scale,
+            offsetX: (canvas.width - currentMap.width * scale) / 2,
+            offsetY: (canvas.height - currentMap.height * scale) / 2,
+        };
+    }
+
+    function requestRedraw() {
+        if (redrawPending) return;
+        redrawPending = true;
+        requestAnimationFrame(() => {
+            redrawPending = false;
+            redrawCanvas();
+        });
+    }
+
     /**
      * 지도, 원점, 로봇 위치를 포함한 전체 캔버스를 다시 그리는 메인 함수
      */
     function redrawCanvas() {
-        if (!currentMap) {
+        ctx.fillStyle = '#808080';
+        ctx.fillRect(0, 0, canvas.width, canvas.height);
+        if (!currentMap || !view) {
             return;
         }
         // 1. 지도 그리기
         drawMap(currentMap);
 
-        // 2. 지도 원점 그리기
+        // 2. 경고 히트맵 오버레이
+        if (heatmap && heatmapToggle && heatmapToggle.checked) {
+            drawHeatmap(currentMap, heatmap);
+        }
+
+        // 3. 지도 원점 그리기
         drawOrigin(currentMap);
 
-        // 3. 로봇 위치 그리기
-        if (robotPose) {
+        // 4. 로봇 위치 그리기
+        if (robotPose && source === 'live') {
             drawRobot(currentMap, robotPose);
         }
     }
 
     /**
-     * 서버로부터 받은 지도 데이터를 Canvas에 그리는 함수
+     * 현재 배율에 맞는 level을 고릅니다 (화면 1픽셀에 셀이 여러 개 들어가면 축소된 타일 사용).
+     */
+    function chooseLevel(map) {
+        const level = Math.floor(Math.log2(1 / view.scale));
+        return Math.max(0, Math.min(map.levels - 1, level));
+    }
+
+    function tileKey(level, tx, ty) {
+        return `${source}/${level}/${tx}/${ty}`;
+    }
+
+    /**
+     * 타일 이미지를 반환합니다. 아직 없으면 불러오기를 시작하고 null을 반환합니다.
+     */
+    function getTile(level, tx, ty) {
+        const key = tileKey(level, tx, ty);
+        let img = tiles.get(key);
+        if (!img) {
+            img = new Image();
+            img.onload = requestRedraw;
+            const revision = tileRevisions.get(key) || baseRevision;
+            img.src = `/api/maps/tiles/${encodeURIComponent(source)}/${level}/${tx}/${ty}.png?r=${revision}`;
+            tiles.set(key, img);
+            // 오래된 타일부터 버려 메모리 사용량을 제한합니다.
+            while (tiles.size > MAX_CACHED_TILES) {
+                tiles.delete(tiles.keys().next().value);
+            }
+            return null;
+        }
+        return img.complete && img.naturalWidth ? img : null;
+    }
+
+    /**
+     * 화면에 보이는 타일만 그립니다. 아직 도착하지 않은 타일은 이미 가진 더 축소된 타일로 임시로 채웁니다.
      */
     function drawMap(map) {
-        const { width, height, data } = map;
-        
-        if (canvas.width !== width) canvas.width = width;
-        if (canvas.height !== height) canvas.height = height;
-        
-        const imageData = ctx.createImageData(width, height);
-
-        for (let i = 0; i < data.length; i++) {
-            const x = i % width;
-            const y = height - 1 - Math.floor(i / width);
-            const pixelIndex = (y * width + x) * 4;
-
-            let R, G, B;
-            const value = data[i];
-            if (value === -1) { [R, G, B] = [128, 128, 128]; } // 알 수 없는 영역 (회색)
-            else if (value === 0) { [R, G, B] = [255, 255, 255]; } // 비어있는 영역 (흰색)
-            else { [R, G, B] = [0, 0, 0]; } // 점유된 영역 (검은색)
-
-            imageData.data[pixelIndex] = R;
-            imageData.data[pixelIndex + 1] = G;
-            imageData.data[pixelIndex + 2] = B;
-            imageData.data[pixelIndex + 3] = 255;
+        const level = chooseLevel(map);
+        const span = map.tile_size << level; // 타일 하나가 덮는 셀 수
+        const x0 = Math.max(0, -view.offsetX / view.scale);
+        const y0 = Math.max(0, -view.offsetY / view.scale);
+        const x1 = Math.min(map.width, (canvas.width - view.offsetX) / view.scale);
+        const y1 = Math.min(map.height, (canvas.height - view.offsetY) / view.scale);
+        if (x1 <= x0 || y1 <= y0) return;
+
+        ctx.imageSmoothingEnabled = false;
+        for (let ty = Math.floor(y0 / span); ty * span < y1; ty++) {
+            for (let tx = Math.floor(x0 / span); tx * span < x1; tx++) {
+                const img = getTile(level, tx, ty);
+                if (img) {
+                    drawTileImage(img, level, tx * span, ty * span, 0, 0, img.naturalWidth, img.naturalHeight);
+                } else {
+                    drawFallback(map, level, tx, ty);
+                }
+            }
+        }
+    }
+
+    function drawTileImage(img, level, cellX, cellY, sx, sy, sw, sh) {
+        const factor = 1 << level;
+        ctx.drawImage(img, sx, sy, sw, sh,
+            view.offsetX + cellX * view.scale, view.offsetY + cellY * view.scale,
+            sw * factor * view.scale, sh * factor * view.scale);
+    }
+
+    function drawFallback(map, level, tx, ty) {
+        for (let parent = level + 1; parent < map.levels; parent++) {
+            const img = tiles.get(tileKey(parent, tx >> (parent - level), ty >> (parent - level)));
+            if (!img || !img.complete || !img.naturalWidth) continue;
+            // 부모 타일 안에서 이 타일이 차지하는 부분만 잘라서 그립니다.
+            const span = map.tile_size << level;
+            const parentSpan = map.tile_size << parent;
+            const factor = 1 << parent;
+            const sx = (tx * span - (tx >> (parent - level)) * parentSpan) / factor;
+            const sy = (ty * span - (ty >> (parent - level)) * parentSpan) / factor;
+            const sw = Math.min(span / factor, img.naturalWidth - sx);
+            const sh = Math.min(span / factor, img.naturalHeight - sy);
+            if (sw > 0 && sh > 0) {
+                drawTileImage(img, parent, tx * span, ty * span, sx, sy, sw, sh);
+            }
+            return;
+        }
+    }
+
+    /**
+     * 월드 좌표(m)를 캔버스 픽셀 좌표로 변환합니다.
+     */
+    function worldToCanvas(map, x, y) {
+        const cellX = (x - map.origin.x) / map.resolution;
+        const cellY = map.height - ((y - map.origin.y) / map.resolution);
+        return [view.offsetX + cellX * view.scale, view.offsetY + cellY * view.scale];
+    }
+
+    /**
+     * 미리 집계된 경고 히트맵을 반투명 칸으로 그립니다 (경고가 많을수록 진하게).
+     */
+    function drawHeatmap(map, data) {
+        if (!data.max_count) return;
+        const cellPixels = data.cell_size / map.resolution * view.scale;
+        data.cells.forEach(cell => {
+            // 칸의 왼쪽 아래 좌표 -> 화면에서는 왼쪽 위가 (x, y + cell_size)
+            const [left, top] = worldToCanvas(map, cell.x, cell.y + data.cell_size);
+            const alpha = 0.25 + 0.6 * (cell.count / data.max_count);
+            ctx.fillStyle = `rgba(255, 60, 0, ${alpha.toFixed(2)})`;
+            ctx.fillRect(left, top, Math.max(cellPixels, 2), Math.max(cellPixels, 2));
+        });
+    }
+
+    async function loadHeatmap() {
+        if (!heatmapToggle || !heatmapToggle.checked) return;
+        const response = await fetch('/api/warnings/heatmap');
+        if (response.ok) {
+            heatmap = await response.json();
+            requestRedraw();
         }
-        ctx.putImageData(imageData, 0, 0);
     }
 
     /**
      * 지도 위에 원점(origin)을 그리는 함수
      */
     function drawOrigin(map) {
-        const { resolution, origin, height } = map;
-        const pixelX = (0 - origin.x) / resolution;
-        const pixelY = height - ((0 - origin.y) / resolution);
+        const [pixelX, pixelY] = worldToCanvas(map, 0, 0);
 
         // 파란색 십자선으로 원점 표시
         ctx.strokeStyle = 'blue';
@@ -81,44 +217,141 @@ document.addEventListener('DOMContentLoaded', () => {
 
     /**
      * 지도 위에 로봇의 현재 위치를 그리는 함수
-     * @param {object} map - 지도 데이터
+     * @param {object} map - 지도 메타데이터
      * @param {object} pose - 로봇의 위치 및 방향 데이터 ({ translation: { x, y, z }, rotation: { x, y, z, w } })
      */
     function drawRobot(map, pose) {
-        const { resolution, origin, height } = map;
         const { translation } = pose;
-
-        // 로봇의 월드 좌표를 캔버스 픽셀 좌표로 변환
-        const pixelX = (translation.x - origin.x) / resolution;
-        const pixelY = height - ((translation.y - origin.y) / resolution);
+        const [pixelX, pixelY] = worldToCanvas(map, translation.x, translation.y);
 
         // 빨간색 점으로 로봇 위치 표시
         ctx.fillStyle = 'red';
         ctx.beginPath();
-        ctx.arc(pixelX, pixelY, 3, 0, 2 * Math.PI); // 반지름 5px
+        ctx.arc(pixelX, pixelY, 3, 0, 2 * Math.PI);
         ctx.fill();
     }
 
+    /**
+     * 지도 소스를 바꾸고 메타데이터를 불러옵니다.
+     */
+    async function loadSource(newSource) {
+        source = newSource;
+        currentMap = null;
+        tiles.clear();
+        tileRevisions.clear();
+        baseRevision = 0;
+        const response = await fetch(`/api/maps/tiles/${encodeURIComponent(source)}/meta`);
+        if (response.ok && newSource === source) {
+            currentMap = await response.json();
+            baseRevision = currentMap.generation || 0;
+            fitView();
+        }
+        requestRedraw();
+    }
+
+    async function loadStoredRuns() {
+        if (!sourceSelect) return;
+        const response = await fetch('/api/maps/runs');
+        if (!response.ok) return;
+        const runs = await response.json();
+        runs.forEach(run => {
+            const option = document.createElement('option');
+            option.value = run.run_id;
+            option.textContent = `탐사 ${run.run_id} (${run.versions}개 버전)`;
+            sourceSelect.appendChild(option);
+        });
+    }
+
+    // --- 화면 이동/확대 ---
+
+    canvas.addEventListener('wheel', (event) => {
+        if (!view) return;
+        event.preventDefault();
+        const rect = canvas.getBoundingClientRect();
+        const mouseX = (event.clientX - rect.left) * (canvas.width / rect.width);
+        const mouseY = (event.clientY - rect.top) * (canvas.height / rect.height);
+        const zoom = event.deltaY < 0 ? 1.25 : 0.8;
+        // 마우스 아래 지점이 그대로 있도록 확대/축소합니다.
+        view.offsetX = mouseX - (mouseX - view.offsetX) * zoom;
+        view.offsetY = mouseY - (mouseY - view.offsetY) * zoom;
+        view.scale *= zoom;
+        requestRedraw();
+    }, { passive: false });
+
+    let dragStart = null;
+    canvas.addEventListener('pointerdown', (event) => {
+        if (!view) return;
+        dragStart = { x: event.clientX, y: event.clientY, offsetX: view.offsetX, offsetY: view.offsetY };
+        canvas.setPointerCapture(event.pointerId);
+    });
+    canvas.addEventListener('pointermove', (event) => {
+        if (!dragStart) return;
+        const ratio = canvas.width / canvas.getBoundingClientRect().width;
+        view.offsetX = dragStart.offsetX + (event.clientX - dragStart.x) * ratio;
+        view.offsetY = dragStart.offsetY + (event.clientY - dragStart.y) * ratio;
+        requestRedraw();
+    });
+    canvas.addEventListener('pointerup', () => { dragStart = null; });
+    canvas.addEventListener('dblclick', () => {
+        if (!currentMap) return;
+        fitView();
+        requestRedraw();
+    });
+
+    window.addEventListener('resize', () => {
+        resizeCanvas();
+        if (currentMap) fitView();
+        requestRedraw();
+    });
+
+    if (sourceSelect) {
+        sourceSelect.addEventListener('change', () => loadSource(sourceSelect.value));
+    }
+    if (heatmapToggle) {
+        heatmapToggle.addEventListener('change', () => {
+            loadHeatmap();
+            requestRedraw();
+        });
+        setInterval(loadHeatmap, HEATMAP_REFRESH_MS);
+    }
+
 
     // --- Socket.IO 이벤트 리스너 ---
 
-    // 'map_update' 이벤트를 수신하면 지도 데이터를 저장하고 캔버스를 다시 그립니다.
+    // 'map_update' 이벤트는 지도 메타데이터와 바뀐 level 0 타일 목록(dirty)만 담고 있습니다.
+    // 바뀐 타일과 그 타일을 포함하는 축소 타일만 다시 불러옵니다.
     socket.on('map_update', (mapData) => {
+        if (source !== 'live') return;
+        const resized = !currentMap || mapData.dirty === null
+            || currentMap.width !== mapData.width || currentMap.height !== mapData.height;
+        const first = !currentMap;
         currentMap = mapData;
-        redrawCanvas();
+        if (resized) {
+            // 크기나 원점이 바뀌면 모든 타일이 달라지므로 번호를 올려 전부 새로 받습니다.
+            tiles.clear();
+            tileRevisions.clear();
+            baseRevision = mapData.generation;
+            if (first) fitView();
+        } else {
+            (mapData.dirty || []).forEach(([tx, ty]) => {
+                for (let level = 0; level < mapData.levels; level++) {
+                    const key = tileKey(level, tx >> level, ty >> level);
+                    tiles.delete(key);
+                    tileRevisions.set(key, mapData.generation);
+                }
+            });
+        }
+        requestRedraw();
     });
 
     // 'tf_update' 이벤트를 수신하면 로봇 위치 데이터를 저장하고 캔버스를 다시 그립니다.
     socket.on('tf_update', (poseData) => {
-        console.log("Received tf_update event:", poseData); // 1. 수신된 전체 데이터 확인
-
         // odom 프레임 기준으로 base_footprint의 transform을 찾습니다.
         const baseLinkTransform = poseData.transforms.find(t => t.header.frame_id === 'odom' && t.child_frame_id === 'base_footprint');
-        
+
         if (baseLinkTransform) {
-            console.log("Found base_link transform:", baseLinkTransform.transform); // 2. 찾은 transform 확인
             robotPose = baseLinkTransform.transform;
-            redrawCanvas();
+            requestRedraw();
         } else {
             // odom -> base_link를 찾지 못한 경우, 다른 일반적인 transform(map -> odom)을 로깅하여 데이터를 확인합니다.
             const odomTransform = poseData.transforms.find(t => t.header.frame_id === 'map' && t.child_frame_id === 'odom');
@@ -128,5 +361,9 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     });
 
-    console.log('Map renderer initialized and waiting for map and tf data...');
+    resizeCanvas();
+    loadSource('live');
+    loadStoredRuns();
+    loadHeatmap();
+    console.log('Map renderer initialized and waiting for map tiles and tf data...');
 });
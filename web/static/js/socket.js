@@ -210,11 +210,24 @@ document.addEventListener('DOMContentLoaded', (event) => {
         }
     }
     
+    // 마지막으로 src에 넣은 프레임 번호. 이미지가 실제로 표시되면 서버에 ack를 보냅니다 (지연 시간 추적용).
+    let pendingFrameId = null;
+    if (videoStream) {
+        videoStream.addEventListener('load', () => {
+            if (pendingFrameId !== null) {
+                socket.emit('frame_displayed', { 'frame_id': pendingFrameId });
+                pendingFrameId = null;
+            }
+        });
+    }
+
     // new_image 이벤트를 받았을 때 video-stream 업데이트
     socket.on('new_image', (data) => {
         if (videoStream && data.image && data.image.length > 100) {
             videoStream.style.display = 'block';
             videoOverlay.style.display = 'none';
+            // 이전 이미지가 아직 로드 중이면 취소되므로, 가장 최근 프레임 번호만 기억합니다.
+            pendingFrameId = (data.frame_id !== undefined) ? data.frame_id : null;
             videoStream.src = 'data:image/jpeg;base64,' + data.image;
         }
     });
@@ -0,0 +1,75 @@
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+import config
+
+# 재분석 결과 캐시 파일 (config.py에서 덮어쓸 수 있음)
+ANALYSIS_CACHE_PATH = getattr(config, 'ANALYSIS_CACHE_PATH',
+                              os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                           'data', 'analysis_cache.sqlite3'))
+# SQLite 한 문장에 넣는 인자 수 상한을 넘지 않도록 나눠서 조회합니다.
+LOOKUP_CHUNK = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS analysis_results (
+    content_hash TEXT NOT NULL,
+    model_version TEXT NOT NULL,
+    detections TEXT NOT NULL,
+    analyzed_at TEXT NOT NULL,
+    PRIMARY KEY (content_hash, model_version)
+) WITHOUT ROWID;
+"""
+
+
+class AnalysisCache:
+    """
+    이미지 추론 결과 캐시: (이미지 내용 해시, 모델 버전) -> 감지 목록.
+    같은 이미지를 같은 모델로 다시 추론하지 않도록 하며, 결과를 배치마다 커밋하므로
+    재분석 작업이 중간에 멈춰도 다시 실행하면 끝난 이미지는 건너뛰고 이어서 진행합니다.
+    """
+    def __init__(self, path=ANALYSIS_CACHE_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.executescript(SCHEMA)
+
+    def get_many(self, content_hashes, model_version):
+        """캐시에 있는 결과만 {content_hash: detections}로 반환합니다."""
+        hashes = list(dict.fromkeys(content_hashes))
+        found = {}
+        with self._lock:
+            for start in range(0, len(hashes), LOOKUP_CHUNK):
+                chunk = hashes[start:start + LOOKUP_CHUNK]
+                rows = self._conn.execute(
+                    f"SELECT content_hash, detections FROM analysis_results "
+                    f"WHERE model_version = ? AND content_hash IN ({','.join('?' * len(chunk))})",
+                    [model_version] + chunk)
+                found.update((content_hash, json.loads(detections)) for content_hash, detections in rows)
+        return found
+
+    def put_many(self, results, model_version):
+        """results: [(content_hash, detections)] 를 한 트랜잭션으로 저장합니다."""
+        analyzed_at = datetime.utcnow().isoformat()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO analysis_results VALUES (?, ?, ?, ?)",
+                [(content_hash, model_version, json.dumps(detections), analyzed_at)
+                 for content_hash, detections in results])
+
+    def count(self, model_version=None):
+        with self._lock:
+            if model_version is None:
+                return self._conn.execute("SELECT COUNT(*) FROM analysis_results").fetchone()[0]
+            return self._conn.execute("SELECT COUNT(*) FROM analysis_results WHERE model_version = ?",
+                                      (model_version,)).fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
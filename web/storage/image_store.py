@@ -0,0 +1,167 @@
+import glob
+import hashlib
+import logging
+import os
+import shutil
+import threading
+
+import config
+
+from web.storage.thumbnails import write_thumbnail
+
+# 경고 이미지 저장소 설정 (config.py에서 덮어쓸 수 있음)
+# 경고 1건은 표시용 이미지, 썸네일, 재채점용 원본 프레임(RAW_FRAME_JPEG_QUALITY로 다시 인코딩, 표시용 이미지의 절반 정도)을 씁니다.
+IMAGE_STORE_MAX_BYTES = getattr(config, 'IMAGE_STORE_MAX_BYTES', 2 * 1024 ** 3)         # 저장소 전체 상한 (썸네일, 원본 프레임 포함)
+IMAGE_STORE_MIN_FREE_BYTES = getattr(config, 'IMAGE_STORE_MIN_FREE_BYTES', 200 * 1024 ** 2)  # 디스크 여유 공간이 이보다 적으면 저장 거부
+
+
+class ImageStoreFull(OSError):
+    """디스크 여유 공간이 부족해 이미지를 저장하지 않은 경우."""
+
+
+class ImageStore:
+    """
+    경고 이미지를 내용 해시(SHA-256) 이름으로 저장하는 저장소.
+    - 경로: <root>/<해시 앞 2자리>/<다음 2자리>/<해시>.jpg  (한 폴더에 파일이 몰리지 않도록 분산)
+    - 같은 바이트의 이미지는 한 번만 저장하고 같은 경로를 돌려줍니다.
+    - 사용량(used_bytes, file_count)은 시작할 때 한 번 세고, 이후에는 저장/삭제할 때 갱신합니다.
+    DB에는 static 폴더 기준 경로(static_prefix/...)를 저장합니다.
+    """
+    def __init__(self, root, static_prefix, max_bytes=IMAGE_STORE_MAX_BYTES, min_free_bytes=IMAGE_STORE_MIN_FREE_BYTES):
+        self.root = os.path.realpath(root)
+        self.static_prefix = static_prefix.strip('/')
+        self.max_bytes = max_bytes
+        self.min_free_bytes = min_free_bytes
+        self.used_bytes = 0
+        self.file_count = 0
+        self.deduplicated = 0
+        # 용량이 상한을 넘으면 호출 (정리 스레드를 깨우는 용도)
+        self.on_pressure = None
+        self._lock = threading.Lock()
+        # 이미지 저장 ~ 경고 문서 저장 사이와, 정리 스레드의 참조 확인 ~ 파일 삭제 사이를 묶는 잠금.
+        # put()이 중복 제거로 기존 경로를 돌려준 직후, 문서가 들어가기 전에 그 파일이 지워지지 않도록 합니다.
+        self.reference_lock = threading.RLock()
+        os.makedirs(self.root, exist_ok=True)
+        self.rescan()
+
+    # --- 경로 변환 ---
+    def image_path(self, absolute_path):
+        """절대 경로 -> DB에 저장하는 static 기준 경로"""
+        relative = os.path.relpath(absolute_path, self.root).replace(os.sep, '/')
+        return f"{self.static_prefix}/{relative}"
+
+    def absolute_path(self, image_path):
+        """static 기준 경로 -> 절대 경로. 이 저장소 밖을 가리키면 None."""
+        relative = image_path.replace('\\', '/')
+        if not relative.startswith(self.static_prefix + '/'):
+            return None
+        absolute = os.path.realpath(os.path.join(self.root, relative[len(self.static_prefix) + 1:]))
+        if os.path.commonpath([absolute, self.root]) != self.root:
+            return None
+        return absolute
+
+    # --- 저장/삭제 ---
+    def put(self, jpeg_bytes, image=None):
+        """
+        이미 인코딩된 JPEG 바이트를 그대로 저장하고 static 기준 경로를 반환합니다 (다시 인코딩하지 않음).
+        image(BGR 배열)를 함께 넘기면 목록용 썸네일도 옆에 만듭니다.
+        """
+        digest = hashlib.sha256(jpeg_bytes).hexdigest()
+        absolute = os.path.join(self.root, digest[:2], digest[2:4], f"{digest}.jpg")
+        if os.path.exists(absolute):
+            self.deduplicated += 1
+            return self.image_path(absolute)
+
+        if shutil.disk_usage(self.root).free < self.min_free_bytes + len(jpeg_bytes):
+            self._notify_pressure()
+            raise ImageStoreFull(f"디스크 여유 공간이 부족해 이미지를 저장하지 않습니다: {self.root}")
+
+        os.makedirs(os.path.dirname(absolute), exist_ok=True)
+        # 쓰는 도중에 실패해도 반쯤 쓴 파일이 남지 않도록 임시 파일에 쓴 뒤 교체합니다.
+        tmp_path = f"{absolute}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(jpeg_bytes)
+            os.replace(tmp_path, absolute)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        added = len(jpeg_bytes)
+        files = 1
+        if image is not None:
+            try:
+                added += os.path.getsize(write_thumbnail(absolute, image))
+                files += 1
+            except Exception as e:
+                # 썸네일은 첫 요청 때 다시 만들 수 있으므로 원본 저장은 성공으로 처리합니다.
+                logging.warning(f"[ImageStore] 썸네일 생성 실패 ({digest[:12]}): {e}")
+        with self._lock:
+            self.used_bytes += added
+            self.file_count += files
+            over = self.max_bytes and self.used_bytes > self.max_bytes
+        if over:
+            self._notify_pressure()
+        return self.image_path(absolute)
+
+    def delete(self, image_path):
+        """원본과 썸네일을 지우고 확보한 바이트 수를 반환합니다."""
+        absolute = self.absolute_path(image_path)
+        if absolute is None:
+            return 0
+        stem, _ = os.path.splitext(absolute)
+        freed = 0
+        files = 0
+        for path in [absolute] + glob.glob(glob.escape(stem) + '.thumb.*'):
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            freed += size
+            files += 1
+        with self._lock:
+            self.used_bytes -= freed
+            self.file_count -= files
+        return freed
+
+    def iter_images(self):
+        """저장소의 원본 이미지 경로(static 기준)와 수정 시각을 나열합니다 (썸네일 제외)."""
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if name.endswith('.jpg') and '.thumb.' not in name:
+                    absolute = os.path.join(dirpath, name)
+                    try:
+                        yield self.image_path(absolute), os.path.getmtime(absolute)
+                    except FileNotFoundError:
+                        continue
+
+    # --- 사용량 ---
+    def rescan(self):
+        """디스크를 한 번 훑어 사용량을 다시 셉니다 (시작할 때와 정리 후 보정용)."""
+        used = 0
+        count = 0
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                try:
+                    used += os.path.getsize(os.path.join(dirpath, name))
+                except FileNotFoundError:
+                    continue
+                count += 1
+        with self._lock:
+            self.used_bytes = used
+            self.file_count = count
+        return used
+
+    def over_quota(self):
+        return bool(self.max_bytes) and self.used_bytes > self.max_bytes
+
+    def _notify_pressure(self):
+        if self.on_pressure:
+            self.on_pressure()
+
+    def usage(self):
+        with self._lock:
+            used, count = self.used_bytes, self.file_count
+        return {"used_bytes": used, "file_count": count, "max_bytes": self.max_bytes,
+                "free_bytes": shutil.disk_usage(self.root).free, "deduplicated": self.deduplicated}
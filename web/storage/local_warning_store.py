@@ -0,0 +1,353 @@
+import json
+import logging
+import math
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+from bson import ObjectId
+
+import config
+from web.disconnection_check.warning_queries import DEFAULT_PAGE_SIZE, clamp_page_size, decode_cursor, encode_cursor
+
+# 내장 경고 저장소 파일 (config.py에서 덮어쓸 수 있음)
+LOCAL_WARNING_DB_PATH = getattr(config, 'LOCAL_WARNING_DB_PATH',
+                                os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                             'data', 'warnings.sqlite3'))
+# 문자열 정렬 순서가 시간 순서와 같도록 항상 같은 형식(마이크로초까지)으로 저장합니다.
+TIME_FORMAT = '%Y-%m-%dT%H:%M:%S.%f'
+ITER_BATCH = 500
+# 컬럼으로 따로 저장하는 필드 (나머지 필드는 body에 JSON으로 저장)
+COLUMN_FIELDS = ("_id", "timestamp", "location", "image_path", "raw_image_path")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS warnings (
+    seq INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    timestamp TEXT NOT NULL,
+    x REAL,
+    y REAL,
+    image_path TEXT,
+    max_confidence REAL,
+    body TEXT NOT NULL,
+    synced INTEGER NOT NULL DEFAULT 0,
+    model_version TEXT,
+    rev INTEGER NOT NULL DEFAULT 0,
+    raw_image_path TEXT
+);
+CREATE INDEX IF NOT EXISTS warnings_time ON warnings (timestamp, id);
+CREATE INDEX IF NOT EXISTS warnings_image ON warnings (image_path);
+CREATE INDEX IF NOT EXISTS warnings_raw_image ON warnings (raw_image_path) WHERE raw_image_path IS NOT NULL;
+CREATE INDEX IF NOT EXISTS warnings_unlocated ON warnings (timestamp) WHERE x IS NULL;
+CREATE INDEX IF NOT EXISTS warnings_unsynced ON warnings (seq) WHERE synced = 0;
+CREATE INDEX IF NOT EXISTS warnings_model ON warnings (model_version, timestamp);
+CREATE TABLE IF NOT EXISTS warning_detections (
+    seq INTEGER NOT NULL,
+    class_name TEXT,
+    confidence REAL
+);
+CREATE INDEX IF NOT EXISTS warning_detections_seq ON warning_detections (seq);
+CREATE INDEX IF NOT EXISTS warning_detections_class ON warning_detections (class_name, confidence);
+CREATE TABLE IF NOT EXISTS warning_deletions (
+    id TEXT PRIMARY KEY
+);
+"""
+
+
+def _time_text(value):
+    return value.strftime(TIME_FORMAT)
+
+
+class LocalWarningStore:
+    """
+    MongoDB 없이 쓰는 내장 경고 저장소 (SQLite, 저장소 인터페이스는 web/storage/warning_repository.py 참고).
+    - WAL 모드이므로 웹 서버가 경고를 저장하는 동안에도 내보내기 CLI 등 다른 프로세스가 읽을 수 있습니다.
+    - 위치는 R-tree 색인에 넣어 근처 중복 확인과 bbox 조회가 경고 수와 상관없이 빠릅니다
+      (R-tree가 없는 SQLite 빌드에서는 (x, y) 인덱스를 대신 사용).
+    - 경고 _id는 ObjectId 문자열로 저장하므로 목록 커서가 Mongo와 같고, Mongo로 옮길 때도 같은 _id를 씁니다.
+    - 연결 하나를 잠금으로 보호해 여러 스레드에서 함께 씁니다.
+    track_deletions=True이면 삭제한 경고의 _id를 남겨 WarningSyncThread가 MongoDB에서도 지우게 합니다.
+    """
+    kind = 'local'
+
+    def __init__(self, path=LOCAL_WARNING_DB_PATH, track_deletions=False):
+        self.path = path
+        self.track_deletions = track_deletions
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.create_function("cell", 2, lambda value, size: math.floor(value / size), deterministic=True)
+        with self._conn:
+            self._migrate()
+            self._conn.executescript(SCHEMA)
+            self.has_rtree = self._create_spatial_index()
+
+    def _migrate(self):
+        # model_version 컬럼이 없던 파일에 컬럼을 추가합니다 (기존 경고는 모델 버전 없음 = 재채점 대상).
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(warnings)")}
+        if columns and "model_version" not in columns:
+            self._conn.execute("ALTER TABLE warnings ADD COLUMN model_version TEXT")
+        # 동기화 중에 바뀐 경고를 구분하기 위한 수정 번호
+        if columns and "rev" not in columns:
+            self._conn.execute("ALTER TABLE warnings ADD COLUMN rev INTEGER NOT NULL DEFAULT 0")
+        # 재채점용 원본 프레임 경로 (이전 경고에는 없음)
+        if columns and "raw_image_path" not in columns:
+            self._conn.execute("ALTER TABLE warnings ADD COLUMN raw_image_path TEXT")
+
+    def _create_spatial_index(self):
+        try:
+            self._conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS warnings_rtree "
+                               "USING rtree(seq, min_x, max_x, min_y, max_y)")
+            return True
+        except sqlite3.OperationalError as e:
+            logging.warning(f"[LocalStore] SQLite R-tree를 사용할 수 없어 (x, y) 인덱스를 사용합니다: {e}")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS warnings_xy ON warnings (x, y)")
+            return False
+
+    def ensure_indexes(self):
+        """스키마와 인덱스는 생성자에서 만듭니다 (MongoWarningRepository와 같은 인터페이스)."""
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # --- 저장 ---
+
+    def insert(self, doc):
+        """경고 문서를 저장하고 _id를 반환합니다 (insert_one처럼 doc에 _id를 채움)."""
+        doc.setdefault("_id", ObjectId())
+        coordinates = (doc.get("location") or {}).get("coordinates")
+        x, y = coordinates if coordinates else (None, None)
+        detections = doc.get("detections") or []
+        body = {key: value for key, value in doc.items() if key not in COLUMN_FIELDS}
+        with self._lock, self._conn:
+            seq = self._conn.execute(
+                "INSERT INTO warnings (id, timestamp, x, y, image_path, raw_image_path, max_confidence, body, "
+                "model_version) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (str(doc["_id"]), _time_text(doc["timestamp"]), x, y, doc.get("image_path"), doc.get("raw_image_path"),
+                 max((d.get("confidence", 0) for d in detections), default=None),
+                 json.dumps(body, ensure_ascii=False, default=str), (doc.get("model") or {}).get("version"))).lastrowid
+            self._insert_detections(seq, detections)
+            if x is not None and self.has_rtree:
+                self._conn.execute("INSERT INTO warnings_rtree VALUES (?, ?, ?, ?, ?)", (seq, x, x, y, y))
+        return doc["_id"]
+
+    def _insert_detections(self, seq, detections):
+        self._conn.executemany("INSERT INTO warning_detections (seq, class_name, confidence) VALUES (?, ?, ?)",
+                               [(seq, d.get("class_name"), d.get("confidence")) for d in detections])
+
+    def bulk_update(self, updates):
+        """[(_id, {필드: 값})]를 한 트랜잭션으로 반영합니다. 바뀐 경고는 MongoDB로 다시 동기화합니다."""
+        if not updates:
+            return
+        with self._lock, self._conn:
+            for _id, fields in updates:
+                row = self._conn.execute("SELECT seq, body FROM warnings WHERE id = ?", (str(_id),)).fetchone()
+                if row is None:
+                    continue
+                body = json.loads(row["body"])
+                body.update({key: value for key, value in fields.items() if key not in COLUMN_FIELDS})
+                detections = body.get("detections") or []
+                self._conn.execute(
+                    "UPDATE warnings SET body = ?, max_confidence = ?, model_version = ?, synced = 0, rev = rev + 1 "
+                    "WHERE seq = ?",
+                    (json.dumps(body, ensure_ascii=False, default=str),
+                     max((d.get("confidence", 0) for d in detections), default=None),
+                     (body.get("model") or {}).get("version"), row["seq"]))
+                if "detections" in fields:
+                    self._conn.execute("DELETE FROM warning_detections WHERE seq = ?", (row["seq"],))
+                    self._insert_detections(row["seq"], detections)
+
+    def delete(self, ids):
+        ids = [str(_id) for _id in ids]
+        if not ids:
+            return
+        marks = ",".join("?" * len(ids))
+        seqs = f"SELECT seq FROM warnings WHERE id IN ({marks})"
+        with self._lock, self._conn:
+            if self.track_deletions:
+                self._conn.execute(f"INSERT OR IGNORE INTO warning_deletions (id) "
+                                   f"SELECT id FROM warnings WHERE id IN ({marks})", ids)
+            if self.has_rtree:
+                self._conn.execute(f"DELETE FROM warnings_rtree WHERE seq IN ({seqs})", ids)
+            self._conn.execute(f"DELETE FROM warning_detections WHERE seq IN ({seqs})", ids)
+            self._conn.execute(f"DELETE FROM warnings WHERE id IN ({marks})", ids)
+
+    # --- 조회 ---
+
+    def _to_doc(self, row):
+        doc = json.loads(row["body"])
+        doc["_id"] = ObjectId(row["id"])
+        doc["timestamp"] = datetime.strptime(row["timestamp"], TIME_FORMAT)
+        if row["x"] is not None:
+            doc["location"] = {"type": "Point", "coordinates": [row["x"], row["y"]]}
+        doc["image_path"] = row["image_path"]
+        if row["raw_image_path"] is not None:
+            doc["raw_image_path"] = row["raw_image_path"]
+        return doc
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return [self._to_doc(row) for row in self._conn.execute(sql, params)]
+
+    def _bbox_clause(self, min_x, min_y, max_x, max_y):
+        """w.x, w.y가 범위 안에 있는 조건. R-tree로 후보를 좁힌 뒤 원래 좌표로 다시 확인합니다 (R-tree는 32비트 실수)."""
+        exact = "w.x BETWEEN ? AND ? AND w.y BETWEEN ? AND ?"
+        params = [min_x, max_x, min_y, max_y]
+        if not self.has_rtree:
+            return exact, params
+        candidates = ("w.seq IN (SELECT seq FROM warnings_rtree "
+                      "WHERE max_x >= ? AND min_x <= ? AND max_y >= ? AND min_y <= ?)")
+        return f"{candidates} AND {exact}", params + params
+
+    def _where(self, filters):
+        """parse_filters()의 결과를 SQL 조건과 인자로 바꿉니다."""
+        filters = filters or {}
+        clauses, params = [], []
+        if "bbox" in filters:
+            clause, clause_params = self._bbox_clause(*filters["bbox"])
+            clauses.append(clause)
+            params += clause_params
+        if "since" in filters:
+            clauses.append("w.timestamp >= ?")
+            params.append(_time_text(filters["since"]))
+        if "until" in filters:
+            clauses.append("w.timestamp < ?")
+            params.append(_time_text(filters["until"]))
+        detection = []
+        if filters.get("classes"):
+            detection.append(f"d.class_name IN ({','.join('?' * len(filters['classes']))})")
+            params += list(filters["classes"])
+        if "min_confidence" in filters:
+            detection.append("d.confidence >= ?")
+            params.append(filters["min_confidence"])
+        if detection:
+            # 같은 감지가 클래스와 신뢰도 조건을 모두 만족해야 합니다 (Mongo의 $elemMatch와 같음).
+            clauses.append(f"EXISTS (SELECT 1 FROM warning_detections d WHERE d.seq = w.seq AND {' AND '.join(detection)})")
+        return clauses, params
+
+    def _fetch(self, filters, after, limit):
+        """(timestamp, _id) 내림차순으로 after 다음의 경고를 limit개 읽습니다."""
+        clauses, params = self._where(filters)
+        if after is not None:
+            clauses.append("(w.timestamp, w.id) < (?, ?)")
+            params += [_time_text(after[0]), str(after[1])]
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return self._query(f"SELECT w.* FROM warnings w {where} ORDER BY w.timestamp DESC, w.id DESC LIMIT ?",
+                           params + [limit])
+
+    def page(self, cursor=None, limit=DEFAULT_PAGE_SIZE, filters=None):
+        limit = clamp_page_size(limit)
+        docs = self._fetch(filters, decode_cursor(cursor) if cursor else None, limit + 1)
+        next_cursor = encode_cursor(docs[limit - 1]) if len(docs) > limit else None
+        return docs[:limit], next_cursor
+
+    def iter_warnings(self, filters=None):
+        # 잠금을 쥔 채로 내보내지 않도록 ITER_BATCH개씩 끊어서 읽습니다.
+        after = None
+        while True:
+            docs = self._fetch(filters, after, ITER_BATCH)
+            yield from docs
+            if len(docs) < ITER_BATCH:
+                return
+            after = (docs[-1]["timestamp"], docs[-1]["_id"])
+
+    def find_near(self, x, y, max_distance):
+        clause, params = self._bbox_clause(x - max_distance, y - max_distance, x + max_distance, y + max_distance)
+        docs = self._query(f"SELECT w.* FROM warnings w WHERE {clause} "
+                           "AND (w.x - ?) * (w.x - ?) + (w.y - ?) * (w.y - ?) <= ? "
+                           "ORDER BY (w.x - ?) * (w.x - ?) + (w.y - ?) * (w.y - ?) LIMIT 1",
+                           params + [x, x, y, y, max_distance ** 2, x, x, y, y])
+        return docs[0] if docs else None
+
+    def latest_unlocated(self):
+        docs = self._query("SELECT w.* FROM warnings w WHERE w.x IS NULL ORDER BY w.timestamp DESC LIMIT 1")
+        return docs[0] if docs else None
+
+    def oldest(self, limit, before=None):
+        if before is None:
+            return self._query("SELECT w.* FROM warnings w ORDER BY w.timestamp, w.id LIMIT ?", (limit,))
+        return self._query("SELECT w.* FROM warnings w WHERE w.timestamp < ? ORDER BY w.timestamp, w.id LIMIT ?",
+                           (_time_text(before), limit))
+
+    def stale(self, model_version, limit, near=None):
+        """다른 모델 버전(또는 버전 없음)으로 분석된 경고. near=(x, y)이면 위치가 있는 경고를 가까운 순으로."""
+        condition = "w.model_version IS NOT ? AND w.image_path IS NOT NULL"
+        if near is None:
+            return self._query(f"SELECT w.* FROM warnings w WHERE {condition} "
+                               "ORDER BY w.timestamp DESC, w.id DESC LIMIT ?", (model_version, limit))
+        x, y = near
+        return self._query(f"SELECT w.* FROM warnings w WHERE {condition} AND w.x IS NOT NULL "
+                           "ORDER BY (w.x - ?) * (w.x - ?) + (w.y - ?) * (w.y - ?) LIMIT ?",
+                           (model_version, x, x, y, y, limit))
+
+    def references_image(self, image_path):
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM warnings WHERE image_path = ? OR raw_image_path = ? LIMIT 1",
+                                      (image_path, image_path)).fetchone() is not None
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM warnings").fetchone()[0]
+
+    def heatmap_cells(self, cell_size, bbox=None, class_name=None):
+        """격자 칸별 경고 수와 최대 신뢰도를 바로 집계합니다 (WarningHeatmap.cells()와 같은 형식)."""
+        clauses, params = ["w.x IS NOT NULL"], []
+        if bbox:
+            # Mongo 히트맵과 같이 bbox에 걸치는 칸 전체를 셉니다.
+            min_x, min_y, max_x, max_y = bbox
+            clause, clause_params = self._bbox_clause(
+                math.floor(min_x / cell_size) * cell_size, math.floor(min_y / cell_size) * cell_size,
+                (math.floor(max_x / cell_size) + 1) * cell_size, (math.floor(max_y / cell_size) + 1) * cell_size)
+            clauses.append(clause)
+            params += clause_params
+        if class_name:
+            clauses.append("EXISTS (SELECT 1 FROM warning_detections d WHERE d.seq = w.seq AND d.class_name = ?)")
+            params.append(class_name)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT cell(w.x, ?) AS cx, cell(w.y, ?) AS cy, COUNT(*) AS count, MAX(w.max_confidence) AS max_confidence "
+                f"FROM warnings w WHERE {' AND '.join(clauses)} GROUP BY cx, cy",
+                [cell_size, cell_size] + params).fetchall()
+        return [{"x": row["cx"] * cell_size, "y": row["cy"] * cell_size,
+                 "count": row["count"], "max_confidence": row["max_confidence"]} for row in rows]
+
+    # --- MongoDB 동기화 (WarningSyncThread) ---
+
+    def unsynced(self, limit):
+        """아직 MongoDB로 옮기지 않은 경고를 저장한 순서대로 (문서, 수정 번호) 목록으로 반환합니다."""
+        with self._lock:
+            rows = self._conn.execute("SELECT w.* FROM warnings w WHERE w.synced = 0 ORDER BY w.seq LIMIT ?",
+                                      (limit,)).fetchall()
+            return [(self._to_doc(row), row["rev"]) for row in rows]
+
+    def mark_synced(self, revisions):
+        """
+        [(_id, 수정 번호)]의 경고를 동기화됨으로 표시합니다.
+        unsynced()로 읽은 뒤 재채점 등으로 다시 바뀐 경고(수정 번호가 다름)는 미동기화로 남겨 다음에 다시 보냅니다.
+        """
+        if not revisions:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany("UPDATE warnings SET synced = 1 WHERE id = ? AND rev = ?",
+                                   [(str(_id), rev) for _id, rev in revisions])
+
+    def pending_count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM warnings WHERE synced = 0").fetchone()[0]
+
+    def pending_deletions(self, limit):
+        """로컬에서 삭제했지만 아직 MongoDB에서 지우지 않은 경고 _id 목록."""
+        with self._lock:
+            return [row["id"] for row in self._conn.execute("SELECT id FROM warning_deletions LIMIT ?", (limit,))]
+
+    def clear_deletions(self, ids):
+        ids = [str(_id) for _id in ids]
+        if not ids:
+            return
+        with self._lock, self._conn:
+            self._conn.execute(f"DELETE FROM warning_deletions WHERE id IN ({','.join('?' * len(ids))})", ids)
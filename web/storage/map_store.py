@@ -0,0 +1,251 @@
+import logging
+import threading
+import zlib
+from collections import OrderedDict
+from datetime import datetime
+
+import gridfs
+import numpy as np
+import pymongo
+
+import config
+
+# 지도 이력 저장 설정 (config.py에서 덮어쓸 수 있음)
+MAP_KEYFRAME_INTERVAL = getattr(config, 'MAP_KEYFRAME_INTERVAL', 10)       # 키프레임 사이 최대 delta 버전 수
+MAP_DELTA_MAX_RATIO = getattr(config, 'MAP_DELTA_MAX_RATIO', 0.25)         # 바뀐 셀 비율이 이보다 크면 키프레임으로 저장
+MAP_INLINE_LIMIT = getattr(config, 'MAP_INLINE_LIMIT', 4 * 1024 ** 2)      # 압축 결과가 이보다 크면 GridFS에 저장
+MAP_KEYFRAME_CACHE = 8                                                     # 메모리에 올려 둘 키프레임 격자 수
+
+
+def grid_from_map(map_data):
+    """ROS OccupancyGrid 형태의 딕셔너리(data: -1~100 정수 목록)를 (height, width) int8 배열로 바꿉니다."""
+    grid = np.asarray(map_data['data'], dtype=np.int8)
+    return grid.reshape(map_data['height'], map_data['width'])
+
+
+def map_info(map_data):
+    return {
+        'width': int(map_data['width']),
+        'height': int(map_data['height']),
+        'resolution': float(map_data['resolution']),
+        'origin': {'x': float(map_data['origin']['x']), 'y': float(map_data['origin']['y'])},
+    }
+
+
+def map_to_dict(info, grid):
+    """ROS 스레드의 지도 딕셔너리와 같은 형태 (width, height, resolution, origin, data)로 되돌립니다."""
+    return dict(info, data=grid.ravel().tolist())
+
+
+def encode_keyframe(grid):
+    return zlib.compress(grid.tobytes(), 6)
+
+
+def decode_keyframe(payload, info):
+    return np.frombuffer(zlib.decompress(payload), dtype=np.int8).reshape(info['height'], info['width'])
+
+
+def encode_delta(base, grid):
+    """base 대비 바뀐 셀의 (위치, 값)만 압축합니다. 반환값: (payload, 바뀐 셀 수)"""
+    indices = np.flatnonzero(base != grid).astype('<u4')
+    values = grid.ravel()[indices]
+    return zlib.compress(indices.tobytes() + values.tobytes(), 6), len(indices)
+
+
+def apply_delta(base, payload, count):
+    raw = zlib.decompress(payload)
+    indices = np.frombuffer(raw[:4 * count], dtype='<u4')
+    values = np.frombuffer(raw[4 * count:], dtype=np.int8)
+    grid = base.copy()
+    grid.ravel()[indices] = values
+    return grid
+
+
+def overlap(info_a, grid_a, info_b, grid_b):
+    """
+    해상도가 같은 두 지도를 원점 기준으로 맞춰 겹치는 영역만 잘라 반환합니다.
+    탐사 중 지도 크기/원점이 바뀌어도 서로 다른 순찰 결과를 비교할 수 있습니다.
+    """
+    if abs(info_a['resolution'] - info_b['resolution']) > 1e-9:
+        raise ValueError("해상도가 다른 지도는 비교할 수 없습니다.")
+    resolution = info_a['resolution']
+    # b의 (0, 0) 셀이 a 격자에서 몇 번째 셀인지
+    dx = int(round((info_b['origin']['x'] - info_a['origin']['x']) / resolution))
+    dy = int(round((info_b['origin']['y'] - info_a['origin']['y']) / resolution))
+    x0, y0 = max(0, dx), max(0, dy)
+    x1 = min(info_a['width'], dx + info_b['width'])
+    y1 = min(info_a['height'], dy + info_b['height'])
+    if x1 <= x0 or y1 <= y0:
+        empty = np.empty((0, 0), dtype=np.int8)
+        return empty, empty
+    return grid_a[y0:y1, x0:x1], grid_b[y0 - dy:y1 - dy, x0 - dx:x1 - dx]
+
+
+class MapStore:
+    """
+    탐사(run)별 지도 이력을 압축 바이너리로 저장합니다.
+    - 키프레임: 전체 격자를 int8로 zlib 압축
+    - delta: 직전 키프레임 대비 바뀐 셀만 저장 (어느 버전이든 키프레임 1개 + delta 1개로 복원)
+    - 지도 크기/원점이 바뀌거나, 변화가 크거나, delta가 MAP_KEYFRAME_INTERVAL개 쌓이면 새 키프레임
+    - 압축 결과가 MAP_INLINE_LIMIT보다 크면 GridFS에 저장하므로 16 MB 문서 제한에 걸리지 않습니다.
+    버전 문서는 maps 컬렉션에 {run_id, version, ...} 형태로 저장됩니다 (이전 방식의 map_data 문서와 공존).
+    """
+    def __init__(self, maps_collection):
+        self.collection = maps_collection
+        self.fs = gridfs.GridFS(maps_collection.database, collection='map_blobs')
+        self._heads = {}
+        self._keyframes = OrderedDict()
+        self._lock = threading.Lock()
+        self._cache_lock = threading.Lock()
+
+    def ensure_indexes(self):
+        self.collection.create_index([("run_id", pymongo.ASCENDING), ("version", pymongo.ASCENDING)], unique=True,
+                                     partialFilterExpression={"run_id": {"$exists": True}})
+
+    # --- 저장 ---
+    def append(self, run_id, map_data, final=False):
+        """
+        지도 한 버전을 추가하고 버전 번호를 반환합니다. 직전 버전과 완전히 같으면 저장하지 않고 None을 반환합니다
+        (final이면 같은 지도라도 마지막 버전 표시를 위해 저장).
+        """
+        grid = grid_from_map(map_data)
+        info = map_info(map_data)
+        with self._lock:
+            head = self._head(run_id)
+            if head and not final and head['info'] == info and np.array_equal(head['grid'], grid):
+                return None
+            version = head['version'] + 1 if head else 0
+            doc = {"run_id": run_id, "version": version, "timestamp": datetime.utcnow(), "final": final}
+            doc.update(info)
+
+            use_keyframe = (head is None or head['info'] != info
+                            or version - head['keyframe_version'] >= MAP_KEYFRAME_INTERVAL)
+            if not use_keyframe:
+                payload, count = encode_delta(head['keyframe_grid'], grid)
+                if count > grid.size * MAP_DELTA_MAX_RATIO:
+                    use_keyframe = True
+                else:
+                    doc.update(kind='delta', keyframe_version=head['keyframe_version'], delta_cells=count)
+            if use_keyframe:
+                payload = encode_keyframe(grid)
+                doc.update(kind='keyframe', keyframe_version=version)
+            doc.update(self._write_payload(payload))
+            doc['stored_bytes'] = len(payload)
+            self.collection.insert_one(doc)
+
+            keyframe_grid = grid if use_keyframe else head['keyframe_grid']
+            self._heads[run_id] = {'version': version, 'info': info, 'grid': grid,
+                                   'keyframe_version': doc['keyframe_version'], 'keyframe_grid': keyframe_grid}
+            if use_keyframe:
+                self._cache_keyframe((run_id, version), grid)
+        logging.info(f"[Map Store] {run_id} v{version} 저장 ({doc['kind']}, {info['width']}x{info['height']}, "
+                     f"{len(payload) / 1024:.1f} KB / 원본 {grid.size / 1024:.1f} KB)")
+        return version
+
+    def close_run(self, run_id):
+        """탐사가 끝나면 메모리에 들고 있던 마지막 상태를 버립니다."""
+        with self._lock:
+            self._heads.pop(run_id, None)
+
+    def _head(self, run_id):
+        """run의 마지막 버전 상태 (메모리에 없으면 DB에서 복원하여 서버 재시작 후에도 이어서 저장)."""
+        head = self._heads.get(run_id)
+        if head is not None:
+            return head
+        version = self.latest_version(run_id)
+        if version is None:
+            return None
+        info, grid, doc = self._load(run_id, version)
+        head = {'version': doc['version'], 'info': info, 'grid': grid, 'keyframe_version': doc['keyframe_version'],
+                'keyframe_grid': self._keyframe(run_id, doc['keyframe_version'])[1]}
+        self._heads[run_id] = head
+        return head
+
+    def _write_payload(self, payload):
+        if len(payload) <= MAP_INLINE_LIMIT:
+            return {"payload": payload}
+        return {"blob_id": self.fs.put(payload)}
+
+    def _read_payload(self, doc):
+        if doc.get("payload") is not None:
+            return bytes(doc["payload"])
+        return self.fs.get(doc["blob_id"]).read()
+
+    # --- 조회 ---
+    def latest_version(self, run_id):
+        last = self.collection.find_one({"run_id": run_id}, {"version": 1}, sort=[("version", pymongo.DESCENDING)])
+        return last['version'] if last else None
+
+    def load(self, run_id, version=None):
+        """지정한 버전(없으면 마지막 버전)을 (info, grid)로 복원합니다. 없으면 None."""
+        if version is None:
+            version = self.latest_version(run_id)
+            if version is None:
+                return None
+        loaded = self._load(run_id, version)
+        return loaded[:2] if loaded else None
+
+    def _load(self, run_id, version):
+        doc = self.collection.find_one({"run_id": run_id, "version": version})
+        if doc is None:
+            return None
+        info = map_info(doc)
+        if doc['kind'] == 'keyframe':
+            grid = self._keyframe(run_id, version, doc)[1]
+        else:
+            base = self._keyframe(run_id, doc['keyframe_version'])[1]
+            grid = apply_delta(base, self._read_payload(doc), doc['delta_cells'])
+        return info, grid, doc
+
+    def _keyframe(self, run_id, version, doc=None):
+        key = (run_id, version)
+        with self._cache_lock:
+            grid = self._keyframes.get(key)
+            if grid is not None:
+                self._keyframes.move_to_end(key)
+                return key, grid
+        if doc is None:
+            doc = self.collection.find_one({"run_id": run_id, "version": version})
+        grid = decode_keyframe(self._read_payload(doc), map_info(doc))
+        self._cache_keyframe(key, grid)
+        return key, grid
+
+    def _cache_keyframe(self, key, grid):
+        grid.setflags(write=False)
+        with self._cache_lock:
+            self._keyframes[key] = grid
+            self._keyframes.move_to_end(key)
+            while len(self._keyframes) > MAP_KEYFRAME_CACHE:
+                self._keyframes.popitem(last=False)
+
+    def list_runs(self):
+        pipeline = [
+            {"$match": {"run_id": {"$exists": True}}},
+            {"$group": {"_id": "$run_id", "started": {"$min": "$timestamp"}, "updated": {"$max": "$timestamp"},
+                        "versions": {"$sum": 1}, "stored_bytes": {"$sum": "$stored_bytes"}, "finished": {"$max": "$final"}}},
+            {"$sort": {"started": pymongo.DESCENDING}},
+        ]
+        return [dict(run_id=run.pop("_id"), **run) for run in self.collection.aggregate(pipeline)]
+
+    def list_versions(self, run_id):
+        projection = {"_id": 0, "payload": 0, "blob_id": 0}
+        return list(self.collection.find({"run_id": run_id}, projection).sort("version", pymongo.ASCENDING))
+
+    def compare(self, a, b):
+        """
+        두 버전 (run_id, version)을 겹치는 영역에서 비교합니다. 격자 전체를 브라우저로 보내지 않고 서버에서 요약만 계산합니다.
+        """
+        loaded_a, loaded_b = self.load(*a), self.load(*b)
+        if loaded_a is None or loaded_b is None:
+            return None
+        grid_a, grid_b = overlap(loaded_a[0], loaded_a[1], loaded_b[0], loaded_b[1])
+        occupied_a, occupied_b = grid_a > 0, grid_b > 0
+        known_a, known_b = grid_a >= 0, grid_b >= 0
+        return {
+            "overlap_cells": int(grid_a.size),
+            "changed_cells": int(np.count_nonzero(grid_a != grid_b)),
+            "newly_occupied": int(np.count_nonzero(~occupied_a & occupied_b & known_a)),
+            "newly_free": int(np.count_nonzero(occupied_a & (grid_b == 0))),
+            "newly_known": int(np.count_nonzero(~known_a & known_b)),
+            "resolution": loaded_a[0]['resolution'],
+        }
@@ -0,0 +1,162 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+import config
+
+from web.storage.map_store import grid_from_map, map_info
+
+# 지도 타일 설정 (config.py에서 덮어쓸 수 있음)
+MAP_TILE_SIZE = getattr(config, 'MAP_TILE_SIZE', 256)             # 타일 한 변의 픽셀 수
+MAP_STORED_TILE_MAPS = getattr(config, 'MAP_STORED_TILE_MAPS', 4)  # 타일을 메모리에 들고 있을 저장 지도 수
+
+# map_renderer.js의 기존 색상과 같음 (회색: 알 수 없음, 흰색: 비어 있음, 검은색: 점유)
+UNKNOWN, FREE, OCCUPIED = 128, 255, 0
+
+
+def render_cells(cells, factor):
+    """
+    지도 셀(이미지 방향, 위쪽이 +y)을 factor배 축소한 회색조 이미지로 그립니다.
+    축소할 때는 블록 안에 점유 셀이 하나라도 있으면 점유, 아니면 빈 셀이 있으면 빈 곳으로 칠해 얇은 벽이 사라지지 않게 합니다.
+    """
+    if factor > 1:
+        height, width = cells.shape
+        pad_h, pad_w = -height % factor, -width % factor
+        if pad_h or pad_w:
+            cells = np.pad(cells, ((0, pad_h), (0, pad_w)), constant_values=-1)
+        blocks = cells.reshape(cells.shape[0] // factor, factor, cells.shape[1] // factor, factor)
+        occupied = (blocks > 0).any(axis=(1, 3))
+        free = (blocks == 0).any(axis=(1, 3))
+    else:
+        occupied = cells > 0
+        free = cells == 0
+    image = np.full(occupied.shape, UNKNOWN, dtype=np.uint8)
+    image[free] = FREE
+    image[occupied] = OCCUPIED
+    return image
+
+
+class MapTiles:
+    """
+    지도 하나(실시간 지도 또는 저장된 버전)의 다중 해상도 PNG 타일 캐시.
+    level 0은 셀 1개 = 1픽셀이고, level이 1 오를 때마다 2배씩 축소합니다 (지도 전체가 타일 1장에 들어가는 level까지).
+    타일은 요청될 때 그려서 캐시하고, update()로 지도가 바뀌면 바뀐 셀이 포함된 타일만 모든 level에서 버립니다.
+    ETag는 PNG 내용의 해시이므로 바뀌지 않은 타일은 브라우저가 304로 재사용합니다.
+    """
+    def __init__(self, tile_size=MAP_TILE_SIZE):
+        self.tile_size = tile_size
+        self.info = None
+        self.generation = 0
+        self._image = None   # 이미지 방향(위가 +y)으로 뒤집은 셀 배열
+        self._tiles = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_grid(cls, info, grid):
+        tiles = cls()
+        tiles.update(info, grid)
+        return tiles
+
+    def update(self, info, grid):
+        """
+        새 격자로 바꾸고, 다시 그려야 하는 level 0 타일 목록 [(tx, ty), ...]을 반환합니다.
+        크기나 원점이 바뀌었으면 모든 타일을 버리고 None을 반환합니다.
+        """
+        image = np.ascontiguousarray(grid[::-1])
+        with self._lock:
+            previous, previous_info = self._image, self.info
+            self._image, self.info = image, info
+            self.generation += 1
+            if previous is None or previous_info != info:
+                self._tiles.clear()
+                return None
+            dirty = self._changed_tiles(previous != image)
+            for level in range(self.levels):
+                stale = {(tx >> level, ty >> level) for tx, ty in dirty}
+                for tx, ty in stale:
+                    self._tiles.pop((level, tx, ty), None)
+            return dirty
+
+    def _changed_tiles(self, changed):
+        size = self.tile_size
+        height, width = changed.shape
+        rows = np.logical_or.reduceat(changed, np.arange(0, height, size), axis=0)
+        blocks = np.logical_or.reduceat(rows, np.arange(0, width, size), axis=1)
+        return [(int(tx), int(ty)) for ty, tx in zip(*np.nonzero(blocks))]
+
+    @property
+    def levels(self):
+        if self.info is None:
+            return 0
+        longest = max(self.info['width'], self.info['height'])
+        levels = 1
+        while longest > self.tile_size << (levels - 1):
+            levels += 1
+        return levels
+
+    def meta(self):
+        with self._lock:
+            if self.info is None:
+                return None
+            return dict(self.info, tile_size=self.tile_size, levels=self.levels, generation=self.generation)
+
+    def tile(self, level, tx, ty):
+        """(PNG 바이트, ETag)를 반환합니다. 범위를 벗어나면 None."""
+        key = (level, tx, ty)
+        with self._lock:
+            cached = self._tiles.get(key)
+            if cached is not None:
+                return cached
+            image = self._image
+            if image is None or not 0 <= level < self.levels:
+                return None
+            factor = 1 << level
+            span = self.tile_size * factor
+            height, width = image.shape
+            if tx < 0 or ty < 0 or tx * span >= width or ty * span >= height:
+                return None
+            generation = self.generation
+        cells = image[ty * span:(ty + 1) * span, tx * span:(tx + 1) * span]
+        ok, png = cv2.imencode('.png', render_cells(cells, factor), [cv2.IMWRITE_PNG_COMPRESSION, 3])
+        if not ok:
+            return None
+        rendered = (png.tobytes(), hashlib.sha1(png).hexdigest())
+        with self._lock:
+            # 그리는 동안 지도가 바뀌었으면 캐시에 넣지 않습니다 (다음 요청에서 새 지도로 다시 그림).
+            if generation == self.generation:
+                self._tiles[key] = rendered
+        return rendered
+
+
+class StoredMapTiles:
+    """MapStore에 저장된 지도 버전의 타일. 최근에 본 MAP_STORED_TILE_MAPS개 버전만 메모리에 둡니다."""
+    def __init__(self, map_store, capacity=MAP_STORED_TILE_MAPS):
+        self.map_store = map_store
+        self.capacity = capacity
+        self._maps = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, run_id, version):
+        key = (run_id, version)
+        with self._lock:
+            tiles = self._maps.get(key)
+            if tiles is not None:
+                self._maps.move_to_end(key)
+                return tiles
+        loaded = self.map_store.load(run_id, version)
+        if loaded is None:
+            return None
+        tiles = MapTiles.from_grid(*loaded)
+        with self._lock:
+            self._maps[key] = tiles
+            while len(self._maps) > self.capacity:
+                self._maps.popitem(last=False)
+        return tiles
+
+
+def update_from_map(tiles, map_data):
+    """ROS 지도 메시지 딕셔너리로 MapTiles를 갱신합니다."""
+    return tiles.update(map_info(map_data), grid_from_map(map_data))
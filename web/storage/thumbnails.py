@@ -0,0 +1,148 @@
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+import cv2
+
+import config
+
+# 경고 목록에 표시할 썸네일 설정 (config.py에서 덮어쓸 수 있음)
+THUMBNAIL_MAX_SIDE = getattr(config, 'THUMBNAIL_MAX_SIDE', 240)
+THUMBNAIL_FORMAT = getattr(config, 'THUMBNAIL_FORMAT', 'webp')  # 'webp' 또는 'jpg'
+THUMBNAIL_QUALITY = getattr(config, 'THUMBNAIL_QUALITY', 70)
+THUMBNAIL_CACHE_BYTES = getattr(config, 'THUMBNAIL_CACHE_BYTES', 32 * 1024 * 1024)
+
+MIMETYPES = {'webp': 'image/webp', 'jpg': 'image/jpeg'}
+
+
+def thumbnail_path(image_path, fmt=THUMBNAIL_FORMAT):
+    """원본 옆에 저장할 썸네일 경로: <이름>.jpg -> <이름>.thumb.webp"""
+    stem, _ = os.path.splitext(image_path)
+    return f"{stem}.thumb.{fmt}"
+
+
+def encode_thumbnail(image, max_side=THUMBNAIL_MAX_SIDE, fmt=THUMBNAIL_FORMAT, quality=THUMBNAIL_QUALITY):
+    """
+    BGR 이미지를 긴 변이 max_side 이하가 되도록 줄여 인코딩합니다.
+    WebP 인코딩을 지원하지 않는 OpenCV 빌드에서는 JPEG로 대신 저장합니다.
+    반환값: (바이트, 실제 형식)
+    """
+    height, width = image.shape[:2]
+    scale = max_side / max(height, width)
+    if scale < 1:
+        image = cv2.resize(image, (max(1, round(width * scale)), max(1, round(height * scale))),
+                           interpolation=cv2.INTER_AREA)
+    if fmt == 'webp':
+        ok, buffer = cv2.imencode('.webp', image, [cv2.IMWRITE_WEBP_QUALITY, quality])
+        if ok:
+            return buffer.tobytes(), 'webp'
+    ok, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise ValueError("썸네일 인코딩에 실패했습니다.")
+    return buffer.tobytes(), 'jpg'
+
+
+def write_thumbnail(original_path, image=None):
+    """
+    원본 옆에 썸네일 파일을 만들고 경로를 반환합니다.
+    저장 시점에는 이미 메모리에 있는 image를 넘기면 원본을 다시 디코딩하지 않습니다.
+    """
+    if image is None:
+        image = cv2.imread(original_path, cv2.IMREAD_COLOR)
+        if image is None:
+            raise FileNotFoundError(f"원본 이미지를 읽을 수 없습니다: {original_path}")
+    data, fmt = encode_thumbnail(image)
+    path = thumbnail_path(original_path, fmt)
+    # 다른 요청이 반쯤 쓴 파일을 읽지 않도록 임시 파일에 쓴 뒤 교체합니다.
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return path
+
+
+class Thumbnail:
+    __slots__ = ('data', 'mimetype', 'etag')
+
+    def __init__(self, data, mimetype):
+        self.data = data
+        self.mimetype = mimetype
+        # 내용 해시를 그대로 강한 ETag로 사용합니다.
+        self.etag = hashlib.sha1(data).hexdigest()
+
+
+class ThumbnailCache:
+    """
+    썸네일 바이트를 메모리에 올려 두는 LRU 캐시 (전체 크기 max_bytes 이하).
+    없으면 원본 옆의 썸네일 파일을 읽고, 파일도 없으면 그 자리에서 만들어 저장합니다.
+    resolve(image_path)는 static 기준 경로를 경고 이미지 저장소 안의 절대 경로로 바꾸고, 저장소 밖이면 None을 반환합니다
+    (ImageStore.absolute_path). 저장소 밖의 static 파일(js, css 등)은 썸네일을 만들거나 보내지 않습니다.
+    """
+    def __init__(self, resolve, max_bytes=THUMBNAIL_CACHE_BYTES):
+        self._resolve = resolve
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def resolve(self, image_path):
+        """경고 이미지의 절대 경로. 경고 이미지 저장소 밖을 가리키거나 썸네일 파일이면 None."""
+        if '.thumb.' in os.path.basename(image_path):
+            return None
+        return self._resolve(image_path)
+
+    def get(self, image_path):
+        """썸네일을 반환합니다. 원본이 없거나 이미지로 읽을 수 없으면 None."""
+        with self._lock:
+            thumbnail = self._entries.get(image_path)
+            if thumbnail is not None:
+                self._entries.move_to_end(image_path)
+                self.hits += 1
+                return thumbnail
+            self.misses += 1
+
+        original = self.resolve(image_path)
+        if original is None or not os.path.isfile(original):
+            return None
+        try:
+            thumbnail = self._load(original)
+        except (OSError, ValueError) as e:
+            # 읽는 사이에 지워졌거나 이미지가 아닌 파일
+            logging.warning(f"[Thumbnail] 썸네일을 만들 수 없습니다: {image_path} ({e})")
+            return None
+        with self._lock:
+            if image_path not in self._entries:
+                self._entries[image_path] = thumbnail
+                self.current_bytes += len(thumbnail.data)
+            while self.current_bytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= len(evicted.data)
+        return thumbnail
+
+    def _load(self, original):
+        for fmt in (THUMBNAIL_FORMAT, 'jpg'):
+            path = thumbnail_path(original, fmt)
+            if os.path.isfile(path):
+                with open(path, 'rb') as f:
+                    return Thumbnail(f.read(), MIMETYPES[fmt])
+        # 저장 시점에 만들지 못한 이미지(이전 데이터 등)는 첫 요청 때 만듭니다.
+        path = write_thumbnail(original)
+        logging.info(f"[Thumbnail] 썸네일 생성: {os.path.basename(path)}")
+        with open(path, 'rb') as f:
+            return Thumbnail(f.read(), MIMETYPES[path.rsplit('.', 1)[1]])
+
+    def discard(self, image_path):
+        """원본이 삭제될 때 캐시에서도 지웁니다."""
+        with self._lock:
+            thumbnail = self._entries.pop(image_path, None)
+            if thumbnail is not None:
+                self.current_bytes -= len(thumbnail.data)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self.current_bytes,
+                    "max_bytes": self.max_bytes, "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,113 @@
+import logging
+import math
+from datetime import datetime
+
+import pymongo
+
+import config
+
+# 히트맵 격자 한 칸의 크기 (odom 좌표 단위, m)
+HEATMAP_CELL_SIZE = getattr(config, 'HEATMAP_CELL_SIZE', 0.5)
+
+
+def _class_key(name):
+    # Mongo 필드 이름에 쓸 수 없는 문자('.', '$')를 바꿉니다.
+    return str(name).replace('.', '_').replace('$', '_')
+
+
+class WarningHeatmap:
+    """
+    경고를 격자 칸별로 미리 집계해 두는 히트맵 (칸마다 경고 수, 최대 신뢰도, 클래스별 경고 수).
+    경고를 저장할 때마다 add()로 해당 칸만 갱신하므로, 분석/지도 오버레이는 warnings 컬렉션을 훑지 않고 이 집계를 읽습니다.
+    보존 정책으로 경고가 지워지면 remove()로 수를 줄입니다 (max_confidence는 지금까지의 최댓값으로 유지).
+    """
+    def __init__(self, heatmap_collection, cell_size=HEATMAP_CELL_SIZE):
+        self.collection = heatmap_collection
+        self.cell_size = cell_size
+
+    def ensure_indexes(self):
+        self.collection.create_index([("cx", pymongo.ASCENDING), ("cy", pymongo.ASCENDING)])
+
+    def cell_of(self, doc):
+        """경고 문서가 속한 칸 (cx, cy). 위치가 없는 경고(odom N/A)는 None."""
+        coordinates = (doc.get("location") or {}).get("coordinates")
+        if not coordinates:
+            return None
+        x, y = coordinates
+        return math.floor(x / self.cell_size), math.floor(y / self.cell_size)
+
+    def _update(self, doc, sign):
+        cell = self.cell_of(doc)
+        if cell is None:
+            return
+        detections = doc.get("detections") or []
+        update = {"$inc": {"count": sign}, "$set": {"updated": datetime.utcnow()}}
+        for name in {d.get("class_name") for d in detections if d.get("class_name")}:
+            update["$inc"][f"classes.{_class_key(name)}"] = sign
+        if sign > 0:
+            update["$max"] = {"max_confidence": max((d.get("confidence", 0) for d in detections), default=0)}
+            update["$setOnInsert"] = {"cx": cell[0], "cy": cell[1]}
+        self.collection.update_one({"_id": f"{cell[0]}:{cell[1]}"}, update, upsert=sign > 0)
+
+    def add(self, doc):
+        """경고 한 건을 집계에 더합니다 (insert 직후 호출)."""
+        self._update(doc, 1)
+
+    def remove(self, doc):
+        """삭제된 경고를 집계에서 뺍니다. 경고가 없는 칸은 지웁니다."""
+        self._update(doc, -1)
+        cell = self.cell_of(doc)
+        if cell is not None:
+            self.collection.delete_one({"_id": f"{cell[0]}:{cell[1]}", "count": {"$lte": 0}})
+
+    def cells(self, bbox=None, class_name=None):
+        """
+        히트맵 칸 목록 [{x, y, count, max_confidence}] (x, y는 칸의 왼쪽 아래 좌표).
+        class_name을 주면 그 클래스의 경고 수만 셉니다.
+        """
+        query = {}
+        if bbox:
+            min_x, min_y, max_x, max_y = bbox
+            query = {"cx": {"$gte": math.floor(min_x / self.cell_size), "$lte": math.floor(max_x / self.cell_size)},
+                     "cy": {"$gte": math.floor(min_y / self.cell_size), "$lte": math.floor(max_y / self.cell_size)}}
+        count_field = f"classes.{_class_key(class_name)}" if class_name else "count"
+        if class_name:
+            query[count_field] = {"$gt": 0}
+        projection = {"_id": 0, "cx": 1, "cy": 1, "count": 1, "max_confidence": 1, "classes": 1}
+        cells = []
+        for cell in self.collection.find(query, projection):
+            count = cell.get("classes", {}).get(_class_key(class_name), 0) if class_name else cell.get("count", 0)
+            cells.append({"x": cell["cx"] * self.cell_size, "y": cell["cy"] * self.cell_size,
+                          "count": count, "max_confidence": cell.get("max_confidence")})
+        return cells
+
+    def rebuild(self, warning_repository):
+        """경고 저장소 전체로 집계를 다시 만듭니다 (처음 도입할 때 또는 집계가 어긋났을 때 한 번)."""
+        self.collection.delete_many({})
+        rebuilt = 0
+        for doc in warning_repository.iter_warnings():
+            if self.cell_of(doc) is None:
+                continue
+            self.add(doc)
+            rebuilt += 1
+        logging.info(f"[Heatmap] 경고 {rebuilt}건으로 히트맵 집계를 다시 만들었습니다.")
+        return rebuilt
+
+
+class LocalWarningHeatmap:
+    """
+    내장 경고 저장소(LocalWarningStore)용 히트맵.
+    위치가 R-tree 색인에 있어 요청할 때 바로 집계해도 빠르므로 따로 집계를 유지하지 않습니다 (add/remove는 할 일 없음).
+    """
+    def __init__(self, local_store, cell_size=HEATMAP_CELL_SIZE):
+        self.store = local_store
+        self.cell_size = cell_size
+
+    def add(self, doc):
+        pass
+
+    def remove(self, doc):
+        pass
+
+    def cells(self, bbox=None, class_name=None):
+        return self.store.heatmap_cells(self.cell_size, bbox, class_name)
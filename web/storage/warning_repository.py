@@ -0,0 +1,103 @@
+"""
+경고 저장소 인터페이스.
+
+경고를 저장/조회하는 코드(이미지 스레드, 목록/내보내기 API, 이미지 정리 스레드)는 MongoDB 컬렉션을 직접 쓰지 않고
+아래 메서드를 가진 저장소 객체를 사용합니다. 구현은 두 가지입니다.
+- MongoWarningRepository : warnings 컬렉션 (기존 방식)
+- LocalWarningStore      : 내장 SQLite 파일 (web/storage/local_warning_store.py, MongoDB 없이 단독 배포할 때)
+
+    insert(doc)                          경고 문서를 저장하고 _id를 반환
+    find_near(x, y, max_distance)        (x, y) 근처에 저장된 경고 (위치 기반 중복 저장 방지)
+    latest_unlocated()                   위치(odom)가 없는 가장 최근 경고
+    page(cursor, limit, filters)         목록 한 페이지 -> (문서 목록, 다음 커서)  [keyset 페이지네이션]
+    iter_warnings(filters)               조건에 맞는 경고 전체를 최신순으로 (내보내기용, 조금씩 읽음)
+    oldest(limit, before)                가장 오래된 경고부터 (보존 기간/용량 정리용)
+    stale(model_version, limit, near)    다른 모델 버전으로 분석된 경고 (최신순, near=(x, y)이면 가까운 순) [재채점용]
+    bulk_update(updates)                 [(_id, {필드: 값})]를 한 번에 반영
+    delete(ids), references_image(path), count()      references_image는 image_path와 raw_image_path를 모두 확인
+
+filters는 warning_queries.parse_filters()의 결과이고, 커서 형식은 두 구현이 같습니다.
+"""
+import pymongo
+
+from web.disconnection_check.warning_queries import (
+    DEFAULT_PAGE_SIZE, LIST_SORT, ensure_indexes, fetch_warning_page, mongo_filter)
+
+# 정리 스레드가 삭제할 경고에서 읽는 필드 (이미지/원본 프레임 경로 + 히트맵 집계에서 빼기 위한 위치/클래스)
+SWEEP_PROJECTION = {"timestamp": 1, "image_path": 1, "raw_image_path": 1, "location": 1,
+                    "detections.class_name": 1, "detections.confidence": 1}
+ITER_BATCH = 500
+
+
+class MongoWarningRepository:
+    """MongoDB warnings 컬렉션을 쓰는 경고 저장소."""
+    kind = 'mongo'
+
+    def __init__(self, warnings_collection):
+        self.collection = warnings_collection
+
+    def ensure_indexes(self):
+        # 위치 기반 중복 저장을 방지하기 위해 2dsphere 인덱스 생성
+        self.collection.create_index([("location", "2dsphere")])
+        # 경고 목록 페이지네이션용 (timestamp, _id) 복합 인덱스 등
+        ensure_indexes(self.collection)
+
+    def insert(self, doc):
+        return self.collection.insert_one(doc).inserted_id
+
+    def find_near(self, x, y, max_distance):
+        query = {
+            "location": {
+                "$near": {
+                    "$geometry": {
+                        "type": "Point",
+                        "coordinates": [x, y]
+                    },
+                    "$maxDistance": max_distance
+                }
+            }
+        }
+        return self.collection.find_one(query)
+
+    def latest_unlocated(self):
+        return self.collection.find_one({"odom.x": "N/A"}, sort=[('timestamp', -1)])
+
+    def page(self, cursor=None, limit=DEFAULT_PAGE_SIZE, filters=None):
+        return fetch_warning_page(self.collection, cursor, limit, filters)
+
+    def iter_warnings(self, filters=None):
+        cursor = self.collection.find(mongo_filter(filters)).sort(LIST_SORT).batch_size(ITER_BATCH)
+        try:
+            yield from cursor
+        finally:
+            cursor.close()
+
+    def oldest(self, limit, before=None):
+        query = {"timestamp": {"$lt": before}} if before is not None else {}
+        return list(self.collection.find(query, SWEEP_PROJECTION)
+                    .sort([("timestamp", pymongo.ASCENDING), ("_id", pymongo.ASCENDING)])
+                    .limit(limit))
+
+    def stale(self, model_version, limit, near=None):
+        query = {"model.version": {"$ne": model_version}, "image_path": {"$ne": None}}
+        if near is None:
+            return list(self.collection.find(query).sort(LIST_SORT).limit(limit))
+        # $near는 위치가 있는 경고만 가까운 순으로 돌려줍니다.
+        query["location"] = {"$near": {"$geometry": {"type": "Point", "coordinates": list(near)}}}
+        return list(self.collection.find(query).limit(limit))
+
+    def bulk_update(self, updates):
+        if not updates:
+            return
+        self.collection.bulk_write([pymongo.UpdateOne({"_id": _id}, {"$set": fields}) for _id, fields in updates],
+                                   ordered=False)
+
+    def delete(self, ids):
+        self.collection.delete_many({"_id": {"$in": list(ids)}})
+
+    def references_image(self, image_path):
+        query = {"$or": [{"image_path": image_path}, {"raw_image_path": image_path}]}
+        return self.collection.count_documents(query, limit=1) > 0
+
+    def count(self):
+        return self.collection.estimated_document_count()
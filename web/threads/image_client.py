@@ -1,20 +1,23 @@
 import base64
-import json
 import logging
 import threading
 import time
-import websocket
-import numpy as np
 import cv2
 from ultralytics import YOLO
 from datetime import datetime
-import os
-import eventlet
 import torch
 
 import config
 
-from web.config import DB_connect
+from openCV.frame_source import open_source
+from openCV.frame_trace import FrameTracer
+from web.storage.image_store import ImageStoreFull
+from web.disconnection_check.inference import inference_settings, model_stamp
+
+# 재채점용 원본 프레임 저장 설정 (config.py에서 덮어쓸 수 있음)
+# 원본 프레임은 경고마다 표시용 이미지와 함께 저장되어 이미지 저장소 용량(IMAGE_STORE_MAX_BYTES)을 같이 씁니다.
+RAW_FRAME_JPEG_QUALITY = getattr(config, 'RAW_FRAME_JPEG_QUALITY', 75)  # 원본 프레임을 다시 저장할 JPEG 품질 (0이면 저장하지 않음)
+RAW_FRAME_MAX_SIDE = getattr(config, 'RAW_FRAME_MAX_SIDE', getattr(config, 'YOLO_IMG_SIZE', 640))  # 긴 변이 이보다 크면 줄여서 저장
 
 # --- YOLO 모델 로드 및 설정 ---
 if torch.backends.mps.is_available():
@@ -40,225 +43,327 @@ except Exception as e:
     logging.error(f"[YOLO] 모델 로드 실패: {e}")
     yolo_model = None
 
+# 경고 문서에 남길 모델 정보 (가중치 해시 + 추론 설정). 재채점 스레드는 이 버전이 다른 경고만 다시 분석합니다.
+model_info = None
+if yolo_model is not None:
+    try:
+        model_info = model_stamp(config.YOLO_MODEL_PATH, inference_settings())
+        logging.info(f"[YOLO] 모델 버전: {model_info['version']}")
+    except OSError as e:
+        logging.warning(f"[YOLO] 가중치 파일을 읽을 수 없어 경고에 모델 버전을 기록하지 않습니다: {e}")
+
 
 class ImageClientThread(threading.Thread):
-    def __init__(self, socketio_instance, robot_status, warnings_collection, image_storage_root):
+    def __init__(self, socketio_instance, robot_status, warning_repository, image_store, heatmap=None):
         super().__init__()
         self.daemon = True
         self.socketio = socketio_instance
         self.robot_status = robot_status
-        self.warnings_collection = warnings_collection
-        self.image_storage_root = image_storage_root
+        # 경고 저장소 (MongoDB 또는 내장 SQLite 저장소, web/storage/warning_repository.py 참고)
+        self.warnings = warning_repository
+        self.image_store = image_store
+        # 경고 위치 히트맵 집계 (위치가 있는 경고를 저장할 때마다 갱신)
+        self.heatmap = heatmap
         self.is_running = True
-        self.ws = None
+        self.source = None
         self.host = config.PI_CV_WEBSOCKET_HOST
         self.port = config.PI_CV_WEBSOCKET_PORT
+        # 영상 수신 주소 (기본값은 기존과 같은 WebSocket)
+        self.stream_url = getattr(config, 'PI_CV_STREAM_URL', f"ws://{self.host}:{self.port}")
+        # 카메라의 prefilter 후보 점수가 이 값 이상이면 정밀 추론, 아니면 SAMPLE_EVERY 프레임마다 1장만 추론
+        self.candidate_threshold = getattr(config, 'PREFILTER_CANDIDATE_THRESHOLD', 0.25)
+        self.sample_every = getattr(config, 'PREFILTER_SAMPLE_EVERY', 10)
+        # 점수를 매긴 프레임과 이 프레임의 시각 차이가 이보다 크면 낮은 점수라도 믿지 않고 분석
+        # (프레임 메타데이터에 FPS가 있으면 한 프레임 간격을 대신 사용)
+        self.candidate_max_offset_ms = getattr(config, 'PREFILTER_MAX_OFFSET_MS', 100)
+        self.skipped_since_sample = 0
+        self.analyzed_frames = 0
+        self.skipped_frames = 0
+        # frame_id 기준 구간별 지연 시간 (capture -> ... -> 브라우저 display)
+        self.tracer = FrameTracer()
+        self.trace_log_interval = getattr(config, 'LATENCY_TRACE_LOG_INTERVAL', 60.0)
+        self.last_trace_log = time.time()
+        # 마지막 실시간 추론 시각 (재채점 스레드가 실시간 추론과 겹치지 않도록 확인)
+        self.last_inference_at = 0.0
 
     def run(self):
         # 변수 설정
         frame_counter = 0
         inference_interval = 1
         logging.info("[Image Thread] 이미지 클라이언트 스레드를 시작합니다.")
+        # 수신은 FrameSource가 담당합니다 (지수 백오프 재연결, 최신 프레임 버퍼링, 수신/디코딩 통계).
+        # config.PI_CV_STREAM_URL만 바꾸면 WebSocket 대신 MJPEG(http://)이나 RTSP(rtsp://)로도 받을 수 있습니다.
+        logging.info(f"[Image Thread] 이미지 서버({self.stream_url})에 연결을 시도합니다...")
+        self.source = open_source(self.stream_url, on_status=self.on_source_status)
+        self.source.start()
+
         while self.is_running:
-            try:
-                logging.info("[Image Thread] 이미지 서버에 연결을 시도합니다...")
-                self.ws = websocket.create_connection(f"ws://{self.host}:{self.port}", timeout=5)
-                self.robot_status['pi_cv']['connected'] = True
-                self.robot_status['pi_cv']['status'] = "연결됨"
-                self.socketio.emit('status_update', self.robot_status)
-                logging.info(f"[Image Thread] 이미지 서버 ({self.host}:{self.port})에 연결되었습니다.")
-
-                while self.is_running:
-                    try:
-                        # 1. 원본 메시지(JSON) 수신
-                        raw_message = self.ws.recv()
-                        # 2. JSON 파싱하여 이미지 데이터(base64) 추출
+            # 1. 가장 최근 프레임 수신 (추론이 느리면 중간 프레임은 건너뜀)
+            frame = self.source.read(timeout=5.0)
+            if frame is None:
+                continue
+            frame_id = self.begin_trace(frame)
+            # 2. 웹으로 전달할 이미지 데이터(base64) 추출 (JSON 소스이면 받은 문자열을 그대로 사용)
+            b64_image = frame.b64
+            frame_counter += 1
+            # 3. YOLO 모델이 없으면 원본 이미지만 전송
+            if not yolo_model:
+                self.emit_image(b64_image, frame_id)
+                continue
+
+            # 3. 3프레임마다 이미지 처리 및 YOLO 추론 (prefilter가 후보로 표시한 프레임과 일부 샘플만)
+            if frame_counter % inference_interval == 0 and self.should_analyze(frame.meta):
+                frame_counter = 0
+                try:
+                    # Base64 -> Numpy Array -> OpenCV Image (FrameSource가 필요할 때 한 번만 디코딩)
+                    cv_image = frame.image
+
+                    # YOLO 추론 실행
+                    # cv_image가 None이 아닌 경우에만 추론을 실행합니다.
+                    if cv_image is None:
+                        logging.warning("[Image Thread] 이미지 디코딩 실패, 현재 프레임을 건너뜁니다.")
+                        self.emit_image(b64_image, frame_id) # 원본(아마도 손상된) 이미지를 전송
+                        continue
+                    self.tracer.mark(frame_id, 'decode', frame.decoded_at)
+                    results = yolo_model(cv_image, imgsz=config.YOLO_IMG_SIZE, conf=config.YOLO_CONF_THRES, verbose=False)
+                    self.tracer.mark(frame_id, 'infer')
+                    self.last_inference_at = time.time()
+
+                    # 추론 결과(bounding box)를 원본 이미지에 그리기
+                    annotated_image = results[0].plot()
+
+                    # 'damage' 클래스 검출 여부 확인
+                    damage_detected = False
+                    detected_boxes = []
+                    # object class 검출시 사진 분석 후 DB 저장
+                    for box in results[0].boxes:
+                        # logging.info("[Image Thread] Data Analysising")
+                        if int(box.cls) in damage_class_idxs:
+                            # logging.info("[Image Thread] Damage Detected")
+                            damage_detected = True
+                            detected_boxes.append({
+                                'class_id': int(box.cls),
+                                'class_name': yolo_names.get(int(box.cls), 'Unknown'),
+                                'confidence': float(box.conf),
+                                'box_coords': box.xyxyn.cpu().numpy().tolist(), # 정규화된 좌표
+                                'model_version': model_info['version'] if model_info else None
+                            })
+
+                    # Bounding Box가 그려진 이미지를 Base64로 인코딩
+                    _, buffer = cv2.imencode('.jpg', annotated_image)
+                    annotated_jpeg = buffer.tobytes()
+                    annotated_b64_image = base64.b64encode(annotated_jpeg).decode('utf-8')
+
+                    # damage가 검출되면 DB에 저장 (위치 중복 확인 포함)
+                    if damage_detected and self.warnings is not None:
+                        logging.info("[Image Thread] warning class를 검출했습니다. DB에 이미지 저장을 시도합니다.")
                         try:
-                            data = json.loads(raw_message)
-                            b64_image = data['image']
-                        except (json.JSONDecodeError, KeyError) as e:
-                            logging.warning(f"[Image Thread] 수신한 데이터가 올바른 JSON 형식이 아닙니다: {e}")
-                            continue # 다음 프레임으로 넘어감
-
-                        frame_counter += 1
-                        # 3. YOLO 모델이 없으면 원본 이미지만 전송
-                        if not yolo_model:
-                            self.socketio.emit('new_image', {'image': b64_image})
-                            continue
-
-                        # 3. 3프레임마다 이미지 처리 및 YOLO 추론
-                        if frame_counter % inference_interval == 0:
-                            frame_counter = 0
-                            try:
-                                # Base64 -> Numpy Array -> OpenCV Image
-                                img_bytes = base64.b64decode(b64_image)
-                                np_arr = np.frombuffer(img_bytes, np.uint8)
-                                cv_image = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
-
-                                # YOLO 추론 실행
-                                # cv_image가 None이 아닌 경우에만 추론을 실행합니다.
-                                if cv_image is None:
-                                    logging.warning("[Image Thread] 이미지 디코딩 실패, 현재 프레임을 건너뜁니다.")
-                                    self.socketio.emit('new_image', {'image': b64_image}) # 원본(아마도 손상된) 이미지를 전송
-                                    continue
-                                results = yolo_model(cv_image, imgsz=config.YOLO_IMG_SIZE, conf=config.YOLO_CONF_THRES, verbose=False)
-
-                                # 추론 결과(bounding box)를 원본 이미지에 그리기
-                                annotated_image = results[0].plot()
-
-                                # 'damage' 클래스 검출 여부 확인
-                                damage_detected = False
-                                detected_boxes = []
-                                # object class 검출시 사진 분석 후 DB 저장
-                                for box in results[0].boxes:
-                                    # logging.info("[Image Thread] Data Analysising")
-                                    if int(box.cls) in damage_class_idxs:
-                                        # logging.info("[Image Thread] Damage Detected")
-                                        damage_detected = True
-                                        detected_boxes.append({
-                                            'class_id': int(box.cls),
-                                            'class_name': yolo_names.get(int(box.cls), 'Unknown'),
-                                            'confidence': float(box.conf),
-                                            'box_coords': box.xyxyn.cpu().numpy().tolist() # 정규화된 좌표
-                                        })
-
-                                # Bounding Box가 그려진 이미지를 Base64로 인코딩
-                                _, buffer = cv2.imencode('.jpg', annotated_image)
-                                annotated_b64_image = base64.b64encode(buffer).decode('utf-8')
-
-                                # damage가 검출되면 DB에 저장 (위치 중복 확인 포함)
-                                if DB_connect and damage_detected and self.warnings_collection is not None:
-                                    logging.info("[Image Thread] warning class를 검출했습니다. DB에 이미지 저장을 시도합니다.")
-                                    try:
-                                        # 1. 현재 로봇의 odom 데이터 가져오기
-                                        current_odom = self.robot_status['pi_slam']['last_odom']
-                                        odom_x = current_odom.get('x')
-                                        odom_y = current_odom.get('y')
-
-                                        # 2. odom 데이터가 유효한 숫자인지 확인
-                                        if isinstance(odom_x, (int, float)) and isinstance(odom_y, (int, float)):
-                                            # 3. 현재 위치 근처에 이미 저장된 경고가 있는지 확인 (50cm 반경)
-                                            min_distance_meters = 0.5
-
-                                            query = {
-                                                "location": {
-                                                    "$near": {
-                                                        "$geometry": {
-                                                            "type": "Point",
-                                                            "coordinates": [odom_x, odom_y]
-                                                        },
-                                                        "$maxDistance": min_distance_meters
-                                                    }
-                                                }
-                                            }
-                                            existing_warning = self.warnings_collection.find_one(query)
-
-                                            if existing_warning:
-                                                logging.info(f"[DB] 현재 위치 ({odom_x:.2f}, {odom_y:.2f}) 근처에 이미 경고가 저장되어 있어 중복 저장을 건너뜁니다.")
-                                            else:
-                                                # 4. 중복이 아니면 이미지 파일로 저장하고 DB에는 경로를 저장
-                                                timestamp = datetime.utcnow()
-                                                ts_str = timestamp.strftime('%Y%m%d_%H%M%S_%f')
-                                                class_names = '-'.join(sorted(list(set(d['class_name'] for d in detected_boxes)))) or 'detection'
-                                                filename = f"{ts_str}_{class_names}.jpg"
-
-                                                # web/static/imgs/line_crash/filename.jpg
-                                                absolute_path = os.path.join(self.image_storage_root, filename)
-
-                                                # 이미지 파일 저장
-                                                cv2.imwrite(absolute_path, annotated_image)
-
-                                                # DB에 저장할 문서
-                                                doc = {
-                                                    "timestamp": timestamp,
-                                                    "odom": current_odom,
-                                                    "location": {"type": "Point", "coordinates": [odom_x, odom_y]},
-                                                    "detections": detected_boxes,
-                                                    "image_path": os.path.join('imgs', 'line_crash', filename) # 웹에서 접근할 경로
-                                                }
-                                                self.warnings_collection.insert_one(doc)
-                                                logging.info(f"[DB] 손상 감지: 새로운 위치({odom_x:.2f}, {odom_y:.2f})의 경고를 DB에 저장했습니다 (이미지: {filename}).")
-                                        else:
-                                            # odom 데이터가 유효하지 않을 경우, 시간 기반으로 중복 저장 방지
-                                            na_save_interval_seconds = 100 # 최소 저장 간격 (초) (원래 10초인데 내 컴퓨터 부하 살려줘 이슈로 100초로 변경)
-
-                                            # 'location' 필드가 없는 가장 최근 문서를 찾음
-                                            last_na_warning = self.warnings_collection.find_one(
-                                                {"odom.x": "N/A"},
-                                                sort=[('timestamp', -1)]
-                                            )
-
-                                            should_save = True
-                                            if last_na_warning:
-                                                time_since_last = datetime.utcnow() - last_na_warning['timestamp']
-                                                if time_since_last.total_seconds() < na_save_interval_seconds:
-                                                    should_save = False
-                                                    logging.info(f"[DB] Odom N/A 상태. 마지막 저장 후 {time_since_last.total_seconds():.1f}초 경과. {na_save_interval_seconds}초 내 중복 저장을 방지합니다.")
-
-                                            if should_save:
-                                                logging.warning("[DB] Odom 데이터가 유효하지 않아 시간 간격에 따라 경고를 저장합니다.")
-
-                                                # 이미지 파일로 저장하고 DB에는 경로를 저장
-                                                timestamp = datetime.utcnow()
-                                                ts_str = timestamp.strftime('%Y%m%d_%H%M%S_%f')
-                                                class_names = '-'.join(sorted(list(set(d['class_name'] for d in detected_boxes)))) or 'detection'
-                                                filename = f"{ts_str}_{class_names}.jpg"
-
-                                                absolute_path = os.path.join(self.image_storage_root, filename)
-
-                                                # 이미지 파일 저장
-                                                cv2.imwrite(absolute_path, annotated_image)
-
-                                                # DB에 저장할 문서
-                                                doc = {
-                                                    "timestamp": timestamp,
-                                                    "odom": current_odom, # "N/A" 등 비정상 데이터라도 일단 기록
-                                                    "detections": detected_boxes,
-                                                    "image_path": os.path.join('imgs', 'line_crash', filename) # 웹에서 접근할 경로
-                                                }
-                                                self.warnings_collection.insert_one(doc)
-                                                logging.info(f"[DB] Odom N/A. 경고를 DB에 저장했습니다 (이미지: {filename}).")
-
-                                    except Exception as e:
-                                        logging.error(f"[DB] 경고 데이터를 MongoDB에 저장하는 중 오류 발생: {e}")
-
-                                # 상태가 변경되었을 때만 업데이트 및 전송
-                                if self.robot_status['pi_cv']['damage_detected'] != damage_detected:
-                                    self.robot_status['pi_cv']['damage_detected'] = damage_detected
-                                    self.socketio.emit('status_update', self.robot_status)
-
-                                # Bounding Box가 그려진 이미지를 Base64로 인코딩하여 전송
-                                self.socketio.emit('new_image', {'image': annotated_b64_image})
-
-                            except Exception as e:
-                                logging.error(f"[Image Thread] 이미지 처리 중 오류 발생: {e}")
-                                # 오류 발생 시 원본 이미지라도 전송하여 스트림이 끊기지 않도록 함
-                                self.socketio.emit('new_image', {'image': b64_image})
-                        else:
-                            self.socketio.emit('new_image', {'image': b64_image})
-                    except websocket.WebSocketTimeoutException:
-                        logging.warning("[Image Thread] 이미지 서버로부터 데이터 수신 시간 초과. 연결을 재설정합니다.")
-                        break
-                    except websocket.WebSocketConnectionClosedException:
-                        logging.warning("[Image Thread] 이미지 서버와의 연결이 끊어졌습니다.")
-                        break # 내부 루프를 빠져나가 재연결 로직으로 이동
-
-            except Exception as e:
-                logging.warning(f"[Image Thread] 이미지 서버에 연결할 수 없습니다: {e}")
-
+                            # 1. 현재 로봇의 odom 데이터 가져오기
+                            current_odom = self.robot_status['pi_slam']['last_odom']
+                            odom_x = current_odom.get('x')
+                            odom_y = current_odom.get('y')
+
+                            # 2. odom 데이터가 유효한 숫자인지 확인
+                            if isinstance(odom_x, (int, float)) and isinstance(odom_y, (int, float)):
+                                # 3. 현재 위치 근처에 이미 저장된 경고가 있는지 확인 (50cm 반경)
+                                min_distance_meters = 0.5
+
+                                existing_warning = self.warnings.find_near(odom_x, odom_y, min_distance_meters)
+
+                                if existing_warning:
+                                    logging.info(f"[DB] 현재 위치 ({odom_x:.2f}, {odom_y:.2f}) 근처에 이미 경고가 저장되어 있어 중복 저장을 건너뜁니다.")
+                                else:
+                                    # 4. 중복이 아니면 이미지 파일로 저장하고 DB에는 경로를 저장
+                                    timestamp = datetime.utcnow()
+
+                                    # DB에 저장할 문서
+                                    doc = {
+                                        "timestamp": timestamp,
+                                        "odom": current_odom,
+                                        "location": {"type": "Point", "coordinates": [odom_x, odom_y]},
+                                        "detections": detected_boxes,
+                                        "model": model_info, # 감지에 쓴 모델 버전과 추론 설정
+                                    }
+                                    # web/static/imgs/line_crash/<해시 샤드>/<해시>.jpg (+ 목록용 썸네일)
+                                    image_path = self.store_warning(doc, annotated_jpeg, annotated_image, frame.jpeg, cv_image)
+                                    if self.heatmap is not None:
+                                        self.heatmap.add(doc)
+                                    logging.info(f"[DB] 손상 감지: 새로운 위치({odom_x:.2f}, {odom_y:.2f})의 경고를 DB에 저장했습니다 (이미지: {image_path}).")
+                            else:
+                                # odom 데이터가 유효하지 않을 경우, 시간 기반으로 중복 저장 방지
+                                na_save_interval_seconds = 100 # 최소 저장 간격 (초) (원래 10초인데 내 컴퓨터 부하 살려줘 이슈로 100초로 변경)
+
+                                # 'location' 필드가 없는 가장 최근 문서를 찾음
+                                last_na_warning = self.warnings.latest_unlocated()
+
+                                should_save = True
+                                if last_na_warning:
+                                    time_since_last = datetime.utcnow() - last_na_warning['timestamp']
+                                    if time_since_last.total_seconds() < na_save_interval_seconds:
+                                        should_save = False
+                                        logging.info(f"[DB] Odom N/A 상태. 마지막 저장 후 {time_since_last.total_seconds():.1f}초 경과. {na_save_interval_seconds}초 내 중복 저장을 방지합니다.")
+
+                                if should_save:
+                                    logging.warning("[DB] Odom 데이터가 유효하지 않아 시간 간격에 따라 경고를 저장합니다.")
+
+                                    # 이미지 파일로 저장하고 DB에는 경로를 저장
+                                    timestamp = datetime.utcnow()
+
+                                    # DB에 저장할 문서
+                                    doc = {
+                                        "timestamp": timestamp,
+                                        "odom": current_odom, # "N/A" 등 비정상 데이터라도 일단 기록
+                                        "detections": detected_boxes,
+                                        "model": model_info, # 감지에 쓴 모델 버전과 추론 설정
+                                    }
+                                    # 이미지 파일 저장 (+ 목록용 썸네일, 재채점용 원본 프레임)
+                                    image_path = self.store_warning(doc, annotated_jpeg, annotated_image, frame.jpeg, cv_image)
+                                    logging.info(f"[DB] Odom N/A. 경고를 DB에 저장했습니다 (이미지: {image_path}).")
+
+                        except ImageStoreFull as e:
+                            # 디스크가 가득 차도 프레임 처리와 스트리밍은 계속합니다 (정리 스레드가 공간을 확보).
+                            logging.error(f"[ImageStore] {e} 이번 경고는 저장하지 않습니다.")
+                        except Exception as e:
+                            logging.error(f"[DB] 경고 데이터를 DB에 저장하는 중 오류 발생: {e}")
+
+                    # 상태가 변경되었을 때만 업데이트 및 전송
+                    if self.robot_status['pi_cv']['damage_detected'] != damage_detected:
+                        self.robot_status['pi_cv']['damage_detected'] = damage_detected
+                        self.socketio.emit('status_update', self.robot_status)
+
+                    # Bounding Box가 그려진 이미지를 Base64로 인코딩하여 전송
+                    self.emit_image(annotated_b64_image, frame_id)
+
+                except Exception as e:
+                    logging.error(f"[Image Thread] 이미지 처리 중 오류 발생: {e}")
+                    # 오류 발생 시 원본 이미지라도 전송하여 스트림이 끊기지 않도록 함
+                    self.emit_image(b64_image, frame_id)
+            else:
+                self.emit_image(b64_image, frame_id)
+
+    def is_inferring(self, within):
+        """최근 within초 안에 실시간 추론을 했으면 True."""
+        return time.time() - self.last_inference_at < within
+
+    def save_warning_image(self, jpeg_bytes, image):
+        """
+        이미 인코딩한 JPEG 바이트를 그대로 저장소에 넣고 static 기준 경로를 반환합니다 (다시 인코딩하지 않음).
+        같은 바이트의 이미지는 한 번만 저장되고, 메모리에 있는 image로 목록용 썸네일도 함께 만듭니다.
+        """
+        return self.image_store.put(jpeg_bytes, image)
+
+    def store_warning(self, doc, jpeg_bytes, image, raw_jpeg=None, raw_image=None):
+        """
+        경고 이미지를 저장하고 doc에 image_path(웹에서 접근할 static 기준 경로)를 채워 DB에 넣습니다.
+        raw_jpeg/raw_image(박스를 그리기 전 받은 프레임)를 넘기면 encode_raw_frame()으로 줄여 raw_image_path로 함께 저장합니다.
+        재채점은 이 원본으로 추론하므로 이전 모델의 박스/라벨이 새 모델의 결과에 섞이지 않습니다.
+        중복 제거로 기존 파일을 돌려받은 경우 문서가 들어가기 전에 정리 스레드가 그 파일을 지우지 않도록
+        이미지 저장소의 reference_lock을 쥔 채로 저장합니다.
+        """
+        raw_bytes = self.encode_raw_frame(raw_jpeg, raw_image)
+        with self.image_store.reference_lock:
+            doc["image_path"] = self.save_warning_image(jpeg_bytes, image)
+            if raw_bytes is not None:
+                # 원본 프레임은 목록에 표시하지 않으므로 썸네일을 만들지 않습니다.
+                doc["raw_image_path"] = self.image_store.put(raw_bytes)
+            self.warnings.insert(doc)
+        return doc["image_path"]
+
+    @staticmethod
+    def encode_raw_frame(raw_jpeg, raw_image):
+        """
+        재채점용으로 저장할 원본 프레임 바이트를 만듭니다. RAW_FRAME_JPEG_QUALITY가 0이면 None (저장하지 않음).
+        모델은 어차피 YOLO_IMG_SIZE로 줄여 추론하므로 긴 변을 RAW_FRAME_MAX_SIDE로 줄이고 낮은 품질로 다시 인코딩하며,
+        받은 JPEG가 더 작으면 그대로 씁니다.
+        """
+        if not RAW_FRAME_JPEG_QUALITY or (raw_jpeg is None and raw_image is None):
+            return None
+        if raw_image is None:
+            return raw_jpeg
+        height, width = raw_image.shape[:2]
+        scale = RAW_FRAME_MAX_SIDE / max(height, width)
+        if scale < 1:
+            raw_image = cv2.resize(raw_image, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_AREA)
+        ok, buffer = cv2.imencode('.jpg', raw_image, [cv2.IMWRITE_JPEG_QUALITY, RAW_FRAME_JPEG_QUALITY])
+        if not ok:
+            return raw_jpeg
+        encoded = buffer.tobytes()
+        return encoded if raw_jpeg is None or len(encoded) < len(raw_jpeg) else raw_jpeg
+
+    def begin_trace(self, frame):
+        """
+        카메라 서버가 붙인 frame_id와 단계별 시각으로 지연 시간 추적을 시작합니다.
+        frame_id가 없는 소스(MJPEG/RTSP)는 수신 순번을 대신 사용하여 웹 서버 안의 구간만 측정합니다.
+        """
+        meta = frame.meta or {}
+        frame_id = meta.get('frame_id', frame.sequence)
+        remote_trace = dict(meta.get('trace') or {}, send=meta.get('sent_at'))
+        self.tracer.begin(frame_id, frame.timestamp, remote_trace, getattr(self.source, 'clock', None))
+        if time.time() - self.last_trace_log >= self.trace_log_interval:
+            self.last_trace_log = time.time()
+            logging.info(f"[Latency] {self.tracer.summary_line()}")
+        return frame_id
+
+    def emit_image(self, b64_image, frame_id):
+        """웹 클라이언트로 이미지를 전송합니다. 브라우저는 표시한 뒤 frame_id로 'frame_displayed' ack를 보냅니다."""
+        self.socketio.emit('new_image', {'image': b64_image, 'frame_id': frame_id})
+        self.tracer.mark(frame_id, 'emit')
+
+    def latency_report(self):
+        """/api/latency 응답: 구간별 히스토그램과 카메라 서버와의 시계 오프셋."""
+        clock = getattr(self.source, 'clock', None)
+        return dict(self.tracer.snapshot(), clock=clock.snapshot() if clock is not None else None)
+
+    def candidate_matches(self, candidate, meta):
+        """후보 점수가 이 프레임(또는 한 프레임 간격 이내의 프레임)에서 매긴 것인지 확인합니다."""
+        offset_ms = candidate.get('offset_ms')
+        if offset_ms is None:
+            return False
+        fps = (meta.get('op') or {}).get('fps')
+        limit_ms = 1000.0 / fps if fps else self.candidate_max_offset_ms
+        return abs(offset_ms) <= limit_ms
+
+    def should_analyze(self, meta):
+        """
+        프레임 메타데이터의 prefilter 후보 점수로 정밀 추론 여부를 결정합니다.
+        점수가 없거나(prefilter 미사용/중단) 다른 프레임에서 매긴 점수면 항상 분석하고,
+        이 프레임에서 매긴 낮은 점수일 때만 sample_every 장마다 1장만 분석합니다.
+        """
+        candidate = meta.get('candidate') if meta else None
+        if candidate is None or candidate.get('score', 0.0) >= self.candidate_threshold:
+            analyze = True
+        elif not self.candidate_matches(candidate, meta):
+            analyze = True
+        else:
+            self.skipped_since_sample += 1
+            analyze = self.skipped_since_sample >= self.sample_every
+        if analyze:
+            self.skipped_since_sample = 0
+            self.analyzed_frames += 1
+        else:
+            self.skipped_frames += 1
+        total = self.analyzed_frames + self.skipped_frames
+        if total % 500 == 0:
+            logging.info(f"[Image Thread] 정밀 추론 {self.analyzed_frames}/{total} 프레임 "
+                         f"({self.analyzed_frames / total * 100:.0f}%), prefilter로 건너뜀 {self.skipped_frames}")
+        return analyze
+
+    def on_source_status(self, connected):
+        """FrameSource의 연결 상태가 바뀌면 로봇 상태를 갱신하여 웹 클라이언트에 전송합니다."""
+        if connected:
+            self.robot_status['pi_cv']['connected'] = True
+            self.robot_status['pi_cv']['status'] = "연결됨"
+            logging.info(f"[Image Thread] 이미지 서버 ({self.stream_url})에 연결되었습니다.")
+        else:
             # 연결이 끊겼거나, 연결에 실패했을 경우 상태 업데이트
             self.robot_status['pi_cv']['connected'] = False
             self.robot_status['pi_cv']['status'] = "연결 안됨"
             self.robot_status['pi_cv']['damage_detected'] = None # 연결 끊김 시 None으로 초기화
             logging.info("[Image Thread] 클라이언트에 연결 끊김 상태 전송.")
-            self.socketio.emit('status_update', self.robot_status)
-
-            if self.is_running:
-                logging.info("[Image Thread] 5초 후 재연결을 시도합니다.")
-                eventlet.sleep(5)
+        self.socketio.emit('status_update', self.robot_status)
 
     def stop(self):
         self.is_running = False
-        if self.ws:
-            self.ws.close()
+        if self.source:
+            self.source.stop()
         logging.info("[Image Thread] 이미지 클라이언트 스레드를 중지합니다.")
\ No newline at end of file
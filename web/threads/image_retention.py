@@ -0,0 +1,174 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+
+import config
+
+# 보존 정책 (config.py에서 덮어쓸 수 있음)
+IMAGE_RETENTION_DAYS = getattr(config, 'IMAGE_RETENTION_DAYS', 30)         # 이보다 오래된 경고는 이미지와 함께 삭제 (0이면 끔)
+IMAGE_SWEEP_INTERVAL = getattr(config, 'IMAGE_SWEEP_INTERVAL', 600)        # 정기 정리 간격 (초)
+IMAGE_ORPHAN_GRACE_SECONDS = getattr(config, 'IMAGE_ORPHAN_GRACE_SECONDS', 3600)  # DB 문서가 없는 파일을 지우기 전 유예 시간
+QUOTA_LOW_WATERMARK = 0.9   # 용량 초과 시 상한의 90%까지 줄임
+SWEEP_BATCH = 200
+
+
+class ImageRetentionThread(threading.Thread):
+    """
+    경고 이미지 저장소를 정리하는 백그라운드 스레드 (경고 저장소는 MongoDB/내장 저장소 모두 가능).
+    - 보존 기간이 지난 경고와 용량 상한을 넘긴 만큼의 오래된 경고를 DB 문서와 이미지 파일에서 함께 삭제합니다 (히트맵 집계에서도 뺌).
+    - DB 문서를 먼저 지우고 파일을 지우므로, 목록에 있는데 이미지가 없는 경고는 생기지 않습니다.
+    - 같은 이미지를 여러 경고가 공유할 수 있으므로(내용 해시 중복 제거) 더 이상 참조하는 문서가 없을 때만 파일을 지웁니다.
+    - 시작할 때 한 번, DB 문서가 없는 파일(저장 중 종료 등으로 남은 파일)을 정리합니다.
+    저장소 용량이 상한을 넘으면 ImageStore.on_pressure로 즉시 깨어납니다.
+
+    내장 저장소를 MongoDB와 동기화하는 경우(mirror=WarningSyncThread) 내장 저장소에는 MongoDB 경고의 일부만 있으므로,
+    용량 정리와 DB에 없는 파일 정리는 MongoDB를 기준으로 하고 파일은 두 저장소 모두 참조하지 않을 때만 지웁니다.
+    MongoDB에 연결되지 않은 동안에는 보존 기간 정리만 하고 파일은 지우지 않습니다.
+    """
+    def __init__(self, image_store, warning_repository, thumbnail_cache=None, heatmap=None, mirror=None,
+                 retention_days=IMAGE_RETENTION_DAYS, interval=IMAGE_SWEEP_INTERVAL):
+        super().__init__()
+        self.daemon = True
+        self.store = image_store
+        self.warnings = warning_repository
+        self.thumbnail_cache = thumbnail_cache
+        self.heatmap = heatmap
+        self.mirror = mirror
+        self.retention_days = retention_days
+        self.interval = interval
+        self.is_running = True
+        self.deleted_warnings = 0
+        self.deleted_images = 0
+        self.freed_bytes = 0
+        self.orphans_swept = False
+        self._wake = threading.Event()
+        self.store.on_pressure = self._wake.set
+
+    def run(self):
+        logging.info(f"[Retention] 이미지 정리 스레드를 시작합니다 (보존 {self.retention_days}일, "
+                     f"상한 {self.store.max_bytes / 1024 ** 2:.0f} MB).")
+        while self.is_running:
+            if not self.orphans_swept:
+                self.orphans_swept = bool(self._run_safely(self.sweep_orphans))
+            self._run_safely(self.sweep)
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def _run_safely(self, step):
+        try:
+            return step()
+        except Exception as e:
+            logging.error(f"[Retention] 이미지 정리 중 오류 발생: {e}")
+
+    def _authoritative(self):
+        """용량 정리와 DB에 없는 파일 정리의 기준 저장소와 히트맵. MongoDB와 동기화 중이면 MongoDB (연결 전이면 None)."""
+        if self.mirror is None:
+            return self.warnings, self.heatmap
+        return self.mirror.repository, self.mirror.heatmap
+
+    def sweep(self):
+        """보존 기간과 용량 상한을 적용합니다."""
+        start = time.time()
+        deleted = 0
+        repository, heatmap = self._authoritative()
+        if self.retention_days:
+            cutoff = datetime.utcnow() - timedelta(days=self.retention_days)
+            sources = [(self.warnings, self.heatmap)]
+            if repository is not None and repository is not self.warnings:
+                sources.append((repository, heatmap))
+            for source, source_heatmap in sources:
+                while self.is_running:
+                    docs = source.oldest(SWEEP_BATCH, before=cutoff)
+                    if not docs:
+                        break
+                    deleted += self._delete_warnings(docs, source, source_heatmap)
+
+        if self.store.over_quota():
+            # 경고를 지우기 전에 DB에 없는 파일을 먼저 정리하고 실제 사용량으로 보정합니다.
+            self.sweep_orphans()
+            self.store.rescan()
+        if self.store.over_quota():
+            target = self.store.max_bytes * QUOTA_LOW_WATERMARK
+            if repository is None:
+                logging.warning("[Retention] 용량 상한을 넘었지만 MongoDB에 연결되지 않아 용량 정리를 미룹니다.")
+            while repository is not None and self.is_running and self.store.used_bytes > target:
+                docs = repository.oldest(SWEEP_BATCH)
+                if not docs:
+                    break
+                freed_before = self.freed_bytes
+                deleted += self._delete_warnings(docs, repository, heatmap)
+                if self.freed_bytes == freed_before:
+                    # 이미지를 더 새로운 경고와 공유하거나 유예 중인 파일이 용량을 차지하는 경우,
+                    # 경고를 더 지워도 공간이 생기지 않으므로 멈춥니다.
+                    logging.warning(f"[Retention] 경고 {len(docs)}건을 지워도 용량이 줄지 않아 용량 정리를 멈춥니다 "
+                                    f"(사용량 {self.store.used_bytes / 1024 ** 2:.1f} MB).")
+                    break
+
+        if deleted:
+            usage = self.store.usage()
+            logging.info(f"[Retention] 경고 {deleted}건 정리 ({time.time() - start:.1f}s). "
+                         f"사용량 {usage['used_bytes'] / 1024 ** 2:.1f} MB / 파일 {usage['file_count']}개")
+
+    def _delete_warnings(self, docs, repository, heatmap):
+        ids = [doc["_id"] for doc in docs]
+        repository.delete(ids)
+        if repository is not self.warnings:
+            # MongoDB에서 지운 경고의 내장 저장소 사본도 지웁니다.
+            self.warnings.delete(ids)
+        if heatmap is not None:
+            for doc in docs:
+                heatmap.remove(doc)
+        # 표시용(박스를 그린) 이미지와 재채점용 원본 프레임
+        image_paths = {doc.get(key) for doc in docs for key in ("image_path", "raw_image_path")}
+        for image_path in image_paths - {None}:
+            self._delete_unreferenced(image_path)
+        self.deleted_warnings += len(docs)
+        return len(docs)
+
+    def _delete_unreferenced(self, image_path):
+        """이미지를 가리키는 경고가 없으면 지우고 True를 반환합니다 (같은 이미지를 공유하는 경고가 남아 있으면 유지)."""
+        # 이미지 스레드가 같은 파일을 돌려받아 경고를 넣는 중일 수 있으므로 확인과 삭제를 reference_lock 안에서 합니다.
+        with self.store.reference_lock:
+            if self._is_referenced(image_path):
+                return False
+            self._delete_image(image_path)
+        return True
+
+    def _is_referenced(self, image_path):
+        """이미지를 가리키는 경고가 있으면 True. MongoDB와 동기화 중인데 연결되지 않았으면 알 수 없으므로 True."""
+        if self.warnings.references_image(image_path):
+            return True
+        if self.mirror is None:
+            return False
+        repository = self.mirror.repository
+        return repository is None or repository.references_image(image_path)
+
+    def _delete_image(self, image_path):
+        self.freed_bytes += self.store.delete(image_path)
+        if self.thumbnail_cache is not None:
+            self.thumbnail_cache.discard(image_path)
+        self.deleted_images += 1
+
+    def sweep_orphans(self):
+        """
+        DB 문서가 가리키지 않는 이미지 파일을 지웁니다 (저장 직후의 파일은 유예 시간 동안 남겨 둠).
+        기준 저장소(MongoDB와 동기화 중이면 MongoDB)에 연결되지 않았으면 False를 반환하고 다음 주기에 다시 시도합니다.
+        """
+        if self._authoritative()[0] is None:
+            return False
+        cutoff = time.time() - IMAGE_ORPHAN_GRACE_SECONDS
+        removed = 0
+        for image_path, mtime in self.store.iter_images():
+            if not self.is_running:
+                break
+            if mtime <= cutoff and self._delete_unreferenced(image_path):
+                removed += 1
+        if removed:
+            logging.info(f"[Retention] DB에 없는 이미지 {removed}개를 정리했습니다.")
+        return True
+
+    def stop(self):
+        self.is_running = False
+        self._wake.set()
+        logging.info("[Retention] 이미지 정리 스레드를 중지합니다.")
@@ -0,0 +1,75 @@
+import logging
+import threading
+from datetime import datetime
+
+import config
+
+# 탐사 중 지도 버전을 기록하는 간격 (초)
+MAP_HISTORY_INTERVAL = getattr(config, 'MAP_HISTORY_INTERVAL', 10.0)
+
+
+class MapHistoryThread(threading.Thread):
+    """
+    탐사 중 ROS 스레드의 최신 지도를 일정 간격으로 MapStore에 기록하는 스레드.
+    지도 콜백(ROS 수신 스레드)에서는 압축/DB 저장을 하지 않도록 여기서 따로 처리합니다.
+    탐사 시작 시 start_run(), 종료 시 finish_run()을 호출합니다.
+    """
+    def __init__(self, ros_thread, map_store, interval=MAP_HISTORY_INTERVAL):
+        super().__init__()
+        self.daemon = True
+        self.ros_thread = ros_thread
+        self.map_store = map_store
+        self.interval = interval
+        self.is_running = True
+        self.run_id = None
+        self._last_map = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+
+    def run(self):
+        logging.info(f"[Map History] 지도 이력 기록 스레드를 시작합니다 ({self.interval}초 간격).")
+        while self.is_running:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self.is_running:
+                self.record()
+
+    def start_run(self):
+        """새 탐사를 시작합니다. run_id는 시작 시각 (UTC)."""
+        with self._lock:
+            if self.run_id:
+                self.map_store.close_run(self.run_id)
+            self.run_id = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
+            self._last_map = None
+        logging.info(f"[Map History] 탐사 {self.run_id} 지도 기록을 시작합니다.")
+        return self.run_id
+
+    def record(self, final=False):
+        """최신 지도가 마지막 기록 이후 바뀌었으면 한 버전을 추가합니다."""
+        with self._lock:
+            run_id = self.run_id
+            latest_map = self.ros_thread.get_latest_map() if self.ros_thread else None
+            if run_id is None or latest_map is None or (latest_map is self._last_map and not final):
+                return None
+            try:
+                version = self.map_store.append(run_id, latest_map, final=final)
+            except Exception as e:
+                logging.error(f"[Map History] 지도 버전 저장 실패: {e}")
+                return None
+            self._last_map = latest_map
+            return version
+
+    def finish_run(self):
+        """마지막 지도를 final 버전으로 기록하고 탐사를 닫습니다. 탐사가 시작되지 않았으면 지금 시작한 것으로 봅니다."""
+        if self.run_id is None:
+            self.start_run()
+        version = self.record(final=True)
+        with self._lock:
+            run_id, self.run_id = self.run_id, None
+            self.map_store.close_run(run_id)
+        return run_id, version
+
+    def stop(self):
+        self.is_running = False
+        self._wake.set()
+        logging.info("[Map History] 지도 이력 기록 스레드를 중지합니다.")
@@ -0,0 +1,120 @@
+import logging
+import os
+import threading
+import time
+
+import config
+
+from web.disconnection_check.inference import model_stamp
+from web.disconnection_check.reanalysis import BatchReanalyzer, analysis_image_path
+
+# 재채점 설정 (config.py에서 덮어쓸 수 있음)
+RESCORE_INTERVAL = getattr(config, 'RESCORE_INTERVAL', 300)            # 재채점할 경고가 없을 때 다시 확인하는 간격 (초)
+RESCORE_BATCH = getattr(config, 'RESCORE_BATCH', 32)                   # 한 번에 골라 bulk로 기록하는 경고 수
+RESCORE_IDLE_SECONDS = getattr(config, 'RESCORE_IDLE_SECONDS', 30)     # 실시간 추론이 이 시간 동안 없을 때만 실행
+RESCORE_DUTY_CYCLE = getattr(config, 'RESCORE_DUTY_CYCLE', 0.5)        # 재채점에 쓰는 시간 비율 (나머지는 쉼)
+RESCORE_PRIORITY = getattr(config, 'RESCORE_PRIORITY', 'recent')       # 'recent': 최신 경고부터, 'near': 로봇 근처부터
+RESCORE_NICE = 10           # 재채점 작업 프로세스의 우선순위 (높을수록 양보)
+RESCORE_MODEL_BATCH = 8     # 한 번의 모델 호출에 넣는 이미지 수
+IDLE_CHECK_INTERVAL = 5     # 실시간 추론 중일 때 다시 확인하는 간격 (초)
+
+
+class RescoringThread(threading.Thread):
+    """
+    모델을 바꾼 뒤, 다른 모델 버전으로 분석된(또는 버전 기록이 없는) 경고를 지금 모델로 다시 채점하는 백그라운드 스레드.
+    - 실시간 추론(ImageClientThread)이 RESCORE_IDLE_SECONDS 동안 없을 때만 돌고, 배치 사이에는 RESCORE_DUTY_CYCLE에 맞춰 쉽니다.
+    - 추론은 낮은 우선순위(nice), torch 스레드 1개인 작업 프로세스 하나에서 하며 reanalysis.py와 같은 결과 캐시를 씁니다.
+    - 박스가 그려지지 않은 원본 프레임(raw_image_path)으로 추론합니다 (원본 프레임이 없는 이전 경고만 표시용 이미지 사용).
+    - 결과(detections, model)는 배치마다 저장소의 bulk_update 한 번으로 기록하고, 히트맵 집계도 고칩니다.
+    - 이미지가 없어 채점할 수 없는 경고는 model.error와 함께 지금 버전으로 표시해 다시 고르지 않습니다.
+    """
+    def __init__(self, warning_repository, image_thread, static_root, heatmap=None, robot_status=None,
+                 priority=RESCORE_PRIORITY, batch_size=RESCORE_BATCH, idle_seconds=RESCORE_IDLE_SECONDS,
+                 duty_cycle=RESCORE_DUTY_CYCLE, interval=RESCORE_INTERVAL):
+        super().__init__()
+        self.daemon = True
+        self.warnings = warning_repository
+        self.image_thread = image_thread
+        self.static_root = static_root
+        self.heatmap = heatmap
+        self.robot_status = robot_status
+        self.priority = priority
+        self.batch_size = batch_size
+        self.idle_seconds = idle_seconds
+        self.duty_cycle = min(max(duty_cycle, 0.05), 1.0)
+        self.interval = interval
+        self.reanalyzer = BatchReanalyzer(config.YOLO_MODEL_PATH, workers=1, batch_size=RESCORE_MODEL_BATCH,
+                                          torch_threads=1, nice=RESCORE_NICE, verbose=False)
+        # 실시간 분석(ImageClientThread)이 경고에 남기는 값과 같습니다.
+        self.stamp = model_stamp(self.reanalyzer.model_path, self.reanalyzer.settings)
+        self.is_running = True
+        self.rescored = 0
+        self._wake = threading.Event()
+
+    def run(self):
+        logging.info(f"[Rescore] 재채점 스레드를 시작합니다 (모델 버전 {self.stamp['version']}, 우선순위 {self.priority}).")
+        try:
+            while self.is_running:
+                if self.image_thread is not None and self.image_thread.is_inferring(self.idle_seconds):
+                    self._sleep(IDLE_CHECK_INTERVAL)
+                    continue
+                started = time.time()
+                try:
+                    rescored = self.rescore_batch()
+                except Exception as e:
+                    logging.error(f"[Rescore] 재채점 중 오류 발생: {e}")
+                    rescored = 0
+                if not rescored:
+                    self._sleep(self.interval)
+                else:
+                    # 추론에 쓴 시간만큼 비례해서 쉽니다 (duty_cycle 0.5 -> 같은 시간만큼 쉼).
+                    self._sleep((time.time() - started) * (1 - self.duty_cycle) / self.duty_cycle)
+        finally:
+            self.reanalyzer.close()
+
+    def _sleep(self, seconds):
+        self._wake.wait(seconds)
+        self._wake.clear()
+
+    def _stale_warnings(self):
+        near = None
+        if self.priority == 'near' and self.robot_status is not None:
+            odom = self.robot_status['pi_slam']['last_odom']
+            if isinstance(odom.get('x'), (int, float)) and isinstance(odom.get('y'), (int, float)):
+                near = (odom['x'], odom['y'])
+        docs = self.warnings.stale(self.stamp['version'], self.batch_size, near)
+        if not docs and near is not None:
+            # 위치가 있는 경고를 다 채점했으면 위치 없는 경고를 최신순으로
+            docs = self.warnings.stale(self.stamp['version'], self.batch_size)
+        return docs
+
+    def rescore_batch(self):
+        """오래된 모델 버전의 경고를 한 배치 채점해 기록합니다. 기록한 경고 수를 반환합니다."""
+        docs = {str(doc["_id"]): doc for doc in self._stale_warnings()}
+        if not docs:
+            return 0
+        updates = {}
+
+        def on_result(ref, content_hash, detections, cached):
+            updates[ref] = {"detections": detections, "model": self.stamp}
+
+        def on_error(ref, message):
+            updates[ref] = {"model": dict(self.stamp, error=message)}
+
+        items = [(ref, os.path.join(self.static_root, analysis_image_path(doc))) for ref, doc in docs.items()]
+        summary = self.reanalyzer.run(items, on_result, on_error=on_error)
+        self.warnings.bulk_update([(docs[ref]["_id"], fields) for ref, fields in updates.items()])
+        if self.heatmap is not None:
+            for ref, fields in updates.items():
+                if "detections" in fields:
+                    self.heatmap.remove(docs[ref])
+                    self.heatmap.add(dict(docs[ref], detections=fields["detections"]))
+        self.rescored += len(updates)
+        logging.info(f"[Rescore] 경고 {len(updates)}건 재채점 (추론 {summary['inferred']}, 캐시 {summary['cached']}, "
+                     f"오류 {summary['errors']}, {summary['seconds']}s). 누적 {self.rescored}건")
+        return len(updates)
+
+    def stop(self):
+        self.is_running = False
+        self._wake.set()
+        logging.info("[Rescore] 재채점 스레드를 중지합니다.")
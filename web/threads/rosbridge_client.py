@@ -4,9 +4,10 @@ import logging
 import eventlet
 import config
 from web.control.robot_controller import SmoothRobotController
+from web.storage.map_tiles import update_from_map
 
 class RosBridgeClientThread(threading.Thread):
-    def __init__(self, socketio_instance, robot_status):
+    def __init__(self, socketio_instance, robot_status, map_tiles=None):
         super().__init__()
         self.daemon = True
         self.socketio = socketio_instance
@@ -20,6 +21,8 @@ class RosBridgeClientThread(threading.Thread):
         self.cmd_vel_publisher = None
         self.exploration_publisher = None
         self.latest_map = None
+        # 실시간 지도 타일 캐시 (있으면 지도 전체 대신 바뀐 타일 목록만 웹으로 전송)
+        self.map_tiles = map_tiles
         self.latest_tf = None
 
     def run(self):
@@ -148,7 +151,12 @@ class RosBridgeClientThread(threading.Thread):
                 'data': data
             }
             self.latest_map = map_data
-            self.socketio.emit('map_update', map_data)
+            if self.map_tiles is None:
+                self.socketio.emit('map_update', map_data)
+                return
+            # 바뀐 셀이 있는 타일만 다시 그리도록 타일 캐시를 갱신하고, 브라우저에는 메타데이터와 바뀐 타일 위치만 보냅니다.
+            dirty = update_from_map(self.map_tiles, map_data)
+            self.socketio.emit('map_update', dict(self.map_tiles.meta(), dirty=dirty))
         except KeyError as e:
             logging.warning(f"[ROS Thread] 수신한 map 메시지에 예상 키가 없습니다: {e}")
         except Exception as e:
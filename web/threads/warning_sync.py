@@ -0,0 +1,107 @@
+import logging
+import threading
+
+from bson import ObjectId
+from pymongo import ReplaceOne
+
+import config
+from web.storage.warning_repository import SWEEP_PROJECTION, MongoWarningRepository
+
+# MongoDB 동기화 설정 (config.py에서 덮어쓸 수 있음)
+WARNING_SYNC_INTERVAL = getattr(config, 'WARNING_SYNC_INTERVAL', 30)   # 옮길 경고가 있는지 확인하는 간격 (초)
+WARNING_SYNC_BATCH = getattr(config, 'WARNING_SYNC_BATCH', 200)        # 한 번에 bulk_write로 보내는 경고 수
+MAX_RETRY_INTERVAL = 600   # MongoDB에 연결할 수 없을 때 재시도 간격 상한 (초)
+
+
+class WarningSyncThread(threading.Thread):
+    """
+    내장 경고 저장소(LocalWarningStore)에 쌓인 경고를 MongoDB로 옮기는 백그라운드 스레드.
+    - MongoDB에 연결할 수 없으면 재시도 간격을 두 배씩 늘려 가며(최대 MAX_RETRY_INTERVAL초) 연결될 때까지 기다립니다.
+    - 로컬 _id(ObjectId)로 upsert하므로 같은 경고를 다시 보내도 한 번만 저장되고, 재채점 등으로 바뀐 경고는 덮어씁니다.
+    - 옮긴 경고는 로컬에서 synced로 표시만 하고, 로컬 저장소는 계속 기본 저장소로 씁니다.
+    - 로컬에서 삭제한 경고(보존 기간/용량 정리)는 MongoDB에서도 지웁니다.
+    - 연결되어 있는 동안 repository/heatmap으로 MongoDB 쪽 저장소를 내줍니다 (이미지 정리 스레드가 참조 확인에 사용).
+    connect()는 (Mongo warnings 컬렉션, WarningHeatmap 또는 None)을 반환하고, 연결할 수 없으면 예외를 냅니다.
+    """
+    def __init__(self, local_store, connect, interval=WARNING_SYNC_INTERVAL, batch_size=WARNING_SYNC_BATCH):
+        super().__init__()
+        self.daemon = True
+        self.local_store = local_store
+        self.connect = connect
+        self.interval = interval
+        self.batch_size = batch_size
+        self.is_running = True
+        self.synced_warnings = 0
+        self._collection = None
+        self.repository = None
+        self.heatmap = None
+        self._wake = threading.Event()
+
+    def run(self):
+        logging.info(f"[Sync] 내장 저장소 -> MongoDB 동기화 스레드를 시작합니다 (미동기화 {self.local_store.pending_count()}건).")
+        retry_interval = self.interval
+        while self.is_running:
+            try:
+                self.sync()
+                retry_interval = self.interval
+            except Exception as e:
+                if self._collection is not None or retry_interval == self.interval:
+                    logging.warning(f"[Sync] MongoDB에 경고를 옮기지 못했습니다. 나중에 다시 시도합니다: {e}")
+                self._collection = None
+                self.repository = None
+                self.heatmap = None
+                retry_interval = min(retry_interval * 2, MAX_RETRY_INTERVAL)
+            self._wake.wait(retry_interval)
+            self._wake.clear()
+
+    def sync(self):
+        """미동기화 경고를 모두 옮기고 로컬에서 삭제한 경고를 MongoDB에서도 지웁니다. 옮긴 경고 수를 반환합니다."""
+        if self._collection is None:
+            self._collection, self.heatmap = self.connect()
+            self.repository = MongoWarningRepository(self._collection)
+            logging.info("[Sync] MongoDB에 연결되었습니다. 내장 저장소의 경고를 옮깁니다.")
+        else:
+            self._collection.database.command('ping')
+        self._delete_removed()
+        synced = 0
+        while self.is_running:
+            pending = self.local_store.unsynced(self.batch_size)
+            if not pending:
+                break
+            self._insert([doc for doc, _ in pending])
+            # 보내는 동안 다시 바뀐 경고는 수정 번호가 달라 미동기화로 남습니다.
+            self.local_store.mark_synced([(doc["_id"], rev) for doc, rev in pending])
+            synced += len(pending)
+        if synced:
+            self.synced_warnings += synced
+            logging.info(f"[Sync] 경고 {synced}건을 MongoDB로 옮겼습니다 (누적 {self.synced_warnings}건).")
+        return synced
+
+    def _insert(self, docs):
+        result = self._collection.bulk_write([ReplaceOne({"_id": doc["_id"]}, doc, upsert=True) for doc in docs],
+                                             ordered=False)
+        if self.heatmap is not None:
+            # 이번에 처음 저장된 경고만 Mongo 히트맵 집계에 더합니다.
+            for index in result.upserted_ids:
+                self.heatmap.add(docs[index])
+
+    def _delete_removed(self):
+        deleted = 0
+        while self.is_running:
+            ids = self.local_store.pending_deletions(self.batch_size)
+            if not ids:
+                break
+            query = {"_id": {"$in": [ObjectId(_id) for _id in ids]}}
+            docs = list(self._collection.find(query, SWEEP_PROJECTION)) if self.heatmap is not None else []
+            self._collection.delete_many(query)
+            for doc in docs:
+                self.heatmap.remove(doc)
+            self.local_store.clear_deletions(ids)
+            deleted += len(ids)
+        if deleted:
+            logging.info(f"[Sync] 로컬에서 정리한 경고 {deleted}건을 MongoDB에서도 삭제했습니다.")
+
+    def stop(self):
+        self.is_running = False
+        self._wake.set()
+        logging.info("[Sync] 동기화 스레드를 중지합니다.")